@@ -0,0 +1,33 @@
+import os
+import sys
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from src.analytics.activity import backfill_activity
+from src.models.database import mongo_db
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Get MongoDB URI from environment variables
+MONGO_URI = os.getenv("MONGO_URI") or os.getenv("MONGODB_URI")
+
+if not MONGO_URI:
+    print("Error: MONGODB_URI environment variable not set. Please set it in your .env file.")
+    exit(1)
+
+# Connect to MongoDB
+try:
+    mongo_db.client = MongoClient(MONGO_URI)
+    mongo_db.db = mongo_db.client.get_default_database()
+    mongo_db.db.users.create_index([("activity.total", -1), ("_id", 1)])
+    print(f"Successfully connected to MongoDB: {mongo_db.db.name}")
+except Exception as e:
+    print(f"Error connecting to MongoDB: {e}")
+    exit(1)
+
+# --- Recompute per-user activity counters ---
+batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+print("Backfilling user activity counters...")
+updated = backfill_activity(batch_size)
+print(f"Activity counters updated for {updated} users.")
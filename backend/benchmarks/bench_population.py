@@ -0,0 +1,106 @@
+"""
+Benchmark for author population on the article listing.
+
+Seeds articles written by a small pool of authors into a scratch database,
+then renders one listing page with the old per-row find_one lookups and with
+populate_users, counting the MongoDB commands each one issues through
+pymongo's command monitoring.
+
+Requires a running MongoDB. The scratch database is dropped afterwards.
+
+Usage: MONGO_URI=mongodb://localhost:27017/marrakech_bench python benchmarks/bench_population.py [articles] [authors] [limit]
+"""
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from bson import ObjectId
+from flask import Flask
+from pymongo import MongoClient, monitoring
+
+from src.models.database import mongo_db, paginate_query, serialize_doc
+from src.utils.population import populate_users
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server, by command name"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def started(self, event):
+        self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def seed(db, article_count, author_count):
+    now = datetime.utcnow()
+    authors = [
+        {"_id": ObjectId(), "username": f"author{i}", "firstName": "Author", "lastName": str(i), "avatar": ""}
+        for i in range(author_count)
+    ]
+    db.users.insert_many(authors)
+    db.articles.insert_many([
+        {
+            "title": f"Article {i}",
+            "slug": f"article-{i}",
+            "author": authors[i % author_count]['_id'],
+            "status": "published",
+            "publishedAt": now - timedelta(minutes=i)
+        }
+        for i in range(article_count)
+    ])
+    db.articles.create_index([("status", 1), ("publishedAt", -1), ("_id", -1)])
+
+def per_row_lookup(articles):
+    """The previous implementation: one find_one per article"""
+    for article in articles:
+        if article.get('author'):
+            author_data = mongo_db.db.users.find_one(
+                {"_id": ObjectId(article['author'])},
+                {"firstName": 1, "lastName": 1, "username": 1, "avatar": 1}
+            )
+            if author_data:
+                article['authorInfo'] = serialize_doc(author_data)
+
+def batched_lookup(articles):
+    populate_users(articles, 'author', 'authorInfo', ("firstName", "lastName", "username", "avatar"))
+
+def run(label, populate, app, counter, limit):
+    with app.app_context():
+        counter.counts.clear()
+        start = time.perf_counter()
+        articles, _ = paginate_query(mongo_db.db.articles, {"status": "published"}, 1, limit, 'publishedAt', -1)
+        populate(articles)
+        elapsed = time.perf_counter() - start
+        finds = counter.counts['find']
+        print(f"{label:<28} {finds:4d} find commands   {sum(counter.counts.values()):4d} total   {elapsed * 1000:7.1f} ms")
+
+def main():
+    article_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    author_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    limit = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    counter = CommandCounter()
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/marrakech_bench'), event_listeners=[counter])
+    mongo_db.client = client
+    mongo_db.db = client.get_default_database()
+
+    try:
+        seed(mongo_db.db, article_count, author_count)
+        app = Flask("bench_population")
+        print(f"Listing page of {limit} articles ({article_count} seeded, {author_count} authors)")
+        run("before (find_one per row)", per_row_lookup, app, counter, limit)
+        run("after (populate_users)", batched_lookup, app, counter, limit)
+    finally:
+        client.drop_database(mongo_db.db.name)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark for the article listing response path.
+
+Builds 10k article documents shaped like the seeded/created articles and
+compares the old path (json round trip per document, then jsonify with the
+stdlib provider) against the new one (in-place conversion, then a single
+encode with MongoJSONProvider).
+
+Usage: python benchmarks/bench_serialize.py [count] [rounds]
+"""
+import copy
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from src.models.database import JSONEncoder, MongoJSONProvider, create_response, serialize_docs
+
+def make_articles(count):
+    """Generate article documents matching Article.create"""
+    now = datetime.utcnow()
+    authors = [ObjectId() for _ in range(50)]
+    articles = []
+    for i in range(count):
+        title = f"Exploring the Medina part {i}"
+        articles.append({
+            "_id": ObjectId(),
+            "title": title,
+            "slug": f"exploring-the-medina-part-{i}",
+            "content": "A deep dive into the bustling alleys and hidden gems of Marrakech's old city. " * 8,
+            "excerpt": "Discover the vibrant heart of Marrakech.",
+            "featuredImage": "/api/v1/media/file/uploads/medina.jpg",
+            "gallery": ["/api/v1/media/file/uploads/a.jpg", "/api/v1/media/file/uploads/b.jpg"],
+            "author": authors[i % len(authors)],
+            "category": "Attractions",
+            "tags": ["medina", "culture", "history"],
+            "seo": {
+                "metaTitle": title,
+                "metaDescription": "",
+                "keywords": [],
+                "canonicalUrl": ""
+            },
+            "status": "published",
+            "publishedAt": now - timedelta(minutes=i),
+            "views": i * 3,
+            "likes": i,
+            "createdAt": now - timedelta(minutes=i),
+            "updatedAt": now
+        })
+    return articles
+
+def old_path(articles, app):
+    """json.loads(json.dumps()) per document, then jsonify with the stdlib provider"""
+    data = [json.loads(json.dumps(doc, cls=JSONEncoder)) for doc in articles]
+    return app.json.response(create_response(success=True, data=data))
+
+def new_path(articles, app):
+    """In-place conversion, then a single encode of the envelope"""
+    data = serialize_docs(articles)
+    return app.json.response(create_response(success=True, data=data))
+
+def bench(label, func, source, app, rounds):
+    timings = []
+    for _ in range(rounds):
+        # Documents are converted in place, so every round gets fresh copies
+        articles = copy.deepcopy(source)
+        start = time.perf_counter()
+        response = func(articles, app)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f"{label:<32} best {best * 1000:8.1f} ms   "
+          f"{len(source) / best:10.0f} docs/s   {len(response.get_data())} bytes")
+    return best
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    source = make_articles(count)
+
+    old_app = Flask("bench_old")
+    old_app.json = DefaultJSONProvider(old_app)
+    new_app = Flask("bench_new")
+    new_app.json = MongoJSONProvider(new_app)
+
+    print(f"Serializing {count} articles, best of {rounds} rounds")
+    before = bench("before (round trip + jsonify)", old_path, source, old_app, rounds)
+    after = bench("after (in place + one encode)", new_path, source, new_app, rounds)
+    print(f"speedup: {before / after:.1f}x")
+
+if __name__ == '__main__':
+    main()
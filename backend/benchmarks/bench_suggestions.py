@@ -0,0 +1,65 @@
+"""
+Latency benchmark for the autocomplete suggestion index.
+
+Builds the prefix index from synthetic article titles, locations and
+categories, then times lookups for every 2-6 character prefix of the
+indexed words and reports build time, index size and p50/p99 latency.
+
+Usage: python benchmarks/bench_suggestions.py [articles] [locations]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.search.suggest import SuggestionIndex
+from src.search.text import split_words
+
+WORDS = (
+    "marrakech medina souk riad jardin majorelle koutoubia djemaa fna atlas "
+    "mountains desert agafay ourika valley hammam tagine couscous bahia palace "
+    "saadian tombs menara gardens mellah ben youssef madrasa guide tips food "
+    "nuit rooftop cafe artisan tannery camel trek sunset berber village"
+).split()
+
+def make_entries(article_count, location_count):
+    rng = random.Random(42)
+    entries = []
+    for i in range(article_count):
+        title = ' '.join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(3, 8)))
+        entries.append((f"{title} {i}", 'article', {"id": str(i)}, rng.randint(0, 5000)))
+    for i in range(location_count):
+        name = ' '.join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 3)))
+        entries.append((f"{name} {i}", 'location', {"count": i % 50 + 1}, i % 50 + 1))
+    for word in WORDS[:20]:
+        entries.append((word.capitalize(), 'category', {"id": word}, 0))
+    return entries
+
+def main():
+    article_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    location_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    entries = make_entries(article_count, location_count)
+
+    index = SuggestionIndex()
+    start = time.perf_counter()
+    index.prefixes, index.entry_count = index.build(entries)
+    index.built_at = time.time()
+    index.build_seconds = round(time.perf_counter() - start, 3)
+    stats = index.stats()
+    print(f"built {stats['entries']} entries into {stats['prefixes']} prefixes in {stats['buildSeconds']} s")
+
+    queries = sorted({word[:end] for text, *_ in entries for word in split_words(text) for end in range(2, 7)})
+    timings = []
+    for query in queries * 5:
+        start = time.perf_counter()
+        index.suggest(query, 10)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"{len(timings)} lookups: p50 {p50:.1f} us, p99 {p99:.1f} us, max {timings[-1] * 1e6:.1f} us")
+
+if __name__ == '__main__':
+    main()
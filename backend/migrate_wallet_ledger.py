@@ -0,0 +1,43 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from src.analytics.wallet_stats import wallet_stats
+from src.models.database import mongo_db
+from src.models.wallet import Wallet
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Get MongoDB URI from environment variables
+MONGO_URI = os.getenv("MONGO_URI") or os.getenv("MONGODB_URI")
+
+if not MONGO_URI:
+    print("Error: MONGODB_URI environment variable not set. Please set it in your .env file.")
+    exit(1)
+
+# Connect to MongoDB
+try:
+    mongo_db.client = MongoClient(MONGO_URI)
+    mongo_db.db = mongo_db.client.get_default_database()
+    mongo_db.db.wallet_transactions.create_index("transactionId", unique=True)
+    print(f"Successfully connected to MongoDB: {mongo_db.db.name}")
+except Exception as e:
+    print(f"Error connecting to MongoDB: {e}")
+    exit(1)
+
+# --- Move embedded wallet.transactions arrays into the ledger ---
+batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+print("Migrating embedded wallet transactions...")
+users_migrated, inserted = Wallet.migrate_embedded(batch_size)
+print(f"Moved {inserted} transactions out of {users_migrated} user documents.")
+
+# --- Finish ledger entries left pending by interrupted requests ---
+settled = Wallet.settle_pending(datetime.utcnow() - timedelta(minutes=5))
+print(f"Settled {settled} pending wallet transactions.")
+
+# --- Rebuild wallet statistics from the migrated ledger ---
+report = wallet_stats.reconcile(days=wallet_stats.reconcile_days, fix=True)
+print(f"Rebuilt wallet statistics ({len(report['mismatches'])} documents corrected).")
@@ -0,0 +1,78 @@
+from pymongo import UpdateOne
+
+from src.models.database import mongo_db
+from src.utils.population import to_object_id
+
+# Counter maintained on the user document for each kind of contribution
+ACTIVITY_COUNTERS = {
+    'article': 'activity.articleCount',
+    'review': 'activity.reviewCount'
+}
+
+LEADERBOARD_FIELDS = {"firstName": 1, "lastName": 1, "username": 1, "role": 1, "activity": 1}
+
+def record_activity(user_id, kind, delta=1):
+    """Adjust a user's contribution counters after a create (+1) or delete (-1)"""
+    oid = to_object_id(user_id)
+    if oid is None:
+        return
+    mongo_db.db.users.update_one(
+        {"_id": oid},
+        {"$inc": {ACTIVITY_COUNTERS[kind]: delta, "activity.total": delta}}
+    )
+
+def top_active_users(limit=10):
+    """Most active users by articles + reviews, read from the activity.total index"""
+    users = mongo_db.db.users.find(
+        {"activity.total": {"$gt": 0}},
+        LEADERBOARD_FIELDS
+    ).sort([("activity.total", -1), ("_id", 1)]).limit(limit)
+
+    leaderboard = []
+    for user in users:
+        activity = user.pop('activity', {})
+        user['articleCount'] = activity.get('articleCount', 0)
+        user['reviewCount'] = activity.get('reviewCount', 0)
+        user['totalActivity'] = activity.get('total', 0)
+        leaderboard.append(user)
+    return leaderboard
+
+def _count_by_author(collection, field):
+    counts = {}
+    for group in collection.aggregate([{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]):
+        oid = to_object_id(group['_id'])
+        if oid is not None:
+            counts[oid] = counts.get(oid, 0) + group['count']
+    return counts
+
+def backfill_activity(batch_size=1000):
+    """Recompute every user's activity counters from articles and reviews
+
+    Users with counters but no remaining contributions are reset to zero.
+    Returns the number of users updated.
+    """
+    articles = _count_by_author(mongo_db.db.articles, 'author')
+    reviews = _count_by_author(mongo_db.db.reviews, 'author')
+    # Reviews created through the reviews blueprint reference their author by author_id
+    for oid, count in _count_by_author(mongo_db.db.reviews, 'author_id').items():
+        reviews[oid] = reviews.get(oid, 0) + count
+
+    expected = {}
+    for oid in set(articles) | set(reviews):
+        article_count, review_count = articles.get(oid, 0), reviews.get(oid, 0)
+        expected[oid] = {"articleCount": article_count, "reviewCount": review_count, "total": article_count + review_count}
+
+    # Users whose stored counters no longer match anything
+    for user in mongo_db.db.users.find({"activity.total": {"$gt": 0}}, {"_id": 1}):
+        expected.setdefault(user['_id'], {"articleCount": 0, "reviewCount": 0, "total": 0})
+
+    updated = 0
+    operations = []
+    for oid, activity in expected.items():
+        operations.append(UpdateOne({"_id": oid}, {"$set": {"activity": activity}}))
+        if len(operations) >= batch_size:
+            updated += mongo_db.db.users.bulk_write(operations, ordered=False).matched_count
+            operations = []
+    if operations:
+        updated += mongo_db.db.users.bulk_write(operations, ordered=False).matched_count
+    return updated
@@ -0,0 +1,184 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+
+from bson import ObjectId
+from flask import current_app
+
+from src.models.database import mongo_db
+from src.utils.audit import audit_partitions
+
+EXPORT_FORMATS = ('ndjson', 'csv', 'columnar')
+
+# Exportable datasets: source collection, date field used for ranges and
+# the exported columns (dotted paths into the document)
+EXPORT_DATASETS = {
+    "users": {
+        "collection": "users",
+        "dateField": "createdAt",
+        "fields": [
+            "_id", "username", "email", "firstName", "lastName", "role", "isActive",
+            "isEmailVerified", "wallet.balance", "activity.total", "createdAt", "lastLogin"
+        ]
+    },
+    "articles": {
+        "collection": "articles",
+        "dateField": "createdAt",
+        "fields": [
+            "_id", "title", "slug", "author", "category", "tags", "status",
+            "views", "likes", "publishedAt", "createdAt", "updatedAt"
+        ]
+    },
+    "reviews": {
+        "collection": "reviews",
+        "dateField": "createdAt",
+        "fields": [
+            "_id", "title", "rating", "author", "location.name", "status",
+            "helpfulVotes", "createdAt", "updatedAt"
+        ]
+    },
+    "coupon_usage": {
+        "collection": "coupon_usage",
+        "dateField": "usedAt",
+        "fields": ["_id", "couponId", "userId", "orderAmount", "discountAmount", "usedAt"]
+    },
+    "audit_logs": {
+        "collection": "audit_logs",
+        "partitioned": True,
+        "dateField": "timestamp",
+        "fields": ["_id", "user", "action", "resource", "resourceId", "ipAddress", "userAgent", "timestamp"]
+    }
+}
+
+# Rows fetched per cursor batch and encoded per yielded chunk
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+# Rows per column block in the columnar format
+ROW_GROUP_SIZE = 10000
+
+def _get_path(doc, path):
+    value = doc
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def _scalar(value):
+    """Convert a BSON value to a plain JSON/CSV value"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return [_scalar(item) for item in value]
+    return value
+
+def _csv_value(value):
+    value = _scalar(value)
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ';'.join('' if item is None else str(item) for item in value)
+    return value
+
+def iter_rows(dataset, start=None, end=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield flat export rows for a dataset, oldest first, one cursor batch at a time"""
+    spec = EXPORT_DATASETS[dataset]
+    date_field = spec['dateField']
+    query = {}
+    if start or end:
+        query[date_field] = {}
+        if start:
+            query[date_field]['$gte'] = start
+        if end:
+            query[date_field]['$lt'] = end
+
+    projection = {field: 1 for field in spec['fields'] if field != '_id'}
+    if spec.get('partitioned'):
+        # Monthly audit log partitions, oldest first
+        collections = audit_partitions.collections(start, end)[::-1]
+    else:
+        collections = [mongo_db.db[spec['collection']]]
+
+    for collection in collections:
+        cursor = collection.find(query, projection) \
+            .sort([(date_field, 1), ("_id", 1)]) \
+            .batch_size(batch_size)
+
+        for doc in cursor:
+            yield {field: _scalar(_get_path(doc, field)) for field in spec['fields']}
+
+def _chunked(lines, batch_size):
+    """Join encoded lines into chunks so the response is not written row by row"""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= batch_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+def stream_ndjson(rows, batch_size=DEFAULT_BATCH_SIZE):
+    dumps = current_app.json.dumps
+    return _chunked((dumps(row) + '\n' for row in rows), batch_size)
+
+def stream_csv(rows, fields, batch_size=DEFAULT_BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def lines():
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow([_csv_value(row[field]) for field in fields])
+            line = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            yield line
+        line = buffer.getvalue()
+        if line:
+            yield line
+
+    return _chunked(lines(), batch_size)
+
+def stream_columnar(rows, fields, row_group_size=ROW_GROUP_SIZE):
+    """Gzip-compressed column blocks, one NDJSON object per row group
+
+    Each line is {"rows": n, "columns": {field: [values...]}}, so a reader
+    can load one column of one row group at a time. Only one row group is
+    held in memory while encoding.
+    """
+    dumps = current_app.json.dumps
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def encode(columns, count):
+        return compressor.compress((dumps({"rows": count, "columns": columns}) + '\n').encode('utf-8'))
+
+    columns = {field: [] for field in fields}
+    count = 0
+    for row in rows:
+        for field in fields:
+            columns[field].append(row[field])
+        count += 1
+        if count >= row_group_size:
+            yield encode(columns, count)
+            columns = {field: [] for field in fields}
+            count = 0
+    if count:
+        yield encode(columns, count)
+    yield compressor.flush()
+
+def export_stream(dataset, format_type, start=None, end=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Return (generator, mimetype, filename) for a streaming export"""
+    fields = EXPORT_DATASETS[dataset]['fields']
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    rows = iter_rows(dataset, start, end, batch_size)
+    stamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+
+    if format_type == 'csv':
+        return stream_csv(rows, fields, batch_size), 'text/csv', f"{dataset}-{stamp}.csv"
+    if format_type == 'columnar':
+        return stream_columnar(rows, fields), 'application/gzip', f"{dataset}-{stamp}.columns.ndjson.gz"
+    return stream_ndjson(rows, batch_size), 'application/x-ndjson', f"{dataset}-{stamp}.ndjson"
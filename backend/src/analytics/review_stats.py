@@ -0,0 +1,170 @@
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from src.models.database import (
+    mongo_db, acquire_lease, create_review_bucket_indexes, get_lease, lease_owner, release_lease
+)
+from src.utils.population import to_object_id
+
+META_ID = 'meta'
+APPROVED_STATUS = 'approved'
+
+REBUILD_LEASE = 'review-buckets-rebuild'
+REBUILD_LEASE_SECONDS = 300
+REBUILD_BATCH_SIZE = 1000
+STAGING_PREFIX = 'review_buckets_rebuild_'
+MAX_OBJECT_ID = ObjectId('f' * 24)
+
+def _created_at(review):
+    created = review.get('createdAt') or review.get('created_at')
+    return created if isinstance(created, datetime) else None
+
+def _location_name(review):
+    location = review.get('location')
+    if isinstance(location, dict):
+        return location.get('name') or ''
+    return location or ''
+
+def review_contributions(review):
+    """Bucket counters a single review contributes to
+
+    Returns {bucket_id: ({field: increment}, {field: value to $set})}.
+    """
+    if not review:
+        return {}
+
+    status = review.get('status') or 'unknown'
+    rating = review.get('rating')
+    approved = status == APPROVED_STATUS and isinstance(rating, (int, float))
+    buckets = {}
+
+    created = _created_at(review)
+    if created:
+        for period, key in (('month', created.strftime('%Y-%m')), ('day', created.strftime('%Y-%m-%d'))):
+            inc = {f"status.{status}": 1}
+            if approved:
+                inc.update({"count": 1, "ratingSum": rating, f"ratings.{int(rating)}": 1})
+            buckets[f"{period}:{key}"] = (inc, {"type": period, "key": key})
+
+    name = _location_name(review)
+    if approved and name:
+        buckets[f"location:{name}"] = ({"count": 1, "ratingSum": rating}, {"type": "location", "name": name})
+
+    moderator = to_object_id(review.get('moderatedBy'))
+    if moderator is not None:
+        buckets[f"moderator:{moderator}"] = ({f"decisions.{status}": 1}, {"type": "moderator", "moderator": moderator})
+
+    return buckets
+
+def _bucket_updates(deltas):
+    return [
+        UpdateOne({"_id": bucket_id}, {"$inc": inc, "$set": fields}, upsert=True)
+        for bucket_id, (inc, fields) in deltas.items()
+        if inc
+    ]
+
+def apply_review_change(before, after):
+    """Move a review's contributions from its old state to its new one
+
+    ``before`` is None for a created review and ``after`` is None for a
+    deleted one. Only the counters that actually change are written, in
+    a single bulk request.
+    """
+    deltas = {}
+    for sign, review in ((-1, before), (1, after)):
+        for bucket_id, (inc, fields) in review_contributions(review).items():
+            bucket_inc, _ = deltas.setdefault(bucket_id, ({}, fields))
+            for field, value in inc.items():
+                bucket_inc[field] = bucket_inc.get(field, 0) + sign * value
+
+    for bucket_id, (inc, fields) in deltas.items():
+        for field in [field for field, value in inc.items() if value == 0]:
+            del inc[field]
+
+    operations = _bucket_updates(deltas)
+    if operations:
+        try:
+            mongo_db.db.review_buckets.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # Buckets are rebuilt from the reviews collection if they drift
+            print(f"Review analytics update error: {e}")
+
+        try:
+            # A running rebuild has already counted this review's old state
+            # if its scan got past the review. Routes pass _id as a str.
+            rebuild = get_lease(REBUILD_LEASE)
+            review_id = to_object_id((after or before).get('_id'))
+            if rebuild and rebuild.get('scannedThrough') and review_id is not None \
+                    and review_id <= rebuild['scannedThrough']:
+                mongo_db.db[rebuild['collection']].bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"Review analytics rebuild mirror error: {e}")
+
+def rebuild_review_buckets():
+    """Recompute every bucket from the reviews collection
+
+    Buckets are built in a staging collection that replaces
+    ``review_buckets`` in one rename, under a lease so only one rebuild
+    runs at a time across processes. While the scan runs, changes to
+    reviews it has already passed are applied to the staging collection
+    as well (see apply_review_change). A change landing while its batch
+    is being read, or during the rename itself, can still be missed until
+    the next rebuild. Returns the number of buckets, or None if another
+    rebuild holds the lease.
+    """
+    owner = lease_owner()
+    staging = f"{STAGING_PREFIX}{ObjectId()}"
+    if not acquire_lease(REBUILD_LEASE, owner, REBUILD_LEASE_SECONDS, collection=staging, scannedThrough=None):
+        return None
+
+    try:
+        # Staging collections left behind by rebuilds that died
+        for name in mongo_db.db.list_collection_names(filter={"name": {"$regex": f"^{STAGING_PREFIX}"}}):
+            mongo_db.db.drop_collection(name)
+
+        totals = {}
+        projection = {"status": 1, "rating": 1, "createdAt": 1, "created_at": 1, "location": 1, "moderatedBy": 1}
+        scanned = 0
+        for review in mongo_db.db.reviews.find({}, projection).sort("_id", 1).batch_size(REBUILD_BATCH_SIZE):
+            for bucket_id, (inc, fields) in review_contributions(review).items():
+                bucket_inc, _ = totals.setdefault(bucket_id, (defaultdict(int), fields))
+                for field, value in inc.items():
+                    bucket_inc[field] += value
+            scanned += 1
+            if scanned % REBUILD_BATCH_SIZE == 0:
+                acquire_lease(REBUILD_LEASE, owner, REBUILD_LEASE_SECONDS, collection=staging, scannedThrough=review['_id'])
+
+        # From here on every change is applied to the staging collection too
+        acquire_lease(REBUILD_LEASE, owner, REBUILD_LEASE_SECONDS, collection=staging, scannedThrough=MAX_OBJECT_ID)
+
+        collection = mongo_db.db[staging]
+        create_review_bucket_indexes(collection)
+        operations = _bucket_updates(totals)
+        for start in range(0, len(operations), 1000):
+            collection.bulk_write(operations[start:start + 1000], ordered=False)
+        collection.replace_one({"_id": META_ID}, {"_id": META_ID, "builtAt": datetime.utcnow()}, upsert=True)
+        collection.rename('review_buckets', dropTarget=True)
+        return len(operations)
+    finally:
+        release_lease(REBUILD_LEASE, owner)
+
+def ensure_review_buckets(timeout=60):
+    """Build the buckets once if they have never been computed
+
+    If another process is already building them, wait (up to ``timeout``
+    seconds) for that build instead of starting a second one.
+    """
+    deadline = time.monotonic() + timeout
+    while mongo_db.db.review_buckets.find_one({"_id": META_ID}, {"_id": 1}) is None:
+        if rebuild_review_buckets() is not None:
+            return
+        if time.monotonic() > deadline:
+            raise RuntimeError("Timed out waiting for review analytics to be built")
+        time.sleep(0.5)
+
+def get_buckets(bucket_type, **query):
+    return mongo_db.db.review_buckets.find({"type": bucket_type, **query})
@@ -0,0 +1,273 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from src.models.database import mongo_db
+
+TOTALS_ID = 'totals'
+DAY_FORMAT = '%Y-%m-%d'
+
+# Counters compared by reconcile()
+DAY_COUNTERS = ('newUsers', 'newArticles', 'newReviews', 'ratings', 'wallet')
+
+def day_start(value):
+    """Midnight (UTC) of the day containing value"""
+    return datetime(value.year, value.month, value.day)
+
+def day_key(value):
+    return value.strftime(DAY_FORMAT)
+
+def _first(results, default):
+    results = list(results)
+    if not results:
+        return default
+    result = results[0]
+    result.pop('_id', None)
+    return result
+
+class DashboardRollups:
+    """Materialized counters behind the admin and analytics dashboards
+
+    ``analytics_rollups`` holds one document per UTC day with the counters
+    that can be bucketed by creation date (new users/articles/reviews,
+    rating histogram, wallet activity), plus a ``totals`` document with the
+    current-state figures (counts, distributions, storage).
+
+    Dashboards read the totals document and O(days) day documents. A
+    compaction pass recomputes the totals and the still-open days every
+    ``refresh_interval`` seconds. A day document is marked ``final`` only
+    when it was computed after the day left the open window; closed days
+    are computed once and can be checked against the source collections
+    with reconcile().
+    """
+
+    def __init__(self, refresh_interval=None, open_days=None):
+        self.refresh_interval = refresh_interval or int(os.getenv('ROLLUP_REFRESH_SECONDS', 300))
+        # Days still receiving writes (late review approvals, edits)
+        self.open_days = open_days or int(os.getenv('ROLLUP_OPEN_DAYS', 2))
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return mongo_db.db.analytics_rollups
+
+    # Computation from source collections
+
+    @staticmethod
+    def compute_day(day):
+        """Compute the counters for one UTC day from the source collections"""
+        start = day_start(day)
+        created = {"$gte": start, "$lt": start + timedelta(days=1)}
+
+        ratings = mongo_db.db.reviews.aggregate([
+            {"$match": {"createdAt": created, "status": "approved"}},
+            {"$group": {"_id": "$rating", "count": {"$sum": 1}}}
+        ])
+        wallet = mongo_db.db.wallet_transactions.aggregate([
+            {"$match": {"timestamp": created, "status": "committed"}},
+            {"$group": {"_id": "$type", "count": {"$sum": 1}, "amount": {"$sum": "$amount"}}}
+        ])
+
+        return {
+            "_id": day_key(start),
+            "date": start,
+            "newUsers": mongo_db.db.users.count_documents({"createdAt": created}),
+            "newArticles": mongo_db.db.articles.count_documents({"createdAt": created}),
+            "newReviews": mongo_db.db.reviews.count_documents({"createdAt": created}),
+            "ratings": {str(rating['_id']): rating['count'] for rating in ratings if rating['_id'] is not None},
+            "wallet": {
+                entry['_id']: {"count": entry['count'], "amount": entry['amount']}
+                for entry in wallet if entry['_id']
+            }
+        }
+
+    @staticmethod
+    def compute_totals():
+        """Compute the current-state figures, one aggregation per collection"""
+        # Wallet balances come from wallet_stats, which is kept current per transaction
+        roles = list(mongo_db.db.users.aggregate([
+            {"$group": {"_id": "$role", "count": {"$sum": 1}}}
+        ]))
+
+        articles = _first(mongo_db.db.articles.aggregate([
+            {
+                "$facet": {
+                    "status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                    "stats": [{
+                        "$group": {
+                            "_id": None,
+                            "totalViews": {"$sum": "$views"},
+                            "totalLikes": {"$sum": "$likes"},
+                            "avgViews": {"$avg": "$views"},
+                            "avgLikes": {"$avg": "$likes"}
+                        }
+                    }],
+                    "topCategories": [
+                        {"$match": {"status": "published"}},
+                        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                        {"$sort": {"count": -1}},
+                        {"$limit": 10}
+                    ]
+                }
+            }
+        ]), {"status": [], "stats": [], "topCategories": []})
+
+        reviews = _first(mongo_db.db.reviews.aggregate([
+            {
+                "$facet": {
+                    "status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                    "ratings": [
+                        {"$match": {"status": "approved"}},
+                        {"$group": {"_id": "$rating", "count": {"$sum": 1}}},
+                        {"$sort": {"_id": 1}}
+                    ]
+                }
+            }
+        ]), {"status": [], "ratings": []})
+
+        storage = _first(mongo_db.db.uploads.aggregate([
+            {"$group": {"_id": None, "totalFiles": {"$sum": 1}, "totalSize": {"$sum": "$size"}}}
+        ]), {"totalFiles": 0, "totalSize": 0})
+
+        article_status = {entry['_id']: entry['count'] for entry in articles['status']}
+        review_status = {entry['_id']: entry['count'] for entry in reviews['status']}
+
+        return {
+            "_id": TOTALS_ID,
+            "totalUsers": sum(entry['count'] for entry in roles),
+            "totalArticles": sum(article_status.values()),
+            "totalReviews": sum(review_status.values()),
+            "totalCategories": mongo_db.db.categories.estimated_document_count(),
+            "pendingReviews": review_status.get('pending', 0),
+            "draftArticles": article_status.get('draft', 0),
+            "userRoles": roles,
+            "articleStatus": articles['status'],
+            "reviewStatus": reviews['status'],
+            "articleStats": _first(articles['stats'], {"totalViews": 0, "totalLikes": 0, "avgViews": 0, "avgLikes": 0}),
+            "ratingDistribution": reviews['ratings'],
+            "topCategories": articles['topCategories'],
+            "storage": storage
+        }
+
+    # Compaction
+
+    def is_closed(self, day, now=None):
+        """Whether a day is past the open window and no longer receives writes"""
+        return (now or datetime.utcnow()) >= day_start(day) + timedelta(days=self.open_days)
+
+    def store_day(self, day):
+        doc = self.compute_day(day)
+        doc['computedAt'] = datetime.utcnow()
+        doc['final'] = self.is_closed(day, doc['computedAt'])
+        self.collection.replace_one({"_id": doc['_id']}, doc, upsert=True)
+        return doc
+
+    def refresh(self):
+        """Recompute the totals and the open days; concurrent calls collapse into one"""
+        with self._lock:
+            if self._refreshing:
+                return None
+            self._refreshing = True
+
+        try:
+            today = day_start(datetime.utcnow())
+            for offset in range(self.open_days):
+                self.store_day(today - timedelta(days=offset))
+
+            totals = self.compute_totals()
+            totals['computedAt'] = datetime.utcnow()
+            self.collection.replace_one({"_id": TOTALS_ID}, totals, upsert=True)
+            return totals
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get_totals(self):
+        """Return the totals document, refreshing it when missing or stale"""
+        totals = self.collection.find_one({"_id": TOTALS_ID})
+        if totals is None:
+            totals = self.refresh() or self.collection.find_one({"_id": TOTALS_ID})
+            if totals is None:
+                # The first refresh is still running in another thread
+                totals = self.compute_totals()
+                totals['computedAt'] = datetime.utcnow()
+        elif datetime.utcnow() - totals['computedAt'] > timedelta(seconds=self.refresh_interval) and not self._refreshing:
+            threading.Thread(target=self.refresh, name='rollup-refresh', daemon=True).start()
+        return totals
+
+    def get_days(self, start, end):
+        """Return one rollup per day from start to end (inclusive), oldest first
+
+        Days that have never been compacted, or were stored while still open
+        and have closed since, are computed and stored on the way.
+        """
+        start, end = day_start(start), day_start(end)
+        stored = {
+            doc['_id']: doc
+            for doc in self.collection.find({"date": {"$gte": start, "$lte": end}})
+        }
+
+        days = []
+        day = start
+        while day <= end:
+            doc = stored.get(day_key(day))
+            if doc is None or (not doc.get('final') and self.is_closed(day)):
+                doc = self.store_day(day)
+            days.append(doc)
+            day += timedelta(days=1)
+        return days
+
+    def rebuild(self, days):
+        """Recompute the last ``days`` days and the totals"""
+        today = day_start(datetime.utcnow())
+        for offset in range(days):
+            self.store_day(today - timedelta(days=offset))
+        return self.refresh()
+
+    def reconcile(self, days, fix=False):
+        """Compare stored rollups for the last ``days`` days with a full recompute
+
+        Returns the mismatching counters per day (and for the totals).
+        With ``fix`` the recomputed values replace the stored ones.
+        """
+        today = day_start(datetime.utcnow())
+        stored = {
+            doc['_id']: doc
+            for doc in self.collection.find({"date": {"$gte": today - timedelta(days=days - 1)}})
+        }
+
+        mismatches = {}
+        for offset in range(days):
+            expected = self.compute_day(today - timedelta(days=offset))
+            actual = stored.get(expected['_id'])
+            if actual is None:
+                continue
+            diff = {
+                field: {"stored": actual.get(field), "actual": expected[field]}
+                for field in DAY_COUNTERS
+                if actual.get(field) != expected[field]
+            }
+            if diff:
+                mismatches[expected['_id']] = diff
+                if fix:
+                    self.store_day(expected['date'])
+
+        totals = self.collection.find_one({"_id": TOTALS_ID})
+        if totals:
+            expected = self.compute_totals()
+            diff = {
+                field: {"stored": totals.get(field), "actual": value}
+                for field, value in expected.items()
+                if field in ('totalUsers', 'totalArticles', 'totalReviews', 'pendingReviews', 'draftArticles')
+                and totals.get(field) != value
+            }
+            if diff:
+                mismatches[TOTALS_ID] = diff
+                if fix:
+                    self.refresh()
+
+        return {"checkedDays": days, "missingDays": days - len(stored), "mismatches": mismatches}
+
+# Global dashboard rollups instance
+dashboard_rollups = DashboardRollups()
@@ -0,0 +1,276 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from src.analytics.rollups import day_key, day_start
+from src.models.database import mongo_db
+
+TOTALS_ID = 'totals'
+TRANSACTION_TYPES = ('credit', 'debit')
+# Recomputes of a document before reconcile() gives up on it until the next run
+RECONCILE_ATTEMPTS = 3
+
+def _day_id(day):
+    return f"day:{day_key(day)}"
+
+def _source_key(source):
+    # Field names cannot contain dots
+    return (source or 'other').replace('.', '_')
+
+def _round(value):
+    return round(value or 0, 2)
+
+def _diff(stored, expected, fields):
+    """Fields whose stored counters differ from the recomputed ones"""
+    diff = {}
+    for field in fields:
+        current, actual = stored.get(field), expected.get(field)
+        if isinstance(actual, dict) or isinstance(current, dict):
+            matches = (
+                (current or {}).get('count', 0) == (actual or {}).get('count', 0)
+                and _round((current or {}).get('amount')) == _round((actual or {}).get('amount'))
+            )
+        else:
+            matches = _round(current) == _round(actual)
+        if not matches:
+            diff[field] = {"stored": current, "actual": actual}
+    return diff
+
+class WalletStats:
+    """Wallet statistics kept up to date with every committed transaction
+
+    ``wallet_stats`` holds a ``totals`` document (total balance, holder
+    count, credit/debit volume and per-source totals such as
+    ``reward:review_approved``) and one ``day:YYYY-MM-DD`` document per
+    day with that day's credit/debit volume. Each commit applies a
+    single ``$inc`` to both, so reads are O(1).
+
+    Balances changed outside the ledger and deleted users make the
+    counters drift. reconcile() recomputes them from a full scan and is
+    run in the background every ``reconcile_interval`` seconds. Every
+    ``$inc`` also bumps the document's ``version``, so reconcile() never
+    overwrites increments that landed while it was scanning.
+    """
+
+    def __init__(self, reconcile_interval=None, reconcile_days=7):
+        self.reconcile_interval = reconcile_interval or int(os.getenv('WALLET_STATS_RECONCILE_SECONDS', 3600))
+        self.reconcile_days = reconcile_days
+        self._reconciling = False
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return mongo_db.db.wallet_stats
+
+    def record(self, entry):
+        """Apply a committed ledger entry to the counters"""
+        amount = entry['amount']
+        signed = amount if entry['type'] == 'credit' else -amount
+        after = entry['balanceAfter']
+        before = after - signed
+        holders = 1 if before <= 0 < after else -1 if after <= 0 < before else 0
+        source = _source_key(entry.get('source'))
+        day = day_start(entry['timestamp'])
+
+        operations = [
+            # The totals document is only created by a full rebuild
+            UpdateOne({"_id": TOTALS_ID}, {
+                "$inc": {
+                    "version": 1,
+                    "totalBalance": signed,
+                    "holders": holders,
+                    f"{entry['type']}.count": 1,
+                    f"{entry['type']}.amount": amount,
+                    f"sources.{source}.count": 1,
+                    f"sources.{source}.amount": amount
+                }
+            }),
+            UpdateOne({"_id": _day_id(day)}, {
+                "$inc": {"version": 1, f"{entry['type']}.count": 1, f"{entry['type']}.amount": amount},
+                "$setOnInsert": {"date": day}
+            }, upsert=True)
+        ]
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # Corrected by the next reconcile
+            print(f"Wallet stats update error: {e}")
+
+    # Computation from source collections
+
+    @staticmethod
+    def compute_totals():
+        balances = list(mongo_db.db.users.aggregate([
+            {
+                "$group": {
+                    "_id": None,
+                    "totalBalance": {"$sum": "$wallet.balance"},
+                    "holders": {"$sum": {"$cond": [{"$gt": ["$wallet.balance", 0]}, 1, 0]}}
+                }
+            }
+        ]))
+        totals = {
+            "_id": TOTALS_ID,
+            "totalBalance": balances[0]['totalBalance'] if balances else 0,
+            "holders": balances[0]['holders'] if balances else 0,
+            "credit": {"count": 0, "amount": 0},
+            "debit": {"count": 0, "amount": 0},
+            "sources": {}
+        }
+
+        volumes = mongo_db.db.wallet_transactions.aggregate([
+            {"$match": {"status": "committed"}},
+            {
+                "$group": {
+                    "_id": {"type": "$type", "source": "$source"},
+                    "count": {"$sum": 1},
+                    "amount": {"$sum": "$amount"}
+                }
+            }
+        ])
+        for volume in volumes:
+            transaction_type = volume['_id'].get('type')
+            if transaction_type in TRANSACTION_TYPES:
+                totals[transaction_type]['count'] += volume['count']
+                totals[transaction_type]['amount'] += volume['amount']
+            source = totals['sources'].setdefault(_source_key(volume['_id'].get('source')), {"count": 0, "amount": 0})
+            source['count'] += volume['count']
+            source['amount'] += volume['amount']
+        return totals
+
+    @staticmethod
+    def compute_day(day):
+        start = day_start(day)
+        doc = {"_id": _day_id(start), "date": start}
+        volumes = mongo_db.db.wallet_transactions.aggregate([
+            {"$match": {"timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}, "status": "committed"}},
+            {"$group": {"_id": "$type", "count": {"$sum": 1}, "amount": {"$sum": "$amount"}}}
+        ])
+        for volume in volumes:
+            if volume['_id'] in TRANSACTION_TYPES:
+                doc[volume['_id']] = {"count": volume['count'], "amount": volume['amount']}
+        return doc
+
+    # Reads
+
+    def get_totals(self):
+        """Return the totals document, building it on first use and reconciling it when stale"""
+        totals = self.collection.find_one({"_id": TOTALS_ID})
+        if totals is None:
+            self.reconcile(fix=True)
+            totals = self.collection.find_one({"_id": TOTALS_ID})
+            if totals is None:
+                # The first reconcile is still running in another thread
+                totals = self.compute_totals()
+                totals['reconciledAt'] = datetime.utcnow()
+        elif datetime.utcnow() - totals['reconciledAt'] > timedelta(seconds=self.reconcile_interval) and not self._reconciling:
+            threading.Thread(target=self.reconcile, kwargs={"fix": True}, name='wallet-stats-reconcile', daemon=True).start()
+        return totals
+
+    def summary(self):
+        """Balance figures shown on the admin and analytics dashboards"""
+        totals = self.get_totals()
+        users = mongo_db.db.users.estimated_document_count()
+        return {
+            "totalBalance": totals['totalBalance'],
+            "avgBalance": totals['totalBalance'] / users if users else 0,
+            "usersWithWallet": totals['holders']
+        }
+
+    def get_days(self, start, end):
+        """Credit/debit volume per day from start to end (inclusive), oldest first"""
+        start, end = day_start(start), day_start(end)
+        stored = {doc['_id']: doc for doc in self.collection.find({"date": {"$gte": start, "$lte": end}})}
+
+        days = []
+        day = start
+        while day <= end:
+            doc = stored.get(_day_id(day), {})
+            days.append({
+                "date": day_key(day),
+                **{transaction_type: doc.get(transaction_type, {"count": 0, "amount": 0}) for transaction_type in TRANSACTION_TYPES}
+            })
+            day += timedelta(days=1)
+        return days
+
+    # Reconciliation
+
+    def reconcile(self, days=None, fix=False):
+        """Compare the counters with a full scan of users and the ledger
+
+        Checks the totals and the last ``days`` day documents. Returns the
+        mismatches; with ``fix`` the recomputed values replace the stored
+        ones, and documents that kept changing under the scan are listed as
+        ``unfixed``. Concurrent calls collapse into one (returning None).
+        """
+        with self._lock:
+            if self._reconciling:
+                return None
+            self._reconciling = True
+
+        try:
+            days = days or self.reconcile_days
+            mismatches = {}
+            unfixed = []
+
+            diff, fixed = self._reconcile_document(
+                TOTALS_ID, self.compute_totals, ('totalBalance', 'holders') + TRANSACTION_TYPES, fix, stamp=True
+            )
+            if diff:
+                mismatches[TOTALS_ID] = diff
+            if not fixed:
+                unfixed.append(TOTALS_ID)
+
+            today = day_start(datetime.utcnow())
+            for offset in range(days):
+                day = today - timedelta(days=offset)
+                diff, fixed = self._reconcile_document(_day_id(day), lambda: self.compute_day(day), TRANSACTION_TYPES, fix)
+                if diff:
+                    mismatches[_day_id(day)] = diff
+                if not fixed:
+                    unfixed.append(_day_id(day))
+
+            return {"checkedDays": days, "fixed": fix, "mismatches": mismatches, "unfixed": unfixed}
+        finally:
+            with self._lock:
+                self._reconciling = False
+
+    def _reconcile_document(self, doc_id, compute, fields, fix, stamp=False):
+        """Compare one stored document with compute() and optionally correct it
+
+        The recomputed document replaces the stored one only if its
+        ``version`` is unchanged, i.e. no record() landed during the scan;
+        otherwise it is recomputed. A scan cannot tell which of the
+        increments landing during it it counted, so if writes keep landing
+        the counters are left as they are and the document is flagged
+        ``needsReconcile`` (a later successful replace drops the flag).
+        ``stamp`` always writes the document and sets ``reconciledAt``.
+        Returns the mismatching fields and whether the document was settled.
+        """
+        for _ in range(RECONCILE_ATTEMPTS):
+            stored = self.collection.find_one({"_id": doc_id}) or {}
+            expected = compute()
+            diff = _diff(stored, expected, fields)
+            if not fix or not (diff or stamp):
+                return diff, True
+
+            expected['version'] = (stored.get('version') or 0) + 1
+            if stamp:
+                expected['reconciledAt'] = datetime.utcnow()
+            if not stored:
+                try:
+                    self.collection.insert_one(expected)
+                    return diff, True
+                except DuplicateKeyError:
+                    continue
+            if self.collection.replace_one({"_id": doc_id, "version": stored.get('version')}, expected).modified_count:
+                return diff, True
+
+        self.collection.update_one({"_id": doc_id}, {"$set": {"needsReconcile": True}})
+        return diff, False
+
+# Global wallet stats instance
+wallet_stats = WalletStats()
@@ -4,7 +4,6 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory, jsonify
-from flask_pymongo import PyMongo
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -17,17 +16,26 @@ app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'sta
 # Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'marrakech-reviews-secret-key-2025')
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-marrakech-2025')
-app.config["MONGO_URI"] = os.getenv("MONGO_URI") # Remove the fallback
+app.config["MONGO_URI"] = os.getenv("MONGO_URI") or os.getenv("MONGODB_URI")
+
+# MongoDB connection pool (sized per gunicorn worker process)
+app.config['MONGO_MAX_POOL_SIZE'] = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))
+app.config['MONGO_MIN_POOL_SIZE'] = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'] = os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+app.config['MONGO_COMPRESSORS'] = os.getenv('MONGO_COMPRESSORS')  # e.g. "zstd,zlib"
+app.config['MONGO_READ_PREFERENCE'] = os.getenv('MONGO_READ_PREFERENCE', 'primary')
 
 # Initialize extensions
-mongo = PyMongo(app)
 jwt = JWTManager(app)
 CORS(app, origins="*")
 
-# Initialize MongoDB connection
-from src.models.database import mongo_db
+# Initialize the shared MongoDB client used by every model
+from src.models.database import mongo_db, MongoJSONProvider
 mongo_db.init_app(app)
 
+# Encode responses (including ObjectId/datetime values) in a single pass
+app.json = MongoJSONProvider(app)
+
 # Import and register blueprints
 from src.routes.auth import auth_bp
 from src.routes.users import users_bp
@@ -61,6 +69,14 @@ app.register_blueprint(admin_bp, url_prefix='/api/v1/admin')
 app.register_blueprint(media_bp, url_prefix='/api/v1/media')
 app.register_blueprint(coupons_bp, url_prefix='/api/v1/coupons')
 
+# Deliver scheduled notification fan-outs and resume interrupted ones
+from src.utils.fanout import notification_fanout
+notification_fanout.start()
+
+# Settle wallet transactions left pending by interrupted requests
+from src.utils.settlement import pending_settlement
+pending_settlement.start()
+
 # API info route
 @app.route('/api/v1')
 def api_info():
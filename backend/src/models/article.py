@@ -1,6 +1,6 @@
 from datetime import datetime
 from bson import ObjectId
-from src.models.database import mongo_db, serialize_doc, serialize_docs
+from src.models.database import mongo_db, serialize_doc, serialize_docs, paginate_query
 
 class Article:
     """Article model for MongoDB operations"""
@@ -78,35 +78,15 @@ class Article:
         return result.deleted_count > 0
     
     @staticmethod
-    def find_all(query=None, page=1, limit=20, sort_field="createdAt", sort_order=-1):
+    def find_all(query=None, page=1, limit=20, sort_field="createdAt", sort_order=-1, cursor=None, count='exact'):
         """Find articles with pagination"""
         if query is None:
             query = {}
         
-        skip = (page - 1) * limit
-        total = mongo_db.db.articles.count_documents(query)
-        
-        cursor = mongo_db.db.articles.find(query).sort(sort_field, sort_order).skip(skip).limit(limit)
-        articles = list(cursor)
-        
-        # Calculate pagination
-        total_pages = (total + limit - 1) // limit
-        has_next = page < total_pages
-        has_prev = page > 1
-        
-        pagination = {
-            "page": page,
-            "limit": limit,
-            "total": total,
-            "totalPages": total_pages,
-            "hasNext": has_next,
-            "hasPrev": has_prev
-        }
-        
-        return serialize_docs(articles), pagination
+        return paginate_query(mongo_db.db.articles, query, page, limit, sort_field, sort_order, cursor=cursor, count=count)
     
     @staticmethod
-    def find_published(page=1, limit=20, category=None, author=None, search=None):
+    def find_published(page=1, limit=20, category=None, author=None, search=None, cursor=None, count='exact'):
         """Find published articles"""
         query = {"status": "published"}
         
@@ -117,16 +97,16 @@ class Article:
         if search:
             query['$text'] = {'$search': search}
         
-        return Article.find_all(query, page, limit, 'publishedAt', -1)
+        return Article.find_all(query, page, limit, 'publishedAt', -1, cursor=cursor, count=count)
     
     @staticmethod
-    def find_by_author(author_id, page=1, limit=20, status=None):
+    def find_by_author(author_id, page=1, limit=20, status=None, cursor=None, count='exact'):
         """Find articles by author"""
         query = {"author": ObjectId(author_id)}
         if status:
             query['status'] = status
         
-        return Article.find_all(query, page, limit)
+        return Article.find_all(query, page, limit, cursor=cursor, count=count)
     
     @staticmethod
     def increment_views(article_id):
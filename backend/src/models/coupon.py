@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 from bson import ObjectId
-from src.models.database import mongo_db, serialize_doc, serialize_docs
+from src.models.database import mongo_db, serialize_doc, serialize_docs, paginate_query
 import random
 import string
 
@@ -76,32 +76,12 @@ class Coupon:
         return result.deleted_count > 0
     
     @staticmethod
-    def find_all(query=None, page=1, limit=20, sort_field="createdAt", sort_order=-1):
+    def find_all(query=None, page=1, limit=20, sort_field="createdAt", sort_order=-1, cursor=None, count='exact'):
         """Find coupons with pagination"""
         if query is None:
             query = {}
         
-        skip = (page - 1) * limit
-        total = mongo_db.db.coupons.count_documents(query)
-        
-        cursor = mongo_db.db.coupons.find(query).sort(sort_field, sort_order).skip(skip).limit(limit)
-        coupons = list(cursor)
-        
-        # Calculate pagination
-        total_pages = (total + limit - 1) // limit
-        has_next = page < total_pages
-        has_prev = page > 1
-        
-        pagination = {
-            "page": page,
-            "limit": limit,
-            "total": total,
-            "totalPages": total_pages,
-            "hasNext": has_next,
-            "hasPrev": has_prev
-        }
-        
-        return serialize_docs(coupons), pagination
+        return paginate_query(mongo_db.db.coupons, query, page, limit, sort_field, sort_order, cursor=cursor, count=count)
     
     @staticmethod
     def find_active():
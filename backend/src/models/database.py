@@ -1,21 +1,151 @@
 from flask import current_app
-from pymongo import MongoClient
-from bson import ObjectId
-from datetime import datetime
+from flask.json.provider import DefaultJSONProvider
+from pymongo import MongoClient, monitoring
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from bson import ObjectId, json_util
+from datetime import datetime, timedelta
+import base64
 import json
+import os
+import socket
+import threading
+
+from src.utils.cache import TTLCache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Track connection pool utilisation per server for this process"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = {}
+    
+    def _server(self, address):
+        key = f"{address[0]}:{address[1]}"
+        if key not in self._servers:
+            self._servers[key] = {
+                "open": 0,
+                "checkedOut": 0,
+                "maxCheckedOut": 0,
+                "checkOuts": 0,
+                "checkOutFailures": 0,
+                "waitQueueTimeouts": 0,
+                "created": 0,
+                "closed": 0
+            }
+        return self._servers[key]
+    
+    def pool_created(self, event):
+        with self._lock:
+            self._server(event.address)
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        with self._lock:
+            self._servers.pop(f"{event.address[0]}:{event.address[1]}", None)
+    
+    def connection_created(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server['open'] += 1
+            server['created'] += 1
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server['open'] = max(server['open'] - 1, 0)
+            server['closed'] += 1
+    
+    def connection_check_out_started(self, event):
+        pass
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server['checkOutFailures'] += 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                server['waitQueueTimeouts'] += 1
+    
+    def connection_checked_out(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server['checkedOut'] += 1
+            server['checkOuts'] += 1
+            server['maxCheckedOut'] = max(server['maxCheckedOut'], server['checkedOut'])
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server['checkedOut'] = max(server['checkedOut'] - 1, 0)
+    
+    def snapshot(self):
+        with self._lock:
+            return {address: dict(counters) for address, counters in self._servers.items()}
+
+def get_client_options(config):
+    """Build MongoClient pool/read options from the app config"""
+    options = {
+        "maxPoolSize": int(config.get('MONGO_MAX_POOL_SIZE', 100)),
+        "minPoolSize": int(config.get('MONGO_MIN_POOL_SIZE', 0)),
+        "readPreference": config.get('MONGO_READ_PREFERENCE', 'primary')
+    }
+    
+    if config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'):
+        options['waitQueueTimeoutMS'] = int(config['MONGO_WAIT_QUEUE_TIMEOUT_MS'])
+    if config.get('MONGO_COMPRESSORS'):
+        options['compressors'] = config['MONGO_COMPRESSORS']
+    
+    return options
 
 class MongoDB:
     def __init__(self):
         self.client = None
         self.db = None
+        self.options = {}
+        self.pool_monitor = PoolMonitor()
     
     def init_app(self, app):
-        self.client = MongoClient(app.config['MONGO_URI'])
+        self.options = get_client_options(app.config)
+        self.client = MongoClient(
+            app.config['MONGO_URI'],
+            event_listeners=[self.pool_monitor],
+            **self.options
+        )
         self.db = self.client.get_default_database()
         
         # Create indexes
         self.create_indexes()
     
+    def pool_stats(self):
+        """Report connection pool configuration and utilisation for this worker"""
+        servers = self.pool_monitor.snapshot()
+        max_pool_size = self.options.get('maxPoolSize', 100)
+        checked_out = sum(server['checkedOut'] for server in servers.values())
+        
+        return {
+            "pid": os.getpid(),
+            "maxPoolSize": max_pool_size,
+            "minPoolSize": self.options.get('minPoolSize', 0),
+            "waitQueueTimeoutMS": self.options.get('waitQueueTimeoutMS'),
+            "compressors": self.options.get('compressors'),
+            "readPreference": self.options.get('readPreference'),
+            "checkedOut": checked_out,
+            "utilisation": round(checked_out / max_pool_size, 4) if max_pool_size else 0,
+            "servers": servers
+        }
+    
     def create_indexes(self):
         """Create database indexes for better performance"""
         try:
@@ -23,22 +153,27 @@ class MongoDB:
             self.db.users.create_index("email", unique=True)
             self.db.users.create_index("username", unique=True)
             self.db.users.create_index("role")
-            self.db.users.create_index([("createdAt", -1)])
+            self.db.users.create_index([("createdAt", -1), ("_id", -1)])
+            self.db.users.create_index([("activity.total", -1), ("_id", 1)])
             
             # Articles collection indexes
             self.db.articles.create_index("slug", unique=True)
             self.db.articles.create_index("author")
-            self.db.articles.create_index([("status", 1), ("publishedAt", -1)])
+            self.db.articles.create_index([("status", 1), ("publishedAt", -1), ("_id", -1)])
+            self.db.articles.create_index([("author", 1), ("createdAt", -1), ("_id", -1)])
             self.db.articles.create_index([("category", 1), ("status", 1)])
             self.db.articles.create_index("tags")
+            # Rollup day counts and date-range exports, sorted by (createdAt, _id)
+            self.db.articles.create_index([("createdAt", 1), ("_id", 1)])
             self.db.articles.create_index([("title", "text"), ("content", "text")])
             
             # Reviews collection indexes
             self.db.reviews.create_index("author")
             self.db.reviews.create_index("article")
-            self.db.reviews.create_index([("status", 1), ("createdAt", -1)])
+            self.db.reviews.create_index([("status", 1), ("createdAt", -1), ("_id", -1)])
             self.db.reviews.create_index("location.name")
             self.db.reviews.create_index("rating")
+            self.db.reviews.create_index([("createdAt", 1), ("_id", 1)])
             
             # Categories collection indexes
             self.db.categories.create_index("slug", unique=True)
@@ -49,19 +184,127 @@ class MongoDB:
             self.db.settings.create_index("category")
             
             # Notifications collection indexes
-            self.db.notifications.create_index([("recipient", 1), ("isRead", 1), ("createdAt", -1)])
+            self.db.notifications.create_index([("recipient", 1), ("isRead", 1), ("createdAt", -1), ("_id", -1)])
+            self.db.notifications.create_index([("recipient", 1), ("createdAt", -1), ("_id", -1)])
+            # Fan-out jobs deliver each notification once per recipient, even when resumed
+            self.db.notifications.create_index(
+                [("job", 1), ("recipient", 1)],
+                unique=True,
+                partialFilterExpression={"job": {"$exists": True}}
+            )
+            self.db.notification_jobs.create_index([("status", 1), ("scheduledAt", 1)])
+            self.db.notification_jobs.create_index("createdAt")
+            
+            # Broadcasts are stored once; per-user read state is keyed by user id
+            self.db.broadcasts.create_index([("createdAt", -1), ("_id", -1)])
+            self.db.broadcasts.create_index("expiresAt", expireAfterSeconds=0)
+            # Read notifications expire after the retention period
+            self.ensure_ttl_index(
+                self.db.notifications,
+                "createdAt",
+                int(os.getenv('NOTIFICATION_RETENTION_DAYS', 30)) * 24 * 3600,
+                partialFilterExpression={"isRead": True}
+            )
+            
+            # Audit logs collection indexes (monthly partitions get the same ones)
+            create_audit_log_indexes(self.db.audit_logs)
+            
+            # Review analytics buckets
+            create_review_bucket_indexes(self.db.review_buckets)
+            self.db.reviews.create_index([("status", 1), ("helpfulVotes", -1)])
+            
+            # Wallet ledger
+            self.db.wallet_transactions.create_index("transactionId", unique=True)
+            self.db.wallet_transactions.create_index(
+                [("user", 1), ("idempotencyKey", 1)],
+                unique=True,
+                partialFilterExpression={"idempotencyKey": {"$exists": True}}
+            )
+            self.db.wallet_transactions.create_index([("user", 1), ("status", 1), ("timestamp", -1), ("_id", -1)])
+            self.db.wallet_transactions.create_index([("user", 1), ("type", 1), ("status", 1), ("timestamp", -1), ("_id", -1)])
+            self.db.wallet_transactions.create_index("timestamp")
+            
+            # Coupon usage (exports by date range, sorted by (usedAt, _id))
+            self.db.coupon_usage.create_index([("usedAt", 1), ("_id", 1)])
+            
+            # Dashboard rollups (one document per day plus the totals)
+            self.db.analytics_rollups.create_index("date")
             
-            # Audit logs collection indexes
-            self.db.audit_logs.create_index([("user", 1), ("timestamp", -1)])
-            self.db.audit_logs.create_index([("resource", 1), ("resourceId", 1)])
-            self.db.audit_logs.create_index([("timestamp", -1)])
+            # Wallet statistics (per-day volume plus the totals)
+            self.db.wallet_stats.create_index("date")
+            
+            # Search query log (hourly buckets, kept for a week)
+            self.db.search_queries.create_index([("term", 1), ("hour", 1)], unique=True)
+            self.db.search_queries.create_index("hour", expireAfterSeconds=7 * 24 * 3600)
             
         except Exception as e:
             print(f"Error creating indexes: {e}")
+    
+    @staticmethod
+    def ensure_ttl_index(collection, field, expire_after_seconds, **kwargs):
+        """Create a TTL index, updating its expiry in place if it already exists with another one"""
+        try:
+            collection.create_index(field, expireAfterSeconds=expire_after_seconds, **kwargs)
+        except OperationFailure as e:
+            if e.code not in (85, 86):  # IndexOptionsConflict, IndexKeySpecsConflict
+                raise
+            collection.database.command(
+                "collMod",
+                collection.name,
+                index={"keyPattern": {field: 1}, "expireAfterSeconds": expire_after_seconds}
+            )
+
+def create_audit_log_indexes(collection):
+    """Indexes shared by the audit log collection and its monthly partitions"""
+    collection.create_index([("user", 1), ("timestamp", -1), ("_id", -1)])
+    collection.create_index([("resource", 1), ("resourceId", 1)])
+    collection.create_index([("timestamp", -1), ("_id", -1)])
+
+def create_review_bucket_indexes(collection):
+    """Indexes of the review analytics buckets (also built on a rebuild's staging collection)"""
+    collection.create_index([("type", 1), ("key", 1)])
+    collection.create_index([("type", 1), ("count", -1)])
+
+def delete_in_batches(collection, query, batch_size=1000):
+    """Delete matching documents a batch of _ids at a time instead of one unbounded delete_many"""
+    deleted = 0
+    while True:
+        ids = [doc['_id'] for doc in collection.find(query, {"_id": 1}).limit(batch_size)]
+        if not ids:
+            return deleted
+        deleted += collection.delete_many({"_id": {"$in": ids}}).deleted_count
 
 # Global MongoDB instance
 mongo_db = MongoDB()
 
+def lease_owner():
+    """Identifies this process (and thread) as a lease holder"""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def acquire_lease(name, owner, ttl_seconds, **fields):
+    """Take or renew the named lease in ``leases``; False while another owner holds it
+
+    A lease whose holder stops renewing it expires after ``ttl_seconds``
+    and can then be taken over. Extra ``fields`` are stored on the lease.
+    """
+    now = datetime.utcnow()
+    try:
+        mongo_db.db.leases.update_one(
+            {"_id": name, "$or": [{"owner": owner}, {"expiresAt": {"$lte": now}}]},
+            {"$set": {**fields, "owner": owner, "expiresAt": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+def release_lease(name, owner):
+    mongo_db.db.leases.delete_one({"_id": name, "owner": owner})
+
+def get_lease(name):
+    """The named lease if it is currently held, else None"""
+    return mongo_db.db.leases.find_one({"_id": name, "expiresAt": {"$gt": datetime.utcnow()}})
+
 class JSONEncoder(json.JSONEncoder):
     """Custom JSON encoder for MongoDB ObjectId and datetime"""
     def default(self, obj):
@@ -71,16 +314,100 @@ class JSONEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
+# Values that are already JSON-compatible and can be left untouched
+_PASSTHROUGH_TYPES = frozenset([str, int, float, bool, type(None)])
+
+def _convert_value(value):
+    """Convert a single BSON value to its JSON-compatible form"""
+    value_type = type(value)
+    if value_type in _PASSTHROUGH_TYPES:
+        return value
+    if value_type is ObjectId:
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return _convert_dict(value)
+    if isinstance(value, (list, tuple)):
+        return _convert_list(list(value) if value_type is tuple else value)
+    return value
+
+def _convert_dict(doc):
+    """Convert ObjectId/datetime values of a dict in place"""
+    for key, value in doc.items():
+        # Fast path: flat documents are mostly strings and numbers
+        if type(value) not in _PASSTHROUGH_TYPES:
+            doc[key] = _convert_value(value)
+    return doc
+
+def _convert_list(items):
+    """Convert ObjectId/datetime values of a list in place"""
+    for index, value in enumerate(items):
+        if type(value) not in _PASSTHROUGH_TYPES:
+            items[index] = _convert_value(value)
+    return items
+
 def serialize_doc(doc):
-    """Serialize MongoDB document to JSON-serializable format"""
+    """Serialize MongoDB document to JSON-serializable format
+
+    The document (or list of documents) is converted in a single pass and
+    modified in place, so callers must not rely on the original ObjectId and
+    datetime values afterwards.
+    """
     if doc is None:
         return None
-    return json.loads(json.dumps(doc, cls=JSONEncoder))
+    return _convert_value(doc)
 
 def serialize_docs(docs):
     """Serialize list of MongoDB documents"""
     return [serialize_doc(doc) for doc in docs]
 
+def _json_default(obj):
+    """Fallback for values the JSON backend cannot encode natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes API responses exactly once
+
+    ObjectId and datetime values are handled directly, so documents do not
+    need a separate encode/decode pass before ``jsonify``. Uses ``orjson``
+    when it is installed and falls back to the standard library otherwise.
+    """
+
+    sort_keys = False
+    default = staticmethod(_json_default)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return self._dumps_bytes(obj).decode('utf-8')
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = self._dumps_bytes(obj) + b"\n"
+        except TypeError:
+            return super().response(*args, **kwargs)
+
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def _dumps_bytes(self, obj):
+        return orjson.dumps(
+            obj,
+            default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        )
+
 def create_response(success=True, data=None, message="", error=None, pagination=None):
     """Create standardized API response"""
     response = {
@@ -98,20 +425,132 @@ def create_response(success=True, data=None, message="", error=None, pagination=
     
     return response
 
-def paginate_query(collection, query, page=1, limit=20, sort_field="createdAt", sort_order=-1):
-    """Paginate MongoDB query results"""
-    skip = (page - 1) * limit
+def _get_field(doc, field):
+    """Read a (possibly dotted) field from a raw document"""
+    value = doc
+    for part in field.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def encode_cursor(doc, sort_field, sort_order):
+    """Encode the sort key and _id of a document into an opaque cursor token"""
+    payload = {
+        "f": sort_field,
+        "o": sort_order,
+        "v": _get_field(doc, sort_field),
+        "id": doc['_id']
+    }
+    token = base64.urlsafe_b64encode(json_util.dumps(payload).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+def decode_cursor(token, sort_field, sort_order):
+    """Decode a cursor token into the (sort value, _id) pair it points at"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        value, last_id = payload['v'], payload['id']
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    
+    if payload.get('f') != sort_field or payload.get('o') != sort_order:
+        raise ValueError("Pagination cursor does not match the requested sort order")
+    
+    return value, last_id
+
+def keyset_filter(sort_field, sort_order, value, last_id):
+    """Build the filter that seeks past (value, last_id) in (sort_field, _id) order"""
+    op = "$lt" if sort_order == -1 else "$gt"
+    
+    # MongoDB sorts missing/null values first, so they come last when descending
+    if value is None:
+        conditions = [{sort_field: None, "_id": {op: last_id}}]
+        if sort_order == 1:
+            conditions.append({sort_field: {"$ne": None}})
+    else:
+        conditions = [
+            {sort_field: {op: value}},
+            {sort_field: value, "_id": {op: last_id}}
+        ]
+        if sort_order == -1:
+            conditions.append({sort_field: None})
+    
+    return {"$or": conditions}
+
+COUNT_MODES = ('exact', 'estimated', 'none')
+
+# Short-lived cache of filtered counts used by the "estimated" count mode
+_count_cache = TTLCache(maxsize=2048, ttl=30)
+
+def count_documents(collection, query, mode='exact'):
+    """Count documents matching query according to a count mode
+    
+    ``exact`` always runs count_documents, ``estimated`` uses collection
+    metadata for unfiltered queries and a short-TTL cache keyed by the
+    normalized query otherwise, and ``none`` skips counting (returns None).
+    """
+    if mode not in COUNT_MODES:
+        raise ValueError(f"Invalid count mode. Must be one of: {', '.join(COUNT_MODES)}")
+    
+    if mode == 'none':
+        return None
+    if mode == 'exact':
+        return collection.count_documents(query)
+    if not query:
+        return collection.estimated_document_count()
+    
+    key = (collection.full_name, json_util.dumps(query, sort_keys=True))
+    total = _count_cache.get(key)
+    if total is None:
+        total = collection.count_documents(query)
+        _count_cache.set(key, total)
+    return total
+
+def paginate_query(collection, query, page=1, limit=20, sort_field="createdAt", sort_order=-1, cursor=None, count='exact', projection=None):
+    """Paginate MongoDB query results
+    
+    Uses skip/limit by ``page`` unless ``cursor`` is given (an empty string
+    requests the first page), in which case results are fetched with keyset
+    pagination on ``(sort_field, _id)`` starting after the cursor position.
+    ``count`` selects how the total is computed (see count_documents);
+    ``hasNext`` never depends on it. A ``projection`` must keep ``sort_field``.
+    """
+    sort = [(sort_field, sort_order), ("_id", sort_order)]
     
     # Get total count
-    total = collection.count_documents(query)
+    total = count_documents(collection, query, count)
     
-    # Get paginated results
-    cursor = collection.find(query).sort(sort_field, sort_order).skip(skip).limit(limit)
-    results = list(cursor)
+    page_query = query
+    skip = 0
+    if cursor is not None:
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort_field, sort_order)
+            seek = keyset_filter(sort_field, sort_order, value, last_id)
+            page_query = {"$and": [query, seek]} if query else seek
+    else:
+        skip = (page - 1) * limit
+    
+    # Fetch one extra document to know whether there is a next page
+    results = list(collection.find(page_query, projection).sort(sort).skip(skip).limit(limit + 1))
+    has_next = len(results) > limit
+    results = results[:limit]
+    next_cursor = encode_cursor(results[-1], sort_field, sort_order) if has_next else None
+    
+    if cursor is not None:
+        pagination = {
+            "limit": limit,
+            "total": total,
+            "countMode": count,
+            "hasNext": has_next,
+            "hasPrev": bool(cursor),
+            "nextCursor": next_cursor
+        }
+        
+        return serialize_docs(results), pagination
     
     # Calculate pagination info
-    total_pages = (total + limit - 1) // limit
-    has_next = page < total_pages
+    total_pages = (total + limit - 1) // limit if total is not None else None
     has_prev = page > 1
     
     pagination = {
@@ -119,9 +558,10 @@ def paginate_query(collection, query, page=1, limit=20, sort_field="createdAt",
         "limit": limit,
         "total": total,
         "totalPages": total_pages,
+        "countMode": count,
         "hasNext": has_next,
-        "hasPrev": has_prev
+        "hasPrev": has_prev,
+        "nextCursor": next_cursor
     }
     
     return serialize_docs(results), pagination
-
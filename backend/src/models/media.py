@@ -1,6 +1,6 @@
 from datetime import datetime
 from bson import ObjectId
-from src.models.database import mongo_db, serialize_doc, serialize_docs
+from src.models.database import mongo_db, serialize_doc, serialize_docs, paginate_query
 import os
 
 class Media:
@@ -77,53 +77,33 @@ class Media:
         return result.deleted_count > 0
     
     @staticmethod
-    def find_all(query=None, page=1, limit=20, sort_field="createdAt", sort_order=-1):
+    def find_all(query=None, page=1, limit=20, sort_field="createdAt", sort_order=-1, cursor=None, count='exact'):
         """Find media with pagination"""
         if query is None:
             query = {}
         
-        skip = (page - 1) * limit
-        total = mongo_db.db.media.count_documents(query)
-        
-        cursor = mongo_db.db.media.find(query).sort(sort_field, sort_order).skip(skip).limit(limit)
-        media_list = list(cursor)
-        
-        # Calculate pagination
-        total_pages = (total + limit - 1) // limit
-        has_next = page < total_pages
-        has_prev = page > 1
-        
-        pagination = {
-            "page": page,
-            "limit": limit,
-            "total": total,
-            "totalPages": total_pages,
-            "hasNext": has_next,
-            "hasPrev": has_prev
-        }
-        
-        return serialize_docs(media_list), pagination
+        return paginate_query(mongo_db.db.media, query, page, limit, sort_field, sort_order, cursor=cursor, count=count)
     
     @staticmethod
-    def find_by_folder(folder, page=1, limit=20):
+    def find_by_folder(folder, page=1, limit=20, cursor=None, count='exact'):
         """Find media by folder"""
         query = {"folder": folder}
-        return Media.find_all(query, page, limit)
+        return Media.find_all(query, page, limit, cursor=cursor, count=count)
     
     @staticmethod
-    def find_by_type(mime_type_prefix, page=1, limit=20):
+    def find_by_type(mime_type_prefix, page=1, limit=20, cursor=None, count='exact'):
         """Find media by MIME type (e.g., 'image/', 'video/')"""
         query = {"mimeType": {"$regex": f"^{mime_type_prefix}"}}
-        return Media.find_all(query, page, limit)
+        return Media.find_all(query, page, limit, cursor=cursor, count=count)
     
     @staticmethod
-    def find_by_user(user_id, page=1, limit=20):
+    def find_by_user(user_id, page=1, limit=20, cursor=None, count='exact'):
         """Find media uploaded by user"""
         query = {"uploadedBy": ObjectId(user_id)}
-        return Media.find_all(query, page, limit)
+        return Media.find_all(query, page, limit, cursor=cursor, count=count)
     
     @staticmethod
-    def search(search_term, page=1, limit=20):
+    def search(search_term, page=1, limit=20, cursor=None, count='exact'):
         """Search media by filename, alt text, or caption"""
         query = {
             "$or": [
@@ -133,7 +113,7 @@ class Media:
                 {"tags": {"$in": [search_term]}}
             ]
         }
-        return Media.find_all(query, page, limit)
+        return Media.find_all(query, page, limit, cursor=cursor, count=count)
     
     @staticmethod
     def get_folders():
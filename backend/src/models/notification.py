@@ -0,0 +1,400 @@
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from src.models.database import (
+    mongo_db, serialize_docs, count_documents, decode_cursor, delete_in_batches, encode_cursor, keyset_filter
+)
+from src.utils.cache import TTLCache
+
+# Broadcasts expire (TTL on expiresAt) after this many days
+BROADCAST_RETENTION_DAYS = int(os.getenv('BROADCAST_RETENTION_DAYS', 90))
+
+# Upper bound on the live broadcasts held in memory and merged into feeds
+MAX_VISIBLE_BROADCASTS = 500
+
+# Broadcast ids remembered per user as read/deleted beyond the read watermark
+STATE_HISTORY = 200
+
+BROADCAST_AUDIENCES = ('role', 'all')
+
+# Unread counts served from memory between polls; stored counters are
+# recomputed from the notifications when older than the recheck interval
+UNREAD_CACHE_SECONDS = int(os.getenv('UNREAD_COUNT_CACHE_SECONDS', 10))
+UNREAD_RECHECK_SECONDS = int(os.getenv('UNREAD_COUNT_RECHECK_SECONDS', 3600))
+
+_unread_cache = TTLCache(maxsize=10000, ttl=UNREAD_CACHE_SECONDS)
+_broadcast_cache = TTLCache(maxsize=1, ttl=30)
+
+def _sort_key(doc):
+    return (doc['createdAt'], doc['_id'])
+
+class Notification:
+    """A user's notification feed: direct notifications plus broadcasts
+
+    Direct notifications are one ``notifications`` document per recipient.
+    A broadcast (to all users or one role) is a single ``broadcasts``
+    document, shown to every user of its audience who existed when it was
+    published. Per-user broadcast state lives in ``notification_state``:
+    a ``readAt`` watermark (everything published up to it is read) plus
+    short lists of broadcast ids read or deleted after it.
+
+    ``notification_state.unread`` counts the user's unread direct
+    notifications. Every insert, read and delete adjusts it with ``$inc``,
+    so unread_count() never scans; missing, negative or long-unchecked
+    counters are recomputed on read.
+    """
+
+    @staticmethod
+    def create(recipient, notification_type, title, message, data=None):
+        """Insert a direct notification and count it as unread"""
+        doc = {
+            "recipient": ObjectId(recipient),
+            "type": notification_type,
+            "title": title,
+            "message": message,
+            "data": data or {},
+            "isRead": False,
+            "createdAt": datetime.utcnow()
+        }
+        doc['_id'] = mongo_db.db.notifications.insert_one(doc).inserted_id
+        Notification.adjust_unread([doc['recipient']])
+        return doc
+
+    @staticmethod
+    def insert_many(documents):
+        """Insert unread direct notifications (ordered=False) and count the ones written
+
+        Returns the number inserted. Duplicate-key failures are ignored
+        and their recipients left uncounted; other failures re-raise
+        after the inserted ones are counted.
+        """
+        try:
+            mongo_db.db.notifications.insert_many(documents, ordered=False)
+            inserted, error = documents, None
+        except BulkWriteError as e:
+            failed = {write_error['index'] for write_error in e.details.get('writeErrors', [])}
+            inserted = [doc for index, doc in enumerate(documents) if index not in failed]
+            error = e
+        Notification.adjust_unread([doc['recipient'] for doc in inserted])
+        if error is not None:
+            raise error
+        return len(inserted)
+
+    @staticmethod
+    def adjust_unread(recipients, delta=1):
+        """$inc the unread counters of recipients (one entry per notification)"""
+        if not recipients:
+            return
+        mongo_db.db.notification_state.bulk_write(
+            [UpdateOne({"_id": recipient}, {"$inc": {"unread": delta}}, upsert=True) for recipient in recipients],
+            ordered=False
+        )
+        for recipient in set(recipients):
+            _unread_cache.invalidate(recipient)
+
+    @staticmethod
+    def broadcast(notification, audience, publish_at=None):
+        """Store a broadcast once; it appears in feeds from publish_at (default: now)"""
+        if audience.get('type') not in BROADCAST_AUDIENCES:
+            raise ValueError(f"Unknown broadcast audience: {audience.get('type')}")
+
+        published = publish_at or datetime.utcnow()
+        doc = {
+            **notification,
+            "audience": audience,
+            "createdAt": published,
+            "expiresAt": published + timedelta(days=BROADCAST_RETENTION_DAYS)
+        }
+        doc['_id'] = mongo_db.db.broadcasts.insert_one(doc).inserted_id
+        _broadcast_cache.clear()
+        _unread_cache.clear()
+        return doc
+
+    @staticmethod
+    def viewer(user_id):
+        """The user's role, join date and broadcast state"""
+        user_oid = ObjectId(user_id)
+        user = mongo_db.db.users.find_one({"_id": user_oid}, {"role": 1, "createdAt": 1}) or {"_id": user_oid}
+        state = mongo_db.db.notification_state.find_one({"_id": user_oid}) or {}
+        return {
+            "_id": user_oid,
+            "role": user.get('role'),
+            "joinedAt": user.get('createdAt'),
+            "readAt": state.get('readAt'),
+            "read": set(state.get('read', [])),
+            "hidden": set(state.get('hidden', [])),
+            "unread": state.get('unread'),
+            "unreadCheckedAt": state.get('unreadCheckedAt')
+        }
+
+    @staticmethod
+    def live_broadcasts():
+        """Unexpired broadcasts (including scheduled ones), newest first; cached briefly"""
+        broadcasts = _broadcast_cache.get('live')
+        if broadcasts is None:
+            broadcasts = list(
+                mongo_db.db.broadcasts.find({"expiresAt": {"$gt": datetime.utcnow()}}, {"expiresAt": 0})
+                .sort([("createdAt", -1), ("_id", -1)])
+                .limit(MAX_VISIBLE_BROADCASTS)
+            )
+            _broadcast_cache.set('live', broadcasts)
+        return broadcasts
+
+    @staticmethod
+    def broadcasts_for(viewer, unread_only=False):
+        """Broadcasts in the viewer's feed, newest first, shaped like notifications"""
+        now = datetime.utcnow()
+        broadcasts = []
+        for broadcast in Notification.live_broadcasts():
+            audience = broadcast['audience']
+            if broadcast['createdAt'] > now or (viewer['joinedAt'] and broadcast['createdAt'] < viewer['joinedAt']):
+                continue
+            if audience['type'] == 'role' and audience.get('value') != viewer['role']:
+                continue
+            if broadcast['_id'] in viewer['hidden']:
+                continue
+
+            doc = {key: value for key, value in broadcast.items() if key != 'audience'}
+            doc['isRead'] = Notification._broadcast_read(viewer, doc)
+            if unread_only and doc['isRead']:
+                continue
+            doc['recipient'] = viewer['_id']
+            doc['broadcast'] = True
+            broadcasts.append(doc)
+        return broadcasts
+
+    @staticmethod
+    def _broadcast_read(viewer, doc):
+        return bool(viewer['readAt'] and doc['createdAt'] <= viewer['readAt']) or doc['_id'] in viewer['read']
+
+    @staticmethod
+    def feed(user_id, page=1, limit=20, cursor=None, count='exact', unread_only=False):
+        """Direct notifications and broadcasts merged newest first
+
+        Paged like paginate_query on (createdAt, _id): by keyset ``cursor``
+        or by ``page``. Broadcasts are few per user, so they are loaded
+        whole; direct notifications are read up to the end of the page.
+        """
+        viewer = Notification.viewer(user_id)
+        query = {"recipient": viewer['_id']}
+        if unread_only:
+            query['isRead'] = False
+        sort = [("createdAt", -1), ("_id", -1)]
+        broadcasts = Notification.broadcasts_for(viewer, unread_only)
+
+        total = count_documents(mongo_db.db.notifications, query, count)
+        if total is not None:
+            total += len(broadcasts)
+
+        skip = 0
+        if cursor is not None:
+            if cursor:
+                value, last_id = decode_cursor(cursor, 'createdAt', -1)
+                query = {"$and": [query, keyset_filter('createdAt', -1, value, last_id)]}
+                broadcasts = [doc for doc in broadcasts if _sort_key(doc) < (value, last_id)]
+        else:
+            skip = (page - 1) * limit
+
+        # The first skip + limit + 1 merged items hold at most that many of
+        # either source, so merging those prefixes gives the page exactly
+        direct = list(mongo_db.db.notifications.find(query).sort(sort).limit(skip + limit + 1))
+        merged = sorted(direct + broadcasts[:skip + limit + 1], key=_sort_key, reverse=True)
+        results = merged[skip:skip + limit + 1]
+
+        has_next = len(results) > limit
+        results = results[:limit]
+        pagination = {
+            "limit": limit,
+            "total": total,
+            "countMode": count,
+            "hasNext": has_next,
+            "nextCursor": encode_cursor(results[-1], 'createdAt', -1) if has_next else None
+        }
+        if cursor is not None:
+            pagination["hasPrev"] = bool(cursor)
+        else:
+            pagination.update({
+                "page": page,
+                "totalPages": (total + limit - 1) // limit if total is not None else None,
+                "hasPrev": page > 1
+            })
+        return serialize_docs(results), pagination
+
+    @staticmethod
+    def unread_count(user_id):
+        """Unread direct notifications plus unread broadcasts, from the counter and the cache"""
+        user_oid = ObjectId(user_id)
+        count = _unread_cache.get(user_oid)
+        if count is not None:
+            return count
+
+        viewer = Notification.viewer(user_oid)
+        direct = viewer['unread']
+        checked_at = viewer['unreadCheckedAt']
+        if direct is None or direct < 0 or checked_at is None \
+                or datetime.utcnow() - checked_at > timedelta(seconds=UNREAD_RECHECK_SECONDS):
+            direct = Notification.repair_unread(user_oid)
+
+        count = direct + len(Notification.broadcasts_for(viewer, unread_only=True))
+        _unread_cache.set(user_oid, count)
+        return count
+
+    @staticmethod
+    def repair_unread(user_id):
+        """Recompute one user's counter from the notifications; returns the unread count
+
+        An $inc landing between the count and the write is lost until the
+        next recheck.
+        """
+        user_oid = ObjectId(user_id)
+        unread = mongo_db.db.notifications.count_documents({"recipient": user_oid, "isRead": False})
+        mongo_db.db.notification_state.update_one(
+            {"_id": user_oid},
+            {"$set": {"unread": unread, "unreadCheckedAt": datetime.utcnow()}},
+            upsert=True
+        )
+        _unread_cache.invalidate(user_oid)
+        return unread
+
+    @staticmethod
+    def repair_all_unread(batch_size=1000):
+        """Recompute every stored counter; returns {"checked": users, "corrected": users}"""
+        now = datetime.utcnow()
+        actual = {
+            entry['_id']: entry['count']
+            for entry in mongo_db.db.notifications.aggregate([
+                {"$match": {"isRead": False}},
+                {"$group": {"_id": "$recipient", "count": {"$sum": 1}}}
+            ])
+        }
+
+        checked, corrected, operations = 0, 0, []
+        def flush():
+            if operations:
+                mongo_db.db.notification_state.bulk_write(operations, ordered=False)
+                operations.clear()
+
+        for state in mongo_db.db.notification_state.find({}, {"unread": 1}).batch_size(batch_size):
+            checked += 1
+            expected = actual.pop(state['_id'], 0)
+            if state.get('unread') != expected:
+                corrected += 1
+                operations.append(UpdateOne({"_id": state['_id']}, {"$set": {"unread": expected, "unreadCheckedAt": now}}))
+            if len(operations) >= batch_size:
+                flush()
+
+        # Unread notifications of users without any state yet
+        for recipient, expected in actual.items():
+            corrected += 1
+            operations.append(UpdateOne({"_id": recipient}, {"$set": {"unread": expected, "unreadCheckedAt": now}}, upsert=True))
+            if len(operations) >= batch_size:
+                flush()
+        flush()
+
+        _unread_cache.clear()
+        return {"checked": checked + len(actual), "corrected": corrected}
+
+    @staticmethod
+    def _find_broadcast(viewer, notification_id):
+        return next((doc for doc in Notification.broadcasts_for(viewer) if doc['_id'] == notification_id), None)
+
+    @staticmethod
+    def mark_read(user_id, notification_id):
+        """Mark a direct notification or broadcast read; returns False if the user has no such notification"""
+        user_oid, notification_oid = ObjectId(user_id), ObjectId(notification_id)
+        result = mongo_db.db.notifications.update_one(
+            {"_id": notification_oid, "recipient": user_oid, "isRead": False},
+            {"$set": {"isRead": True}}
+        )
+        if result.modified_count:
+            Notification.adjust_unread([user_oid], -1)
+            return True
+        if mongo_db.db.notifications.count_documents({"_id": notification_oid, "recipient": user_oid}, limit=1):
+            # Already read
+            return True
+
+        viewer = Notification.viewer(user_id)
+        broadcast = Notification._find_broadcast(viewer, notification_oid)
+        if broadcast is None:
+            return False
+        if not broadcast['isRead']:
+            Notification._remember(user_oid, 'read', notification_oid)
+            _unread_cache.invalidate(user_oid)
+        return True
+
+    @staticmethod
+    def mark_all_read(user_id):
+        """Mark everything read; returns how many notifications were unread"""
+        user_oid = ObjectId(user_id)
+        viewer = Notification.viewer(user_id)
+        unread_broadcasts = len(Notification.broadcasts_for(viewer, unread_only=True))
+
+        result = mongo_db.db.notifications.update_many(
+            {"recipient": user_oid, "isRead": False},
+            {"$set": {"isRead": True}}
+        )
+        # Moving the watermark makes the per-broadcast read list redundant.
+        # The counter is decremented rather than zeroed so that notifications
+        # inserted meanwhile stay counted.
+        mongo_db.db.notification_state.update_one(
+            {"_id": user_oid},
+            {"$set": {"readAt": datetime.utcnow(), "read": []}, "$inc": {"unread": -result.modified_count}},
+            upsert=True
+        )
+        _unread_cache.invalidate(user_oid)
+        return result.modified_count + unread_broadcasts
+
+    @staticmethod
+    def delete(user_id, notification_id):
+        """Delete a direct notification or hide a broadcast; returns False if the user has no such notification"""
+        user_oid, notification_oid = ObjectId(user_id), ObjectId(notification_id)
+        deleted = mongo_db.db.notifications.find_one_and_delete(
+            {"_id": notification_oid, "recipient": user_oid},
+            projection={"isRead": 1}
+        )
+        if deleted is not None:
+            if not deleted.get('isRead'):
+                Notification.adjust_unread([user_oid], -1)
+            return True
+
+        viewer = Notification.viewer(user_id)
+        if Notification._find_broadcast(viewer, notification_oid) is None:
+            return False
+        Notification._remember(user_oid, 'hidden', notification_oid)
+        _unread_cache.invalidate(user_oid)
+        return True
+
+    @staticmethod
+    def _remember(user_oid, field, broadcast_id):
+        try:
+            mongo_db.db.notification_state.update_one(
+                {"_id": user_oid, field: {"$ne": broadcast_id}},
+                {"$push": {field: {"$each": [broadcast_id], "$slice": -STATE_HISTORY}}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The state exists and already lists the broadcast
+            pass
+
+    @staticmethod
+    def cleanup_broadcasts(dry_run=False):
+        """Delete expired broadcasts ahead of the TTL monitor and prune per-user state; returns the broadcasts removed"""
+        query = {"expiresAt": {"$lte": datetime.utcnow()}}
+        if dry_run:
+            return mongo_db.db.broadcasts.count_documents(query)
+        deleted = delete_in_batches(mongo_db.db.broadcasts, query)
+        _broadcast_cache.clear()
+        Notification.prune_state()
+        return deleted
+
+    @staticmethod
+    def prune_state():
+        """Drop read/hidden ids of broadcasts that no longer exist; returns the users updated"""
+        live = mongo_db.db.broadcasts.distinct("_id")
+        result = mongo_db.db.notification_state.update_many(
+            {"$or": [{"read": {"$elemMatch": {"$nin": live}}}, {"hidden": {"$elemMatch": {"$nin": live}}}]},
+            {"$pull": {"read": {"$nin": live}, "hidden": {"$nin": live}}}
+        )
+        return result.modified_count
@@ -1,25 +1,23 @@
-from pymongo import MongoClient
 from bson import ObjectId
 from datetime import datetime
-import os
+from src.models.database import mongo_db
 
-# MongoDB connection
-client = MongoClient(os.getenv('MONGODB_URI'))
-db = client.marrakech_reviews
-reviews_collection = db.reviews
+def reviews_collection():
+    """Reviews collection on the shared application client"""
+    return mongo_db.db.reviews
 
 class Review:
     @staticmethod
     def create(review_data):
         """Create a new review"""
-        result = reviews_collection.insert_one(review_data)
+        result = reviews_collection().insert_one(review_data)
         return result.inserted_id
     
     @staticmethod
     def find_by_id(review_id):
         """Find review by ID"""
         try:
-            review = reviews_collection.find_one({'_id': ObjectId(review_id)})
+            review = reviews_collection().find_one({'_id': ObjectId(review_id)})
             if review:
                 review['_id'] = str(review['_id'])
             return review
@@ -29,7 +27,7 @@ class Review:
     @staticmethod
     def find_all():
         """Find all reviews"""
-        reviews = list(reviews_collection.find({'status': 'published'}).sort('created_at', -1))
+        reviews = list(reviews_collection().find({'status': 'published'}).sort('created_at', -1))
         for review in reviews:
             review['_id'] = str(review['_id'])
         return reviews
@@ -41,7 +39,7 @@ class Review:
             filters = {}
         
         skip = (page - 1) * limit
-        reviews = list(reviews_collection.find(filters)
+        reviews = list(reviews_collection().find(filters)
                       .sort('created_at', -1)
                       .skip(skip)
                       .limit(limit))
@@ -55,7 +53,7 @@ class Review:
     def find_by_author(author_id, page=1, limit=10):
         """Find reviews by author"""
         skip = (page - 1) * limit
-        reviews = list(reviews_collection.find({'author_id': author_id})
+        reviews = list(reviews_collection().find({'author_id': author_id})
                       .sort('created_at', -1)
                       .skip(skip)
                       .limit(limit))
@@ -69,7 +67,7 @@ class Review:
     def find_by_category(category, page=1, limit=10):
         """Find reviews by category"""
         skip = (page - 1) * limit
-        reviews = list(reviews_collection.find({
+        reviews = list(reviews_collection().find({
             'category': category,
             'status': 'published'
         }).sort('created_at', -1).skip(skip).limit(limit))
@@ -83,7 +81,7 @@ class Review:
     def find_by_location(location, page=1, limit=10):
         """Find reviews by location"""
         skip = (page - 1) * limit
-        reviews = list(reviews_collection.find({
+        reviews = list(reviews_collection().find({
             'location': {'$regex': location, '$options': 'i'},
             'status': 'published'
         }).sort('created_at', -1).skip(skip).limit(limit))
@@ -96,7 +94,7 @@ class Review:
     @staticmethod
     def find_recent(limit=5):
         """Find recent reviews"""
-        reviews = list(reviews_collection.find({'status': 'published'})
+        reviews = list(reviews_collection().find({'status': 'published'})
                       .sort('created_at', -1)
                       .limit(limit))
         
@@ -108,7 +106,7 @@ class Review:
     @staticmethod
     def find_popular(limit=5):
         """Find popular reviews (by views and likes)"""
-        reviews = list(reviews_collection.find({'status': 'published'})
+        reviews = list(reviews_collection().find({'status': 'published'})
                       .sort([('views', -1), ('likes', -1)])
                       .limit(limit))
         
@@ -136,7 +134,7 @@ class Review:
             ]
         }
         
-        reviews = list(reviews_collection.find(search_filter)
+        reviews = list(reviews_collection().find(search_filter)
                       .sort('created_at', -1)
                       .skip(skip)
                       .limit(limit))
@@ -150,7 +148,7 @@ class Review:
     def update_by_id(review_id, update_data):
         """Update review by ID"""
         try:
-            result = reviews_collection.update_one(
+            result = reviews_collection().update_one(
                 {'_id': ObjectId(review_id)},
                 {'$set': update_data}
             )
@@ -162,7 +160,7 @@ class Review:
     def delete_by_id(review_id):
         """Delete review by ID"""
         try:
-            result = reviews_collection.delete_one({'_id': ObjectId(review_id)})
+            result = reviews_collection().delete_one({'_id': ObjectId(review_id)})
             return result.deleted_count > 0
         except:
             return False
@@ -172,13 +170,13 @@ class Review:
         """Count documents matching filters"""
         if filters is None:
             filters = {}
-        return reviews_collection.count_documents(filters)
+        return reviews_collection().count_documents(filters)
     
     @staticmethod
     def increment_views(review_id):
         """Increment view count"""
         try:
-            reviews_collection.update_one(
+            reviews_collection().update_one(
                 {'_id': ObjectId(review_id)},
                 {'$inc': {'views': 1}}
             )
@@ -190,7 +188,7 @@ class Review:
     def increment_likes(review_id):
         """Increment like count"""
         try:
-            reviews_collection.update_one(
+            reviews_collection().update_one(
                 {'_id': ObjectId(review_id)},
                 {'$inc': {'likes': 1}}
             )
@@ -202,7 +200,7 @@ class Review:
     def decrement_likes(review_id):
         """Decrement like count"""
         try:
-            reviews_collection.update_one(
+            reviews_collection().update_one(
                 {'_id': ObjectId(review_id)},
                 {'$inc': {'likes': -1}}
             )
@@ -214,7 +212,7 @@ class Review:
     def increment_helpful_votes(review_id):
         """Increment helpful votes"""
         try:
-            reviews_collection.update_one(
+            reviews_collection().update_one(
                 {'_id': ObjectId(review_id)},
                 {'$inc': {'helpful_votes': 1}}
             )
@@ -230,7 +228,7 @@ class Review:
             {'$group': {'_id': None, 'avg_rating': {'$avg': '$rating'}}}
         ]
         
-        result = list(reviews_collection.aggregate(pipeline))
+        result = list(reviews_collection().aggregate(pipeline))
         if result:
             return round(result[0]['avg_rating'], 2)
         return 0
@@ -244,7 +242,7 @@ class Review:
             {'$sort': {'count': -1}}
         ]
         
-        result = list(reviews_collection.aggregate(pipeline))
+        result = list(reviews_collection().aggregate(pipeline))
         return {item['_id']: item['count'] for item in result}
     
     @staticmethod
@@ -256,7 +254,7 @@ class Review:
             {'$sort': {'_id': 1}}
         ]
         
-        result = list(reviews_collection.aggregate(pipeline))
+        result = list(reviews_collection().aggregate(pipeline))
         return {item['_id']: item['count'] for item in result}
     
     @staticmethod
@@ -278,7 +276,7 @@ class Review:
             {'$limit': 12}
         ]
         
-        result = list(reviews_collection.aggregate(pipeline))
+        result = list(reviews_collection().aggregate(pipeline))
         return result
     
     @staticmethod
@@ -295,7 +293,7 @@ class Review:
             {'$limit': limit}
         ]
         
-        result = list(reviews_collection.aggregate(pipeline))
+        result = list(reviews_collection().aggregate(pipeline))
         return result
     
     @staticmethod
@@ -315,7 +313,7 @@ class Review:
             }
         ]
         
-        result = list(reviews_collection.aggregate(pipeline))
+        result = list(reviews_collection().aggregate(pipeline))
         if result:
             stats = result[0]
             del stats['_id']
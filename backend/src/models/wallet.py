@@ -0,0 +1,246 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from src.analytics.wallet_stats import wallet_stats
+from src.models.database import mongo_db, serialize_doc, paginate_query
+import uuid
+
+# Ledger entries whose balance update is remembered on the user document,
+# so a retried apply() never moves the balance twice. Pending entries are
+# settled by src.utils.settlement long before this many later ones land.
+APPLIED_HISTORY = 50
+
+# Fields returned to API clients
+PUBLIC_FIELDS = ("transactionId", "type", "amount", "description", "source", "status", "balanceAfter", "timestamp")
+PUBLIC_PROJECTION = {field: 1 for field in PUBLIC_FIELDS}
+
+class Wallet:
+    """Wallet balances backed by the ``wallet_transactions`` ledger
+
+    ``users.wallet.balance`` only changes through a single conditional
+    ``$inc`` (debits also require ``balance >= amount``), never a
+    read-modify-write. Every change is first recorded in the ledger as
+    ``pending`` and then marked ``committed`` or ``rejected``. An optional
+    idempotency key, unique per user, turns retries into replays of the
+    first result. Committed entries are added to ``wallet_stats``.
+    """
+
+    @staticmethod
+    def credit(user_id, amount, description, source=None, idempotency_key=None):
+        return Wallet.apply(user_id, 'credit', amount, description, source, idempotency_key)
+
+    @staticmethod
+    def debit(user_id, amount, description, source=None, idempotency_key=None):
+        return Wallet.apply(user_id, 'debit', amount, description, source, idempotency_key)
+
+    @staticmethod
+    def apply(user_id, transaction_type, amount, description, source=None, idempotency_key=None):
+        """Record a credit or debit and apply it to the balance
+
+        Returns the ledger entry. Its ``status`` is ``committed`` with
+        ``balanceAfter`` set, or ``rejected`` with a ``reason``
+        (``INSUFFICIENT_BALANCE`` or ``USER_NOT_FOUND``). A replayed
+        idempotency key returns the original entry with ``replayed`` set.
+        """
+        user_oid = ObjectId(user_id)
+        entry = {
+            "transactionId": str(uuid.uuid4()),
+            "user": user_oid,
+            "type": transaction_type,
+            "amount": amount,
+            "description": description,
+            "source": source,
+            "status": "pending",
+            "timestamp": datetime.utcnow()
+        }
+        if idempotency_key:
+            entry['idempotencyKey'] = idempotency_key
+
+        try:
+            mongo_db.db.wallet_transactions.insert_one(entry)
+        except DuplicateKeyError:
+            existing = mongo_db.db.wallet_transactions.find_one({"user": user_oid, "idempotencyKey": idempotency_key})
+            if existing is None:
+                raise
+            if existing['status'] == 'pending':
+                existing = Wallet._recover(existing)
+            existing['replayed'] = True
+            return existing
+
+        return Wallet._settle(entry)
+
+    @staticmethod
+    def _settle(entry):
+        """Apply a pending entry to the balance (at most once) and record the outcome"""
+        signed = entry['amount'] if entry['type'] == 'credit' else -entry['amount']
+        query = {"_id": entry['user'], "wallet.applied": {"$ne": entry['transactionId']}}
+        if entry['type'] == 'debit':
+            query["wallet.balance"] = {"$gte": entry['amount']}
+
+        user = mongo_db.db.users.find_one_and_update(
+            query,
+            {
+                "$inc": {"wallet.balance": signed},
+                "$push": {"wallet.applied": {"$each": [entry['transactionId']], "$slice": -APPLIED_HISTORY}},
+                "$set": {"updatedAt": datetime.utcnow()}
+            },
+            projection={"wallet.balance": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+        update = {"settledAt": datetime.utcnow()}
+        if user is not None:
+            update.update({"status": "committed", "balanceAfter": user['wallet']['balance']})
+        else:
+            current = mongo_db.db.users.find_one({"_id": entry['user']}, {"wallet.balance": 1, "wallet.applied": 1})
+            if current is None:
+                update.update({"status": "rejected", "reason": "USER_NOT_FOUND"})
+            elif entry['transactionId'] in current.get('wallet', {}).get('applied', []):
+                # Applied by an earlier attempt that did not get to record it
+                update.update({"status": "committed", "balanceAfter": current['wallet'].get('balance', 0)})
+            else:
+                update.update({"status": "rejected", "reason": "INSUFFICIENT_BALANCE"})
+
+        mongo_db.db.wallet_transactions.update_one({"_id": entry['_id']}, {"$set": update})
+        entry.update(update)
+        if user is not None:
+            # Only the attempt that moved the balance counts it
+            wallet_stats.record(entry)
+        return entry
+
+    @staticmethod
+    def _applied_is_reliable(entry):
+        """Whether wallet.applied still remembers the entry if it was ever applied
+
+        Only entries that committed after this one was created, or are still
+        pending, can have pushed it out of the last APPLIED_HISTORY ids.
+        """
+        later = mongo_db.db.wallet_transactions.count_documents(
+            {
+                "user": entry['user'],
+                "_id": {"$ne": entry['_id']},
+                "$or": [
+                    {"status": "committed", "settledAt": {"$gte": entry['timestamp']}},
+                    {"status": "pending"}
+                ]
+            },
+            limit=APPLIED_HISTORY
+        )
+        return later < APPLIED_HISTORY
+
+    @staticmethod
+    def _recover(entry):
+        """Settle an entry another request left pending
+
+        If too many entries have since been applied for the user to tell
+        whether this one was, it is marked ``unresolved`` for an admin to
+        check instead of risking a second balance update.
+        """
+        if Wallet._applied_is_reliable(entry):
+            return Wallet._settle(entry)
+
+        update = {"status": "unresolved", "reason": "APPLIED_HISTORY_EXCEEDED", "settledAt": datetime.utcnow()}
+        mongo_db.db.wallet_transactions.update_one({"_id": entry['_id'], "status": "pending"}, {"$set": update})
+        print(f"Wallet transaction {entry['transactionId']} left unresolved: applied history exceeded")
+        entry.update(update)
+        return entry
+
+    @staticmethod
+    def settle_pending(older_than):
+        """Finish entries left pending by a crashed request; returns how many were settled"""
+        settled = 0
+        for entry in mongo_db.db.wallet_transactions.find({"status": "pending", "timestamp": {"$lt": older_than}}):
+            Wallet._recover(entry)
+            settled += 1
+        return settled
+
+    @staticmethod
+    def get_balance(user_id):
+        """Balance of an active user, or None if there is no such user; reads only wallet.balance"""
+        user = mongo_db.db.users.find_one({"_id": ObjectId(user_id), "isActive": True}, {"wallet.balance": 1})
+        if user is None:
+            return None
+        return user.get('wallet', {}).get('balance', 0)
+
+    @staticmethod
+    def recent(user_id, limit=10):
+        """Latest committed entries, from the (user, status, timestamp) index"""
+        entries = mongo_db.db.wallet_transactions.find(
+            {"user": ObjectId(user_id), "status": "committed"},
+            PUBLIC_PROJECTION
+        ).sort([("timestamp", -1), ("_id", -1)]).limit(limit)
+        return [Wallet.to_public(entry) for entry in entries]
+
+    @staticmethod
+    def history(user_id, transaction_type=None, page=1, limit=20, cursor=None, count='exact'):
+        """Committed entries newest first, paged by (timestamp, _id) keyset or page number"""
+        query = {"user": ObjectId(user_id), "status": "committed"}
+        if transaction_type:
+            query['type'] = transaction_type
+
+        entries, pagination = paginate_query(
+            mongo_db.db.wallet_transactions,
+            query,
+            page,
+            limit,
+            'timestamp',
+            -1,
+            cursor=cursor,
+            count=count,
+            projection=PUBLIC_PROJECTION
+        )
+        return [Wallet.to_public(entry) for entry in entries], pagination
+
+    @staticmethod
+    def to_public(entry):
+        """Ledger entry as returned by the API"""
+        return serialize_doc({field: entry[field] for field in PUBLIC_FIELDS if field in entry})
+
+    @staticmethod
+    def migrate_embedded(batch_size=500):
+        """Move embedded ``wallet.transactions`` arrays into the ledger
+
+        Entries are inserted as committed with their original
+        transactionId (unique in the ledger, so reruns skip them), then
+        the array is removed from the user. Balances are left as they are.
+        Returns (users migrated, entries inserted).
+        """
+        users_migrated, inserted = 0, 0
+        cursor = mongo_db.db.users.find(
+            {"wallet.transactions": {"$exists": True}},
+            {"wallet.transactions": 1}
+        ).batch_size(batch_size)
+
+        for user in cursor:
+            transactions = user['wallet'].get('transactions') or []
+            entries = [
+                {
+                    "transactionId": transaction.get('transactionId') or str(uuid.uuid4()),
+                    "user": user['_id'],
+                    "type": transaction.get('type'),
+                    "amount": transaction.get('amount', 0),
+                    "description": transaction.get('description', ''),
+                    "source": "migration",
+                    "status": "committed",
+                    "timestamp": transaction.get('timestamp') or datetime.utcnow()
+                }
+                for transaction in transactions
+            ]
+            if entries:
+                try:
+                    inserted += len(mongo_db.db.wallet_transactions.insert_many(entries, ordered=False).inserted_ids)
+                except BulkWriteError as e:
+                    # Duplicate transactionIds were migrated by an earlier run
+                    if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                        raise
+                    inserted += e.details.get('nInserted', 0)
+
+            # Only drop the array if nothing was appended since it was read
+            result = mongo_db.db.users.update_one(
+                {"_id": user['_id'], "wallet.transactions": {"$size": len(transactions)}},
+                {"$unset": {"wallet.transactions": ""}}
+            )
+            users_migrated += result.modified_count
+
+        return users_migrated, inserted
@@ -5,105 +5,56 @@ from datetime import datetime, timedelta
 import subprocess
 import os
 
-from src.models.database import mongo_db, create_response, serialize_doc, serialize_docs
-from src.utils.decorators import admin_required, audit_log
+from src.analytics.rollups import dashboard_rollups
+from src.analytics.wallet_stats import wallet_stats
+from src.models.database import mongo_db, create_response, serialize_doc, serialize_docs, delete_in_batches
+from src.models.notification import Notification
+from src.utils.audit import audit_partitions
+from src.utils.backup import backup_manager, DEFAULT_BATCH_SIZE
+from src.utils.cache import result_cache
+from src.utils.cleanup import cleanup_orphaned_uploads
+from src.utils.decorators import admin_required, audit_log, invalidate_user_auth, user_auth_cache_stats, cached_endpoint, invalidate_cached, result_cache_stats, audit_writer_stats
+from src.utils.population import populate_users, to_object_id
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/stats', methods=['GET'])
 @admin_required
+@cached_endpoint('admin.stats', ttl=60)
 def get_admin_stats():
     """Get admin dashboard statistics"""
     try:
-        # Basic counts
-        total_users = mongo_db.db.users.count_documents({})
-        total_articles = mongo_db.db.articles.count_documents({})
-        total_reviews = mongo_db.db.reviews.count_documents({})
-        total_categories = mongo_db.db.categories.count_documents({})
-        
-        # Pending items
-        pending_reviews = mongo_db.db.reviews.count_documents({"status": "pending"})
-        draft_articles = mongo_db.db.articles.count_documents({"status": "draft"})
-        
-        # Recent activity (last 7 days)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        new_users_week = mongo_db.db.users.count_documents({"createdAt": {"$gte": week_ago}})
-        new_articles_week = mongo_db.db.articles.count_documents({"createdAt": {"$gte": week_ago}})
-        new_reviews_week = mongo_db.db.reviews.count_documents({"createdAt": {"$gte": week_ago}})
-        
-        # User role distribution
-        role_distribution = list(mongo_db.db.users.aggregate([
-            {
-                "$group": {
-                    "_id": "$role",
-                    "count": {"$sum": 1}
-                }
-            }
-        ]))
-        
-        # Article status distribution
-        article_status = list(mongo_db.db.articles.aggregate([
-            {
-                "$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1}
-                }
-            }
-        ]))
-        
-        # Review status distribution
-        review_status = list(mongo_db.db.reviews.aggregate([
-            {
-                "$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1}
-                }
-            }
-        ]))
-        
-        # Storage statistics
-        upload_stats = list(mongo_db.db.uploads.aggregate([
-            {
-                "$group": {
-                    "_id": None,
-                    "totalFiles": {"$sum": 1},
-                    "totalSize": {"$sum": "$size"}
-                }
-            }
-        ]))
-        
-        # Wallet statistics
-        wallet_stats = list(mongo_db.db.users.aggregate([
-            {
-                "$group": {
-                    "_id": None,
-                    "totalBalance": {"$sum": "$wallet.balance"},
-                    "avgBalance": {"$avg": "$wallet.balance"}
-                }
-            }
-        ]))
+        # Materialized rollups shared with the analytics dashboard
+        totals = dashboard_rollups.get_totals()
+        now = datetime.utcnow()
+        week = dashboard_rollups.get_days(now - timedelta(days=7), now)
+        wallet = wallet_stats.summary()
         
         stats_data = {
             "overview": {
-                "totalUsers": total_users,
-                "totalArticles": total_articles,
-                "totalReviews": total_reviews,
-                "totalCategories": total_categories,
-                "pendingReviews": pending_reviews,
-                "draftArticles": draft_articles
+                "totalUsers": totals['totalUsers'],
+                "totalArticles": totals['totalArticles'],
+                "totalReviews": totals['totalReviews'],
+                "totalCategories": totals['totalCategories'],
+                "pendingReviews": totals['pendingReviews'],
+                "draftArticles": totals['draftArticles']
             },
             "recentActivity": {
-                "newUsersWeek": new_users_week,
-                "newArticlesWeek": new_articles_week,
-                "newReviewsWeek": new_reviews_week
+                "newUsersWeek": sum(day['newUsers'] for day in week),
+                "newArticlesWeek": sum(day['newArticles'] for day in week),
+                "newReviewsWeek": sum(day['newReviews'] for day in week)
             },
             "distributions": {
-                "userRoles": role_distribution,
-                "articleStatus": article_status,
-                "reviewStatus": review_status
+                "userRoles": totals['userRoles'],
+                "articleStatus": totals['articleStatus'],
+                "reviewStatus": totals['reviewStatus']
+            },
+            "storage": totals['storage'],
+            "wallet": {
+                "totalBalance": wallet['totalBalance'],
+                "avgBalance": wallet['avgBalance']
             },
-            "storage": upload_stats[0] if upload_stats else {"totalFiles": 0, "totalSize": 0},
-            "wallet": wallet_stats[0] if wallet_stats else {"totalBalance": 0, "avgBalance": 0}
+            "computedAt": totals['computedAt']
         }
         
         return jsonify(create_response(
@@ -126,7 +77,7 @@ def get_recent_activity():
         limit = int(request.args.get('limit', 20))
         
         # Get recent audit logs
-        recent_logs = list(mongo_db.db.audit_logs.find(
+        recent_logs = audit_partitions.find(
             {},
             {
                 "user": 1,
@@ -135,18 +86,12 @@ def get_recent_activity():
                 "resourceId": 1,
                 "timestamp": 1,
                 "details": 1
-            }
-        ).sort("timestamp", -1).limit(limit))
+            },
+            limit=limit
+        )
         
         # Populate user information
-        for log in recent_logs:
-            if log.get('user'):
-                user = mongo_db.db.users.find_one(
-                    {"_id": ObjectId(log['user'])},
-                    {"firstName": 1, "lastName": 1, "username": 1, "role": 1}
-                )
-                if user:
-                    log['userInfo'] = serialize_doc(user)
+        populate_users(recent_logs, 'user', 'userInfo', ("firstName", "lastName", "username", "role"))
         
         return jsonify(create_response(
             success=True,
@@ -163,55 +108,71 @@ def get_recent_activity():
 @admin_bp.route('/audit-logs', methods=['GET'])
 @admin_required
 def get_audit_logs():
-    """Get audit logs"""
+    """Get audit logs
+    
+    action/resource accept comma-separated values. With ``facets=true`` the
+    response also carries counts per action, resource, user and day for the
+    whole filtered set, and pages are fetched with keyset cursors.
+    """
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 50))
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         user_id = request.args.get('user')
         action = request.args.get('action')
         resource = request.args.get('resource')
+        resource_id = request.args.get('resourceId')
+        with_facets = request.args.get('facets', 'false').lower() == 'true'
+        facet_limit = min(int(request.args.get('facetLimit', 10)), 100)
+        
+        if with_facets and cursor is None:
+            cursor = ''
+        
+        try:
+            start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+            end = datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+        except ValueError:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "INVALID_DATE", "message": "from/to must be ISO dates"}
+            )), 400
         
         # Build query
         query = {}
         if user_id:
             query['user'] = ObjectId(user_id)
-        if action:
-            query['action'] = action
-        if resource:
-            query['resource'] = resource
-        
-        # Get paginated logs
-        skip = (page - 1) * limit
-        logs = list(mongo_db.db.audit_logs.find(query).sort("timestamp", -1).skip(skip).limit(limit))
-        total = mongo_db.db.audit_logs.count_documents(query)
+        for field, value in (('action', action), ('resource', resource)):
+            if value:
+                values = [item.strip() for item in value.split(',') if item.strip()]
+                query[field] = values[0] if len(values) == 1 else {"$in": values}
+        if resource_id:
+            query['resourceId'] = to_object_id(resource_id) or resource_id
+        
+        # Get paginated logs from the monthly partitions the range covers
+        logs, pagination = audit_partitions.paginate(
+            query,
+            page,
+            limit,
+            cursor=cursor,
+            count=count_mode,
+            start=start,
+            end=end
+        )
         
         # Populate user information
-        for log in logs:
-            if log.get('user'):
-                user = mongo_db.db.users.find_one(
-                    {"_id": ObjectId(log['user'])},
-                    {"firstName": 1, "lastName": 1, "username": 1, "role": 1}
-                )
-                if user:
-                    log['userInfo'] = serialize_doc(user)
-        
-        # Calculate pagination
-        total_pages = (total + limit - 1) // limit
-        has_next = page < total_pages
-        has_prev = page > 1
-        
-        pagination = {
-            "page": page,
-            "limit": limit,
-            "total": total,
-            "totalPages": total_pages,
-            "hasNext": has_next,
-            "hasPrev": has_prev
-        }
+        populate_users(logs, 'user', 'userInfo', ("firstName", "lastName", "username", "role"))
+        
+        data = logs
+        if with_facets:
+            facets = audit_partitions.facets(query, start, end, facet_limit)
+            populate_users(facets['user'], '_id', 'userInfo', ("firstName", "lastName", "username", "role"))
+            facets['user'] = serialize_docs(facets['user'])
+            data = {"logs": logs, "facets": facets}
         
         return jsonify(create_response(
             success=True,
-            data=serialize_docs(logs),
+            data=data,
             pagination=pagination,
             message="Audit logs retrieved successfully"
         )), 200
@@ -226,40 +187,81 @@ def get_audit_logs():
 @admin_required
 @audit_log('create_backup', 'system')
 def create_backup():
-    """Create database backup"""
+    """Start a database backup in the background, or resume an unfinished one"""
     try:
-        # This is a simplified backup - in production you'd use proper MongoDB backup tools
-        backup_data = {
-            "timestamp": datetime.utcnow(),
-            "collections": {}
-        }
+        data = request.get_json(silent=True) or {}
         
-        # Get collection names
-        collection_names = ['users', 'articles', 'reviews', 'categories', 'settings', 'notifications']
+        try:
+            job = backup_manager.start(
+                resume_id=data.get('resume'),
+                collections=data.get('collections'),
+                batch_size=int(data.get('batchSize', DEFAULT_BATCH_SIZE))
+            )
+        except ValueError as e:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "INVALID_BACKUP_REQUEST", "message": str(e)}
+            )), 400
+        except RuntimeError as e:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "BACKUP_IN_PROGRESS", "message": str(e)}
+            )), 409
         
-        for collection_name in collection_names:
-            collection = getattr(mongo_db.db, collection_name)
-            documents = list(collection.find({}))
-            backup_data['collections'][collection_name] = serialize_docs(documents)
+        return jsonify(create_response(
+            success=True,
+            data=job.progress(),
+            message="Database backup started"
+        )), 202
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "CREATE_BACKUP_ERROR", "message": str(e)}
+        )), 500
+
+@admin_bp.route('/backups', methods=['GET'])
+@admin_required
+def get_backups():
+    """List backups with their status"""
+    try:
+        return jsonify(create_response(
+            success=True,
+            data=backup_manager.list(),
+            message="Backups retrieved successfully"
+        )), 200
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "GET_BACKUPS_ERROR", "message": str(e)}
+        )), 500
+
+@admin_bp.route('/backups/<backup_id>', methods=['GET'])
+@admin_required
+def get_backup(backup_id):
+    """Get backup progress and throughput; ?verify=true rechecks file checksums"""
+    try:
+        backup = backup_manager.get(backup_id)
+        if backup is None:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "BACKUP_NOT_FOUND", "message": "Backup not found"}
+            )), 404
         
-        # In a real implementation, you would save this to a file or cloud storage
-        # For demo purposes, we'll just return success
+        if request.args.get('verify', 'false').lower() == 'true':
+            backup['verified'] = backup_manager.verify(backup_id)
         
         return jsonify(create_response(
             success=True,
-            data={
-                "backupId": str(ObjectId()),
-                "timestamp": backup_data['timestamp'].isoformat(),
-                "collections": list(backup_data['collections'].keys()),
-                "totalDocuments": sum(len(docs) for docs in backup_data['collections'].values())
-            },
-            message="Database backup created successfully"
+            data=backup,
+            message="Backup retrieved successfully"
         )), 200
         
     except Exception as e:
         return jsonify(create_response(
             success=False,
-            error={"code": "CREATE_BACKUP_ERROR", "message": str(e)}
+            error={"code": "GET_BACKUP_ERROR", "message": str(e)}
         )), 500
 
 @admin_bp.route('/maintenance', methods=['POST'])
@@ -313,28 +315,35 @@ def toggle_maintenance():
             error={"code": "TOGGLE_MAINTENANCE_ERROR", "message": str(e)}
         )), 500
 
+def get_storage_stats():
+    """Run dbStats and collStats for the main collections"""
+    # Database statistics
+    db_stats = mongo_db.db.command("dbStats")
+    
+    # Collection statistics
+    collection_stats = {}
+    collection_names = ['users', 'articles', 'reviews', 'categories', 'settings', 'notifications', 'uploads']
+    
+    for collection_name in collection_names:
+        try:
+            stats = mongo_db.db.command("collStats", collection_name)
+            collection_stats[collection_name] = {
+                "count": stats.get('count', 0),
+                "size": stats.get('size', 0),
+                "avgObjSize": stats.get('avgObjSize', 0)
+            }
+        except:
+            collection_stats[collection_name] = {"count": 0, "size": 0, "avgObjSize": 0}
+    
+    return db_stats, collection_stats
+
 @admin_bp.route('/system-info', methods=['GET'])
 @admin_required
 def get_system_info():
     """Get system information"""
     try:
-        # Database statistics
-        db_stats = mongo_db.db.command("dbStats")
-        
-        # Collection statistics
-        collection_stats = {}
-        collection_names = ['users', 'articles', 'reviews', 'categories', 'settings', 'notifications', 'uploads']
-        
-        for collection_name in collection_names:
-            try:
-                stats = mongo_db.db.command("collStats", collection_name)
-                collection_stats[collection_name] = {
-                    "count": stats.get('count', 0),
-                    "size": stats.get('size', 0),
-                    "avgObjSize": stats.get('avgObjSize', 0)
-                }
-            except:
-                collection_stats[collection_name] = {"count": 0, "size": 0, "avgObjSize": 0}
+        # Database and collection statistics (cached; pool and cache stats below stay live)
+        db_stats, collection_stats = result_cache.get_or_compute(('admin.system-info',), get_storage_stats, ttl=300)
         
         # System information
         system_info = {
@@ -348,6 +357,12 @@ def get_system_info():
                 "indexSize": db_stats.get('indexSize', 0)
             },
             "collections": collection_stats,
+            "connectionPool": mongo_db.pool_stats(),
+            "caches": {
+                "userAuth": user_auth_cache_stats(),
+                "results": result_cache_stats()
+            },
+            "auditWriter": audit_writer_stats(),
             "server": {
                 "timestamp": datetime.utcnow().isoformat(),
                 "uptime": "N/A"  # Would need to track application start time
@@ -375,80 +390,51 @@ def cleanup_system():
         data = request.get_json()
         cleanup_type = data.get('type', 'all')  # 'logs', 'notifications', 'uploads', 'all'
         days_old = data.get('days_old', 30)
+        dry_run = bool(data.get('dry_run', False))  # report what would be removed
         
         cutoff_date = datetime.utcnow() - timedelta(days=days_old)
         cleanup_results = {}
+        uploads_report = None
         
         if cleanup_type in ['logs', 'all']:
-            # Cleanup old audit logs
-            result = mongo_db.db.audit_logs.delete_many({
-                "timestamp": {"$lt": cutoff_date}
-            })
-            cleanup_results['audit_logs'] = result.deleted_count
+            # Drop monthly partitions that ended before the cutoff, then trim the pre-partitioning collection
+            dropped = audit_partitions.drop_expired(cutoff_date, dry_run)
+            query = {"timestamp": {"$lt": cutoff_date}}
+            if dry_run:
+                legacy = mongo_db.db.audit_logs.count_documents(query)
+            else:
+                legacy = delete_in_batches(mongo_db.db.audit_logs, query)
+            cleanup_results['audit_logs'] = sum(dropped.values()) + legacy
         
         if cleanup_type in ['notifications', 'all']:
-            # Cleanup old read notifications
-            result = mongo_db.db.notifications.delete_many({
-                "isRead": True,
-                "createdAt": {"$lt": cutoff_date}
-            })
-            cleanup_results['notifications'] = result.deleted_count
+            # Cleanup old read notifications (the TTL index removes them after NOTIFICATION_RETENTION_DAYS)
+            query = {"isRead": True, "createdAt": {"$lt": cutoff_date}}
+            if dry_run:
+                cleanup_results['notifications'] = mongo_db.db.notifications.count_documents(query)
+            else:
+                cleanup_results['notifications'] = delete_in_batches(mongo_db.db.notifications, query)
+            cleanup_results['broadcasts'] = Notification.cleanup_broadcasts(dry_run)
         
         if cleanup_type in ['uploads', 'all']:
-            # Find orphaned uploads (not referenced by any article or user)
-            # This is a simplified version - in production you'd want more thorough checking
-            all_uploads = mongo_db.db.uploads.find({}, {"filename": 1, "path": 1})
-            orphaned_count = 0
-            
-            for upload in all_uploads:
-                filename = upload['filename']
-                path = upload['path']
-                
-                # Check if referenced in articles
-                article_ref = mongo_db.db.articles.find_one({
-                    "$or": [
-                        {"featuredImage": path},
-                        {"gallery": path}
-                    ]
-                })
-                
-                # Check if referenced in user avatars
-                user_ref = mongo_db.db.users.find_one({"avatar": path})
-                
-                # Check if referenced in reviews
-                review_ref = mongo_db.db.reviews.find_one({"images": path})
-                
-                if not article_ref and not user_ref and not review_ref:
-                    # Delete orphaned upload
-                    mongo_db.db.uploads.delete_one({"_id": upload['_id']})
-                    
-                    # Delete physical file
-                    try:
-                        file_path = os.path.join(
-                            os.path.dirname(os.path.dirname(__file__)),
-                            'static',
-                            'uploads',
-                            filename
-                        )
-                        if os.path.exists(file_path):
-                            os.remove(file_path)
-                    except:
-                        pass
-                    
-                    orphaned_count += 1
-            
-            cleanup_results['orphaned_uploads'] = orphaned_count
+            # Orphaned uploads and media (not referenced by any article, user or review)
+            uploads_report = cleanup_orphaned_uploads(cutoff_date, dry_run)
+            cleanup_results['orphaned_uploads'] = uploads_report['orphaned']['total']
         
         total_cleaned = sum(cleanup_results.values())
         
+        if not dry_run:
+            invalidate_cached('admin.system-info', 'admin.stats', 'analytics.dashboard', 'media.stats', 'notifications.stats')
+        
         return jsonify(create_response(
             success=True,
             data={
                 "cleaned": cleanup_results,
                 "total": total_cleaned,
-                "cutoff_date": cutoff_date.isoformat()
+                "cutoff_date": cutoff_date.isoformat(),
+                "dry_run": dry_run,
+                "uploads": uploads_report
             },
-            message=f"Cleanup completed. Removed {total_cleaned} items."
+            message=f"Dry run: {total_cleaned} items would be removed." if dry_run else f"Cleanup completed. Removed {total_cleaned} items."
         )), 200
         
     except Exception as e:
@@ -528,6 +514,10 @@ def bulk_user_action():
                 error={"code": "INVALID_ACTION", "message": "Invalid action specified"}
             )), 400
         
+        invalidate_user_auth(*object_ids)
+        
+        invalidate_cached('admin.stats', 'analytics.users')
+        
         return jsonify(create_response(
             success=True,
             data={
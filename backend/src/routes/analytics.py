@@ -1,15 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required
 from bson import ObjectId
 from datetime import datetime, timedelta
 
+from src.analytics.activity import top_active_users
+from src.analytics.export import EXPORT_DATASETS, EXPORT_FORMATS, DEFAULT_BATCH_SIZE, export_stream
+from src.analytics.review_stats import ensure_review_buckets, get_buckets, rebuild_review_buckets
+from src.analytics.rollups import dashboard_rollups
+from src.analytics.wallet_stats import wallet_stats
 from src.models.database import mongo_db, create_response, serialize_doc
-from src.utils.decorators import admin_required, moderator_required
+from src.utils.decorators import admin_required, moderator_required, audit_log, cached_endpoint, invalidate_cached
+from src.utils.population import populate_users
 
 analytics_bp = Blueprint('analytics', __name__)
 
 @analytics_bp.route('/dashboard', methods=['GET'])
 @moderator_required
+@cached_endpoint('analytics.dashboard', ttl=60)
 def get_dashboard_analytics():
     """Get dashboard analytics (admin/moderator)"""
     try:
@@ -18,126 +25,33 @@ def get_dashboard_analytics():
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Basic counts
-        total_users = mongo_db.db.users.count_documents({})
-        total_articles = mongo_db.db.articles.count_documents({})
-        total_reviews = mongo_db.db.reviews.count_documents({})
-        pending_reviews = mongo_db.db.reviews.count_documents({"status": "pending"})
-        
-        # Recent activity
-        new_users = mongo_db.db.users.count_documents({
-            "createdAt": {"$gte": start_date}
-        })
-        new_articles = mongo_db.db.articles.count_documents({
-            "createdAt": {"$gte": start_date}
-        })
-        new_reviews = mongo_db.db.reviews.count_documents({
-            "createdAt": {"$gte": start_date}
-        })
-        
-        # User growth over time
-        user_growth = list(mongo_db.db.users.aggregate([
-            {
-                "$match": {
-                    "createdAt": {"$gte": start_date}
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "$dateToString": {
-                            "format": "%Y-%m-%d",
-                            "date": "$createdAt"
-                        }
-                    },
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]))
-        
-        # Article views and likes
-        article_stats = list(mongo_db.db.articles.aggregate([
-            {
-                "$group": {
-                    "_id": None,
-                    "totalViews": {"$sum": "$views"},
-                    "totalLikes": {"$sum": "$likes"},
-                    "avgViews": {"$avg": "$views"},
-                    "avgLikes": {"$avg": "$likes"}
-                }
-            }
-        ]))
-        
-        # Review ratings distribution
-        rating_distribution = list(mongo_db.db.reviews.aggregate([
-            {
-                "$match": {"status": "approved"}
-            },
-            {
-                "$group": {
-                    "_id": "$rating",
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]))
-        
-        # Top categories
-        top_categories = list(mongo_db.db.articles.aggregate([
-            {
-                "$match": {"status": "published"}
-            },
-            {
-                "$group": {
-                    "_id": "$category",
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]))
-        
-        # Wallet statistics
-        wallet_stats = list(mongo_db.db.users.aggregate([
-            {
-                "$group": {
-                    "_id": None,
-                    "totalBalance": {"$sum": "$wallet.balance"},
-                    "avgBalance": {"$avg": "$wallet.balance"},
-                    "usersWithWallet": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$wallet.balance", 0]}, 1, 0]
-                        }
-                    }
-                }
-            }
-        ]))
+        # Materialized rollups: one totals document plus one document per day
+        totals = dashboard_rollups.get_totals()
+        daily = dashboard_rollups.get_days(start_date, end_date)
         
         analytics_data = {
             "overview": {
-                "totalUsers": total_users,
-                "totalArticles": total_articles,
-                "totalReviews": total_reviews,
-                "pendingReviews": pending_reviews,
-                "newUsers": new_users,
-                "newArticles": new_articles,
-                "newReviews": new_reviews
+                "totalUsers": totals['totalUsers'],
+                "totalArticles": totals['totalArticles'],
+                "totalReviews": totals['totalReviews'],
+                "pendingReviews": totals['pendingReviews'],
+                "newUsers": sum(day['newUsers'] for day in daily),
+                "newArticles": sum(day['newArticles'] for day in daily),
+                "newReviews": sum(day['newReviews'] for day in daily)
             },
-            "userGrowth": user_growth,
-            "articleStats": article_stats[0] if article_stats else {
-                "totalViews": 0,
-                "totalLikes": 0,
-                "avgViews": 0,
-                "avgLikes": 0
-            },
-            "ratingDistribution": rating_distribution,
-            "topCategories": top_categories,
-            "walletStats": wallet_stats[0] if wallet_stats else {
-                "totalBalance": 0,
-                "avgBalance": 0,
-                "usersWithWallet": 0
-            }
+            "userGrowth": [
+                {"_id": day['_id'], "count": day['newUsers']}
+                for day in daily if day['newUsers']
+            ],
+            "articleStats": totals['articleStats'],
+            "ratingDistribution": totals['ratingDistribution'],
+            "topCategories": totals['topCategories'],
+            "walletStats": wallet_stats.summary(),
+            "walletActivity": [
+                {"date": day['_id'], **day['wallet']}
+                for day in daily if day['wallet']
+            ],
+            "computedAt": totals['computedAt']
         }
         
         return jsonify(create_response(
@@ -154,6 +68,7 @@ def get_dashboard_analytics():
 
 @analytics_bp.route('/articles', methods=['GET'])
 @moderator_required
+@cached_endpoint('analytics.articles', ttl=120)
 def get_article_analytics():
     """Get article analytics"""
     try:
@@ -194,14 +109,7 @@ def get_article_analytics():
         ]))
         
         # Populate author information
-        for stat in author_stats:
-            if stat['_id']:
-                author = mongo_db.db.users.find_one(
-                    {"_id": ObjectId(stat['_id'])},
-                    {"firstName": 1, "lastName": 1, "username": 1}
-                )
-                if author:
-                    stat['authorInfo'] = serialize_doc(author)
+        populate_users(author_stats, '_id', 'authorInfo')
         
         analytics_data = {
             "mostViewed": serialize_doc(most_viewed),
@@ -224,38 +132,38 @@ def get_article_analytics():
 
 @analytics_bp.route('/reviews', methods=['GET'])
 @moderator_required
+@cached_endpoint('analytics.reviews', ttl=60)
 def get_review_analytics():
     """Get review analytics"""
     try:
+        days = int(request.args.get('days', 30))
+        
+        # Incrementally maintained buckets (see src/analytics/review_stats.py)
+        ensure_review_buckets()
+        months = list(get_buckets('month').sort("key", 1))
+        
         # Reviews by status
-        status_distribution = list(mongo_db.db.reviews.aggregate([
-            {
-                "$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1}
-                }
-            }
-        ]))
+        statuses = {}
+        for month in months:
+            for status, count in month.get('status', {}).items():
+                statuses[status] = statuses.get(status, 0) + count
+        status_distribution = [{"_id": status, "count": count} for status, count in statuses.items() if count]
         
         # Average rating over time
-        rating_trends = list(mongo_db.db.reviews.aggregate([
-            {
-                "$match": {"status": "approved"}
-            },
+        rating_trends = [
+            {"_id": month['key'], "avgRating": month['ratingSum'] / month['count'], "count": month['count']}
+            for month in months if month.get('count')
+        ]
+        since = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+        daily_rating_trends = [
             {
-                "$group": {
-                    "_id": {
-                        "$dateToString": {
-                            "format": "%Y-%m",
-                            "date": "$createdAt"
-                        }
-                    },
-                    "avgRating": {"$avg": "$rating"},
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]))
+                "_id": day['key'],
+                "avgRating": day['ratingSum'] / day['count'],
+                "count": day['count'],
+                "ratings": {rating: count for rating, count in day.get('ratings', {}).items() if count}
+            }
+            for day in get_buckets('day', key={"$gte": since}).sort("key", 1) if day.get('count')
+        ]
         
         # Most helpful reviews
         most_helpful = list(mongo_db.db.reviews.find(
@@ -264,67 +172,32 @@ def get_review_analytics():
         ).sort("helpfulVotes", -1).limit(10))
         
         # Reviews by location
-        location_stats = list(mongo_db.db.reviews.aggregate([
-            {
-                "$match": {
-                    "status": "approved",
-                    "location.name": {"$ne": ""}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$location.name",
-                    "count": {"$sum": 1},
-                    "avgRating": {"$avg": "$rating"}
-                }
-            },
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]))
+        location_stats = [
+            {"_id": location['name'], "count": location['count'], "avgRating": location['ratingSum'] / location['count']}
+            for location in get_buckets('location', count={"$gt": 0}).sort("count", -1).limit(10)
+        ]
         
         # Moderation statistics
-        moderation_stats = list(mongo_db.db.reviews.aggregate([
-            {
-                "$match": {"moderatedBy": {"$ne": None}}
-            },
-            {
-                "$group": {
-                    "_id": "$moderatedBy",
-                    "approved": {
-                        "$sum": {
-                            "$cond": [{"$eq": ["$status", "approved"]}, 1, 0]
-                        }
-                    },
-                    "rejected": {
-                        "$sum": {
-                            "$cond": [{"$eq": ["$status", "rejected"]}, 1, 0]
-                        }
-                    },
-                    "hidden": {
-                        "$sum": {
-                            "$cond": [{"$eq": ["$status", "hidden"]}, 1, 0]
-                        }
-                    }
-                }
-            }
-        ]))
+        moderation_stats = []
+        for bucket in get_buckets('moderator'):
+            decisions = bucket.get('decisions', {})
+            moderation_stats.append({
+                "_id": bucket['moderator'],
+                "approved": decisions.get('approved', 0),
+                "rejected": decisions.get('rejected', 0),
+                "hidden": decisions.get('hidden', 0)
+            })
         
         # Populate moderator information
-        for stat in moderation_stats:
-            if stat['_id']:
-                moderator = mongo_db.db.users.find_one(
-                    {"_id": ObjectId(stat['_id'])},
-                    {"firstName": 1, "lastName": 1, "username": 1}
-                )
-                if moderator:
-                    stat['moderatorInfo'] = serialize_doc(moderator)
+        populate_users(moderation_stats, '_id', 'moderatorInfo')
         
         analytics_data = {
             "statusDistribution": status_distribution,
             "ratingTrends": rating_trends,
+            "dailyRatingTrends": daily_rating_trends,
             "mostHelpful": serialize_doc(most_helpful),
             "locationStats": location_stats,
-            "moderationStats": moderation_stats
+            "moderationStats": serialize_doc(moderation_stats)
         }
         
         return jsonify(create_response(
@@ -341,6 +214,7 @@ def get_review_analytics():
 
 @analytics_bp.route('/users', methods=['GET'])
 @admin_required
+@cached_endpoint('analytics.users', ttl=120)
 def get_user_analytics():
     """Get user analytics (admin only)"""
     try:
@@ -380,43 +254,8 @@ def get_user_analytics():
             }
         ]))
         
-        # Most active users (by articles and reviews)
-        user_activity = list(mongo_db.db.users.aggregate([
-            {
-                "$lookup": {
-                    "from": "articles",
-                    "localField": "_id",
-                    "foreignField": "author",
-                    "as": "articles"
-                }
-            },
-            {
-                "$lookup": {
-                    "from": "reviews",
-                    "localField": "_id",
-                    "foreignField": "author",
-                    "as": "reviews"
-                }
-            },
-            {
-                "$project": {
-                    "firstName": 1,
-                    "lastName": 1,
-                    "username": 1,
-                    "role": 1,
-                    "articleCount": {"$size": "$articles"},
-                    "reviewCount": {"$size": "$reviews"},
-                    "totalActivity": {
-                        "$add": [
-                            {"$size": "$articles"},
-                            {"$size": "$reviews"}
-                        ]
-                    }
-                }
-            },
-            {"$sort": {"totalActivity": -1}},
-            {"$limit": 10}
-        ]))
+        # Most active users (by articles and reviews), from maintained counters
+        user_activity = top_active_users(10)
         
         # Login activity (last 30 days)
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
@@ -453,15 +292,19 @@ def export_analytics():
         export_type = request.args.get('type', 'dashboard')
         format_type = request.args.get('format', 'json')
         
-        if export_type == 'dashboard':
-            # Get dashboard analytics
-            analytics_data = get_dashboard_analytics()
-        elif export_type == 'articles':
-            analytics_data = get_article_analytics()
-        elif export_type == 'reviews':
-            analytics_data = get_review_analytics()
-        elif export_type == 'users':
-            analytics_data = get_user_analytics()
+        views = {
+            'dashboard': get_dashboard_analytics,
+            'articles': get_article_analytics,
+            'reviews': get_review_analytics,
+            'users': get_user_analytics
+        }
+        
+        if export_type in views:
+            # Call the view without its role check; access was already checked for this endpoint
+            response = current_app.make_response(views[export_type].__wrapped__())
+            if response.status_code != 200:
+                return response
+            analytics_data = response.get_json()['data']
         else:
             return jsonify(create_response(
                 success=False,
@@ -487,3 +330,130 @@ def export_analytics():
             error={"code": "EXPORT_ANALYTICS_ERROR", "message": str(e)}
         )), 500
 
+def _parse_export_date(value, end=False):
+    """Parse an ISO date/datetime; a bare end date includes that whole day"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+@analytics_bp.route('/export/<dataset>', methods=['GET'])
+@admin_required
+def export_dataset(dataset):
+    """Stream raw data as NDJSON, CSV or gzipped columnar blocks (admin only)"""
+    try:
+        format_type = request.args.get('format', 'ndjson')  # 'ndjson', 'csv', 'columnar'
+        batch_size = int(request.args.get('batchSize', DEFAULT_BATCH_SIZE))
+        
+        if dataset not in EXPORT_DATASETS:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "INVALID_EXPORT_TYPE", "message": f"Exportable datasets: {', '.join(EXPORT_DATASETS)}"}
+            )), 400
+        
+        if format_type not in EXPORT_FORMATS:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "INVALID_EXPORT_FORMAT", "message": f"Supported formats: {', '.join(EXPORT_FORMATS)}"}
+            )), 400
+        
+        try:
+            start = _parse_export_date(request.args.get('from'))
+            end = _parse_export_date(request.args.get('to'), end=True)
+        except ValueError:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "INVALID_DATE", "message": "from/to must be ISO dates (YYYY-MM-DD)"}
+            )), 400
+        
+        stream, mimetype, filename = export_stream(dataset, format_type, start, end, batch_size)
+        
+        return Response(
+            stream_with_context(stream),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "EXPORT_DATASET_ERROR", "message": str(e)}
+        )), 500
+
+@analytics_bp.route('/rollups/rebuild', methods=['POST'])
+@admin_required
+def rebuild_rollups():
+    """Recompute dashboard rollups for the last N days (Admin only)"""
+    try:
+        days = int(request.args.get('days', 90))
+        
+        dashboard_rollups.rebuild(days)
+        
+        invalidate_cached('analytics.dashboard', 'admin.stats')
+        
+        return jsonify(create_response(
+            success=True,
+            data={"days": days},
+            message="Dashboard rollups rebuilt successfully"
+        )), 200
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "REBUILD_ROLLUPS_ERROR", "message": str(e)}
+        )), 500
+
+@analytics_bp.route('/rollups/reconcile', methods=['POST'])
+@admin_required
+@audit_log('reconcile_rollups', 'system')
+def reconcile_rollups():
+    """Compare dashboard rollups with a full recompute (Admin only)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        days = int(data.get('days', 30))
+        fix = bool(data.get('fix', False))
+        
+        report = dashboard_rollups.reconcile(days, fix=fix)
+        
+        if fix:
+            invalidate_cached('analytics.dashboard', 'admin.stats')
+        
+        return jsonify(create_response(
+            success=True,
+            data=report,
+            message="Dashboard rollups reconciled successfully"
+        )), 200
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "RECONCILE_ROLLUPS_ERROR", "message": str(e)}
+        )), 500
+
+@analytics_bp.route('/reviews/rebuild', methods=['POST'])
+@admin_required
+def rebuild_review_analytics():
+    """Recompute review analytics buckets from the reviews collection (Admin only)"""
+    try:
+        buckets = rebuild_review_buckets()
+        if buckets is None:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "REBUILD_IN_PROGRESS", "message": "Review analytics are already being rebuilt"}
+            )), 409
+        
+        invalidate_cached('analytics.reviews')
+        
+        return jsonify(create_response(
+            success=True,
+            data={"buckets": buckets},
+            message="Review analytics rebuilt successfully"
+        )), 200
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "REBUILD_REVIEW_ANALYTICS_ERROR", "message": str(e)}
+        )), 500
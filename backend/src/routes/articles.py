@@ -4,8 +4,11 @@ from bson import ObjectId
 from datetime import datetime
 import re
 
+from src.analytics.activity import record_activity
 from src.models.database import mongo_db, create_response, serialize_doc, serialize_docs, paginate_query
-from src.utils.decorators import admin_required, moderator_required, user_required, owner_or_admin_required, get_current_user, audit_log
+from src.search.engine import search_engine
+from src.utils.decorators import admin_required, moderator_required, user_required, owner_or_admin_required, get_current_user, get_user_auth, audit_log
+from src.utils.population import populate_users
 
 articles_bp = Blueprint('articles', __name__)
 
@@ -39,6 +42,8 @@ def get_articles():
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         category = request.args.get('category')
         author = request.args.get('author')
         search = request.args.get('search')
@@ -60,18 +65,13 @@ def get_articles():
             page, 
             limit, 
             'publishedAt', 
-            -1
+            -1,
+            cursor=cursor,
+            count=count_mode
         )
         
         # Populate author information
-        for article in articles:
-            if article.get('author'):
-                author_data = mongo_db.db.users.find_one(
-                    {"_id": ObjectId(article['author'])},
-                    {"firstName": 1, "lastName": 1, "username": 1, "avatar": 1}
-                )
-                if author_data:
-                    article['authorInfo'] = serialize_doc(author_data)
+        populate_users(articles, 'author', 'authorInfo', ("firstName", "lastName", "username", "avatar"))
         
         return jsonify(create_response(
             success=True,
@@ -135,6 +135,8 @@ def get_articles_by_category(slug):
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         
         # Find category
         category = mongo_db.db.categories.find_one({"slug": slug})
@@ -156,7 +158,9 @@ def get_articles_by_category(slug):
             page, 
             limit, 
             'publishedAt', 
-            -1
+            -1,
+            cursor=cursor,
+            count=count_mode
         )
         
         return jsonify(create_response(
@@ -268,6 +272,8 @@ def create_article():
         
         result = mongo_db.db.articles.insert_one(article_doc)
         article_doc['_id'] = result.inserted_id
+        search_engine.index_article(article_doc)
+        record_activity(current_user_id, 'article', 1)
         
         return jsonify(create_response(
             success=True,
@@ -288,7 +294,7 @@ def update_article(id):
     """Update article (author/admin/moderator)"""
     try:
         current_user_id = get_jwt_identity()
-        current_user = get_current_user()
+        current_user = get_user_auth(current_user_id) or {}
         data = request.get_json()
         
         # Find article
@@ -301,7 +307,7 @@ def update_article(id):
         
         # Check permissions
         is_author = str(article['author']) == current_user_id
-        is_admin_or_moderator = current_user['role'] in ['admin', 'moderator']
+        is_admin_or_moderator = current_user.get('role') in ['admin', 'moderator']
         
         if not (is_author or is_admin_or_moderator):
             return jsonify(create_response(
@@ -337,6 +343,7 @@ def update_article(id):
         
         # Get updated article
         updated_article = mongo_db.db.articles.find_one({"_id": ObjectId(id)})
+        search_engine.index_article(updated_article)
         
         return jsonify(create_response(
             success=True,
@@ -357,7 +364,7 @@ def delete_article(id):
     """Delete article (author/admin)"""
     try:
         current_user_id = get_jwt_identity()
-        current_user = get_current_user()
+        current_user = get_user_auth(current_user_id) or {}
         
         # Find article
         article = mongo_db.db.articles.find_one({"_id": ObjectId(id)})
@@ -369,7 +376,7 @@ def delete_article(id):
         
         # Check permissions (only author or admin can delete)
         is_author = str(article['author']) == current_user_id
-        is_admin = current_user['role'] == 'admin'
+        is_admin = current_user.get('role') == 'admin'
         
         if not (is_author or is_admin):
             return jsonify(create_response(
@@ -379,6 +386,8 @@ def delete_article(id):
         
         # Delete article
         mongo_db.db.articles.delete_one({"_id": ObjectId(id)})
+        search_engine.remove_article(id)
+        record_activity(article['author'], 'article', -1)
         
         return jsonify(create_response(
             success=True,
@@ -406,16 +415,17 @@ def publish_article(id):
             )), 404
         
         # Update article status
+        update_data = {
+            "status": "published",
+            "publishedAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow()
+        }
         mongo_db.db.articles.update_one(
             {"_id": ObjectId(id)},
-            {
-                "$set": {
-                    "status": "published",
-                    "publishedAt": datetime.utcnow(),
-                    "updatedAt": datetime.utcnow()
-                }
-            }
+            {"$set": update_data}
         )
+        article.update(update_data)
+        search_engine.index_article(article)
         
         return jsonify(create_response(
             success=True,
@@ -452,6 +462,7 @@ def archive_article(id):
                 }
             }
         )
+        search_engine.remove_article(id)
         
         return jsonify(create_response(
             success=True,
@@ -502,6 +513,8 @@ def get_my_articles():
         current_user_id = get_jwt_identity()
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         status = request.args.get('status')
         
         # Build query
@@ -516,7 +529,9 @@ def get_my_articles():
             page, 
             limit, 
             'createdAt', 
-            -1
+            -1,
+            cursor=cursor,
+            count=count_mode
         )
         
         return jsonify(create_response(
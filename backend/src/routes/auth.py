@@ -8,6 +8,7 @@ import secrets
 import string
 
 from src.models.database import mongo_db, create_response, serialize_doc
+from src.models.wallet import Wallet
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -95,14 +96,7 @@ def register():
             "isEmailVerified": False,
             "emailVerificationToken": verification_token,
             "wallet": {
-                "balance": 100,  # Welcome bonus
-                "transactions": [{
-                    "type": "credit",
-                    "amount": 100,
-                    "description": "Welcome bonus",
-                    "timestamp": datetime.utcnow(),
-                    "transactionId": str(ObjectId())
-                }]
+                "balance": 0
             },
             "preferences": {
                 "language": "en",
@@ -116,6 +110,10 @@ def register():
         result = mongo_db.db.users.insert_one(user_doc)
         user_doc['_id'] = result.inserted_id
         
+        # Welcome bonus, recorded in the wallet ledger
+        welcome = Wallet.credit(result.inserted_id, 100, "Welcome bonus", 'welcome', 'welcome')
+        user_doc['wallet'] = {"balance": welcome.get('balanceAfter', 0)}
+        
         # Create access and refresh tokens
         access_token = create_access_token(
             identity=str(result.inserted_id),
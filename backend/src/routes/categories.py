@@ -5,6 +5,7 @@ from datetime import datetime
 import re
 
 from src.models.database import mongo_db, create_response, serialize_doc, serialize_docs
+from src.search.suggest import suggestion_index
 from src.utils.decorators import admin_required, audit_log
 
 categories_bp = Blueprint('categories', __name__)
@@ -166,6 +167,7 @@ def create_category():
         }
         
         result = mongo_db.db.categories.insert_one(category_doc)
+        suggestion_index.mark_stale()
         category_doc['_id'] = result.inserted_id
         
         return jsonify(create_response(
@@ -257,6 +259,7 @@ def update_category(id):
             {"_id": ObjectId(id)},
             {"$set": update_data}
         )
+        suggestion_index.mark_stale()
         
         # Get updated category
         updated_category = mongo_db.db.categories.find_one({"_id": ObjectId(id)})
@@ -305,6 +308,7 @@ def delete_category(id):
         
         # Delete category
         mongo_db.db.categories.delete_one({"_id": ObjectId(id)})
+        suggestion_index.mark_stale()
         
         return jsonify(create_response(
             success=True,
@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 
 from src.models.database import mongo_db, create_response
 from src.models.coupon import Coupon
-from src.utils.decorators import admin_required, moderator_required, user_required
+from src.utils.decorators import admin_required, moderator_required, user_required, cached_endpoint, invalidate_cached
 
 coupons_bp = Blueprint('coupons', __name__)
 
@@ -178,6 +178,8 @@ def get_all_coupons():
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         status = request.args.get('status')  # active, inactive, expired
         
         query = {}
@@ -192,7 +194,7 @@ def get_all_coupons():
         elif status == 'expired':
             query = {"validUntil": {"$lt": datetime.utcnow()}}
         
-        coupons, pagination = Coupon.find_all(query, page, limit)
+        coupons, pagination = Coupon.find_all(query, page, limit, cursor=cursor, count=count_mode)
         
         return jsonify(create_response(
             success=True,
@@ -227,6 +229,8 @@ def create_coupon():
         data['createdBy'] = current_user_id
         coupon = Coupon.create(data)
         
+        invalidate_cached('coupons.stats')
+        
         return jsonify(create_response(
             success=True,
             data=coupon,
@@ -260,6 +264,8 @@ def update_coupon(coupon_id):
                 error={"code": "COUPON_NOT_FOUND", "message": "Coupon not found"}
             )), 404
         
+        invalidate_cached('coupons.stats')
+        
         return jsonify(create_response(
             success=True,
             data=coupon,
@@ -285,6 +291,8 @@ def delete_coupon(coupon_id):
                 error={"code": "COUPON_NOT_FOUND", "message": "Coupon not found"}
             )), 404
         
+        invalidate_cached('coupons.stats')
+        
         return jsonify(create_response(
             success=True,
             message="Coupon deleted successfully"
@@ -298,6 +306,7 @@ def delete_coupon(coupon_id):
 
 @coupons_bp.route('/admin/stats', methods=['GET'])
 @moderator_required
+@cached_endpoint('coupons.stats', ttl=60)
 def get_coupon_stats():
     """Get coupon statistics (admin/moderator)"""
     try:
@@ -8,7 +8,7 @@ from datetime import datetime
 
 from src.models.database import mongo_db, create_response
 from src.models.media import Media
-from src.utils.decorators import admin_required, moderator_required, user_required
+from src.utils.decorators import admin_required, moderator_required, user_required, cached_endpoint, invalidate_cached
 
 media_bp = Blueprint('media', __name__)
 
@@ -139,14 +139,16 @@ def get_media():
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         folder = request.args.get('folder')
         file_type = request.args.get('type')  # image, video, document
         search = request.args.get('search')
         
         if search:
-            media_list, pagination = Media.search(search, page, limit)
+            media_list, pagination = Media.search(search, page, limit, cursor=cursor, count=count_mode)
         elif folder:
-            media_list, pagination = Media.find_by_folder(folder, page, limit)
+            media_list, pagination = Media.find_by_folder(folder, page, limit, cursor=cursor, count=count_mode)
         elif file_type:
             type_map = {
                 'image': 'image/',
@@ -154,9 +156,9 @@ def get_media():
                 'document': 'application/'
             }
             mime_prefix = type_map.get(file_type, file_type)
-            media_list, pagination = Media.find_by_type(mime_prefix, page, limit)
+            media_list, pagination = Media.find_by_type(mime_prefix, page, limit, cursor=cursor, count=count_mode)
         else:
-            media_list, pagination = Media.find_all(page=page, limit=limit)
+            media_list, pagination = Media.find_all(page=page, limit=limit, cursor=cursor, count=count_mode)
         
         return jsonify(create_response(
             success=True,
@@ -379,6 +381,8 @@ def delete_folder(folder_name):
     try:
         success = Media.delete_folder(folder_name)
         
+        invalidate_cached('media.stats')
+        
         return jsonify(create_response(
             success=True,
             message="Folder deleted successfully"
@@ -407,6 +411,8 @@ def bulk_move_media():
         
         moved_count = Media.move_to_folder(media_ids, folder_name)
         
+        invalidate_cached('media.stats')
+        
         return jsonify(create_response(
             success=True,
             data={"moved_count": moved_count},
@@ -435,6 +441,8 @@ def bulk_delete_media():
         
         deleted_count = Media.bulk_delete(media_ids)
         
+        invalidate_cached('media.stats')
+        
         return jsonify(create_response(
             success=True,
             data={"deleted_count": deleted_count},
@@ -449,6 +457,7 @@ def bulk_delete_media():
 
 @media_bp.route('/stats', methods=['GET'])
 @moderator_required
+@cached_endpoint('media.stats', ttl=60)
 def get_media_stats():
     """Get media library statistics"""
     try:
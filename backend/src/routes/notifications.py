@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
-from src.models.database import mongo_db, create_response, serialize_doc, paginate_query
-from src.utils.decorators import user_required, admin_required, audit_log
+from src.models.database import mongo_db, create_response, serialize_doc, delete_in_batches
+from src.models.notification import Notification
+from src.utils.decorators import user_required, admin_required, audit_log, cached_endpoint, invalidate_cached
+from src.utils.fanout import JOB_STATUSES, notification_fanout
 
 notifications_bp = Blueprint('notifications', __name__)
 
@@ -16,21 +18,18 @@ def get_notifications():
         current_user_id = get_jwt_identity()
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
         
-        # Build query
-        query = {"recipient": ObjectId(current_user_id)}
-        if unread_only:
-            query['isRead'] = False
-        
-        # Get paginated notifications
-        notifications, pagination = paginate_query(
-            mongo_db.db.notifications,
-            query,
+        # Direct notifications merged with the broadcasts the user can see
+        notifications, pagination = Notification.feed(
+            current_user_id,
             page,
             limit,
-            'createdAt',
-            -1
+            cursor=cursor,
+            count=count_mode,
+            unread_only=unread_only
         )
         
         return jsonify(create_response(
@@ -54,24 +53,13 @@ def mark_notification_read(id):
     try:
         current_user_id = get_jwt_identity()
         
-        # Find notification
-        notification = mongo_db.db.notifications.find_one({
-            "_id": ObjectId(id),
-            "recipient": ObjectId(current_user_id)
-        })
-        
-        if not notification:
+        # Mark as read (a broadcast is recorded in the user's read state)
+        if not Notification.mark_read(current_user_id, id):
             return jsonify(create_response(
                 success=False,
                 error={"code": "NOTIFICATION_NOT_FOUND", "message": "Notification not found"}
             )), 404
         
-        # Mark as read
-        mongo_db.db.notifications.update_one(
-            {"_id": ObjectId(id)},
-            {"$set": {"isRead": True}}
-        )
-        
         return jsonify(create_response(
             success=True,
             message="Notification marked as read"
@@ -91,19 +79,13 @@ def mark_all_notifications_read():
     try:
         current_user_id = get_jwt_identity()
         
-        # Mark all user's notifications as read
-        result = mongo_db.db.notifications.update_many(
-            {
-                "recipient": ObjectId(current_user_id),
-                "isRead": False
-            },
-            {"$set": {"isRead": True}}
-        )
+        # Mark all user's notifications and broadcasts as read
+        updated_count = Notification.mark_all_read(current_user_id)
         
         return jsonify(create_response(
             success=True,
-            data={"updated_count": result.modified_count},
-            message=f"Marked {result.modified_count} notifications as read"
+            data={"updated_count": updated_count},
+            message=f"Marked {updated_count} notifications as read"
         )), 200
         
     except Exception as e:
@@ -120,21 +102,13 @@ def delete_notification(id):
     try:
         current_user_id = get_jwt_identity()
         
-        # Find notification
-        notification = mongo_db.db.notifications.find_one({
-            "_id": ObjectId(id),
-            "recipient": ObjectId(current_user_id)
-        })
-        
-        if not notification:
+        # Delete notification (a broadcast is only hidden for this user)
+        if not Notification.delete(current_user_id, id):
             return jsonify(create_response(
                 success=False,
                 error={"code": "NOTIFICATION_NOT_FOUND", "message": "Notification not found"}
             )), 404
         
-        # Delete notification
-        mongo_db.db.notifications.delete_one({"_id": ObjectId(id)})
-        
         return jsonify(create_response(
             success=True,
             message="Notification deleted successfully"
@@ -153,11 +127,8 @@ def get_unread_count():
     try:
         current_user_id = get_jwt_identity()
         
-        # Count unread notifications
-        count = mongo_db.db.notifications.count_documents({
-            "recipient": ObjectId(current_user_id),
-            "isRead": False
-        })
+        # Count unread notifications and broadcasts
+        count = Notification.unread_count(current_user_id)
         
         return jsonify(create_response(
             success=True,
@@ -193,57 +164,161 @@ def send_notification():
         notification_type = data.get('type', 'system')
         notification_data = data.get('data', {})
         
+        send_at = None
+        if data.get('send_at'):
+            send_at = datetime.fromisoformat(data['send_at'].replace('Z', '+00:00'))
+            if send_at.tzinfo:
+                send_at = send_at.astimezone(timezone.utc).replace(tzinfo=None)
+        
         # Determine recipients
-        recipients = []
         if data.get('recipient_id'):
-            # Single recipient
-            recipients = [ObjectId(data['recipient_id'])]
+            audience = {"type": "user", "value": str(ObjectId(data['recipient_id']))}
         elif data.get('recipient_role'):
-            # All users with specific role
-            users = mongo_db.db.users.find({"role": data['recipient_role']}, {"_id": 1})
-            recipients = [user['_id'] for user in users]
+            audience = {"type": "role", "value": data['recipient_role']}
         elif data.get('all_users'):
-            # All users
-            users = mongo_db.db.users.find({}, {"_id": 1})
-            recipients = [user['_id'] for user in users]
+            audience = {"type": "all", "value": None}
         else:
             return jsonify(create_response(
                 success=False,
                 error={"code": "NO_RECIPIENTS", "message": "No recipients specified"}
             )), 400
         
-        # Create notifications
-        notifications = []
-        for recipient_id in recipients:
-            notification_doc = {
-                "recipient": recipient_id,
-                "type": notification_type,
-                "title": title,
-                "message": message,
-                "data": notification_data,
-                "isRead": False,
-                "createdAt": datetime.utcnow()
-            }
-            notifications.append(notification_doc)
+        notification = {
+            "type": notification_type,
+            "title": title,
+            "message": message,
+            "data": notification_data
+        }
+        
+        # A single immediate recipient is written inline
+        if audience['type'] == 'user' and send_at is None:
+            Notification.create(audience['value'], notification_type, title, message, notification_data)
+            
+            invalidate_cached('notifications.stats')
+            
+            return jsonify(create_response(
+                success=True,
+                data={"sent_count": 1},
+                message="Notification sent to 1 users"
+            )), 201
+        
+        # Role and all-user announcements are stored once as a broadcast
+        # unless per-user copies are requested
+        if audience['type'] != 'user' and data.get('broadcast', True):
+            broadcast = Notification.broadcast(notification, audience, send_at)
+            
+            invalidate_cached('notifications.stats')
+            
+            return jsonify(create_response(
+                success=True,
+                data=serialize_doc(broadcast),
+                message="Broadcast scheduled" if send_at else "Broadcast sent"
+            )), 201
         
-        # Insert notifications
-        if notifications:
-            mongo_db.db.notifications.insert_many(notifications)
+        # Per-user copies are delivered in chunks by the fan-out worker
+        job = notification_fanout.submit(notification, audience, send_at)
         
         return jsonify(create_response(
             success=True,
-            data={"sent_count": len(notifications)},
-            message=f"Notification sent to {len(notifications)} users"
-        )), 201
+            data=notification_fanout.progress(job),
+            message="Notification scheduled" if send_at else "Notification queued for delivery"
+        )), 202
         
+    except ValueError as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "INVALID_NOTIFICATION_REQUEST", "message": str(e)}
+        )), 400
     except Exception as e:
         return jsonify(create_response(
             success=False,
             error={"code": "SEND_NOTIFICATION_ERROR", "message": str(e)}
         )), 500
 
+@notifications_bp.route('/admin/jobs', methods=['GET'])
+@admin_required
+def get_notification_jobs():
+    """List notification fan-out jobs with their progress (admin only)"""
+    try:
+        status = request.args.get('status')
+        limit = min(int(request.args.get('limit', 50)), 200)
+        
+        if status and status not in JOB_STATUSES:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "INVALID_STATUS", "message": f"status must be one of: {', '.join(JOB_STATUSES)}"}
+            )), 400
+        
+        return jsonify(create_response(
+            success=True,
+            data=notification_fanout.list(status, limit),
+            message="Notification jobs retrieved successfully"
+        )), 200
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "GET_NOTIFICATION_JOBS_ERROR", "message": str(e)}
+        )), 500
+
+@notifications_bp.route('/admin/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_notification_job(job_id):
+    """Get a notification fan-out job's progress (admin only)"""
+    try:
+        job = notification_fanout.get(job_id)
+        if job is None:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "JOB_NOT_FOUND", "message": "Notification job not found"}
+            )), 404
+        
+        return jsonify(create_response(
+            success=True,
+            data=job,
+            message="Notification job retrieved successfully"
+        )), 200
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "GET_NOTIFICATION_JOB_ERROR", "message": str(e)}
+        )), 500
+
+@notifications_bp.route('/admin/jobs/<job_id>/<action>', methods=['POST'])
+@admin_required
+@audit_log('update_notification_job', 'notification')
+def update_notification_job(job_id, action):
+    """Cancel a pending/running job or resume a failed/cancelled one (admin only)"""
+    try:
+        if action not in ('cancel', 'resume'):
+            return jsonify(create_response(
+                success=False,
+                error={"code": "INVALID_ACTION", "message": "action must be cancel or resume"}
+            )), 400
+        
+        job = notification_fanout.cancel(job_id) if action == 'cancel' else notification_fanout.resume(job_id)
+        if job is None:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "JOB_NOT_UPDATED", "message": f"No notification job to {action} was found"}
+            )), 409
+        
+        return jsonify(create_response(
+            success=True,
+            data=job,
+            message=f"Notification job {action} requested"
+        )), 200
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "UPDATE_NOTIFICATION_JOB_ERROR", "message": str(e)}
+        )), 500
+
 @notifications_bp.route('/admin/stats', methods=['GET'])
 @admin_required
+@cached_endpoint('notifications.stats', ttl=60)
 def get_notification_stats():
     """Get notification statistics (admin only)"""
     try:
@@ -272,8 +347,11 @@ def get_notification_stats():
             {"title": 1, "type": 1, "createdAt": 1, "isRead": 1}
         ).sort("createdAt", -1).limit(10))
         
+        broadcasts = mongo_db.db.broadcasts.count_documents({})
+        
         stats_data = {
             "total": total_notifications,
+            "broadcasts": broadcasts,
             "unread": unread_notifications,
             "read": total_notifications - unread_notifications,
             "by_type": type_stats,
@@ -292,6 +370,32 @@ def get_notification_stats():
             error={"code": "GET_NOTIFICATION_STATS_ERROR", "message": str(e)}
         )), 500
 
+@notifications_bp.route('/admin/unread/repair', methods=['POST'])
+@admin_required
+@audit_log('repair_unread_counts', 'notification')
+def repair_unread_counts():
+    """Recompute unread counters from the notifications (admin only)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if data.get('user_id'):
+            unread = Notification.repair_unread(data['user_id'])
+            report = {"user_id": data['user_id'], "unread": unread}
+        else:
+            report = Notification.repair_all_unread()
+        
+        return jsonify(create_response(
+            success=True,
+            data=report,
+            message="Unread counters repaired successfully"
+        )), 200
+
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "REPAIR_UNREAD_COUNTS_ERROR", "message": str(e)}
+        )), 500
+
 @notifications_bp.route('/admin/cleanup', methods=['POST'])
 @admin_required
 @audit_log('cleanup_notifications', 'notification')
@@ -304,16 +408,22 @@ def cleanup_notifications():
         # Calculate cutoff date
         cutoff_date = datetime.utcnow() - timedelta(days=days_old)
         
-        # Delete old read notifications
-        result = mongo_db.db.notifications.delete_many({
+        # Delete old read notifications in bounded batches; the TTL index
+        # removes them anyway after NOTIFICATION_RETENTION_DAYS
+        deleted_count = delete_in_batches(mongo_db.db.notifications, {
             "isRead": True,
             "createdAt": {"$lt": cutoff_date}
         })
         
+        # Expired broadcasts, and read state that refers to them
+        deleted_broadcasts = Notification.cleanup_broadcasts()
+        
+        invalidate_cached('notifications.stats')
+        
         return jsonify(create_response(
             success=True,
-            data={"deleted_count": result.deleted_count},
-            message=f"Cleaned up {result.deleted_count} old notifications"
+            data={"deleted_count": deleted_count, "deleted_broadcasts": deleted_broadcasts},
+            message=f"Cleaned up {deleted_count} old notifications"
         )), 200
         
     except Exception as e:
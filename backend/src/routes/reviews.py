@@ -3,7 +3,11 @@ from bson import ObjectId
 from datetime import datetime, timedelta
 import jwt
 from functools import wraps
-from src.models.database import mongo_db
+from src.analytics.activity import record_activity
+from src.analytics.review_stats import apply_review_change
+from src.models.database import mongo_db, paginate_query
+from src.models.review import Review
+from src.search.engine import search_engine
 import os
 
 reviews_bp = Blueprint('reviews', __name__)
@@ -44,6 +48,8 @@ def get_reviews():
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 10))
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         category = request.args.get('category')
         location = request.args.get('location')
         rating = request.args.get('rating')
@@ -63,31 +69,21 @@ def get_reviews():
                 {'location.name': {'$regex': search, '$options': 'i'}}
             ]
         
-        skip = (page - 1) * limit
-        reviews = list(mongo_db.db.reviews.find(filters)
-                      .sort('createdAt', -1)
-                      .skip(skip)
-                      .limit(limit))
-        
-        total_count = mongo_db.db.reviews.count_documents(filters)
-        
-        # Convert ObjectId to string for JSON serialization
-        for review in reviews:
-            review['_id'] = str(review['_id'])
-            if 'author' in review:
-                review['author'] = str(review['author'])
+        reviews, pagination = paginate_query(
+            mongo_db.db.reviews,
+            filters,
+            page,
+            limit,
+            'createdAt',
+            -1,
+            cursor=cursor,
+            count=count_mode
+        )
         
         return jsonify({
             'success': True,
             'data': reviews,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total_count,
-                'totalPages': (total_count + limit - 1) // limit,
-                'hasNext': page * limit < total_count,
-                'hasPrev': page > 1
-            },
+            'pagination': pagination,
             'message': 'Reviews retrieved successfully'
         }), 200
         
@@ -151,9 +147,11 @@ def create_review(current_user):
         }
         
         review_id = Review.create(review_data)
+        search_engine.index_review(review_data)
+        apply_review_change(None, review_data)
         
         # Update user stats
-        User.increment_reviews_count(str(current_user['_id']))
+        record_activity(current_user['_id'], 'review', 1)
         
         return jsonify({
             'success': True,
@@ -190,6 +188,9 @@ def update_review(current_user, review_id):
         if update_data:
             update_data['updated_at'] = datetime.utcnow()
             Review.update_by_id(review_id, update_data)
+            updated_review = Review.find_by_id(review_id)
+            search_engine.index_review(updated_review)
+            apply_review_change(review, updated_review)
         
         return jsonify({'success': True, 'message': 'Review updated successfully'}), 200
         
@@ -210,9 +211,11 @@ def delete_review(current_user, review_id):
             return jsonify({'success': False, 'message': 'Unauthorized'}), 403
         
         Review.delete_by_id(review_id)
+        search_engine.remove_review(review_id)
+        apply_review_change(review, None)
         
         # Update user stats
-        User.decrement_reviews_count(str(current_user['_id']))
+        record_activity(review.get('author') or review.get('author_id'), 'review', -1)
         
         return jsonify({'success': True, 'message': 'Review deleted successfully'}), 200
         
@@ -423,10 +426,15 @@ def admin_update_review_status(current_user, review_id):
         if not review:
             return jsonify({'success': False, 'message': 'Review not found'}), 404
         
-        Review.update_by_id(review_id, {
+        moderation = {
             'status': status,
+            'moderatedBy': current_user['_id'],
+            'moderatedAt': datetime.utcnow(),
             'updated_at': datetime.utcnow()
-        })
+        }
+        Review.update_by_id(review_id, moderation)
+        search_engine.index_review({**review, **moderation})
+        apply_review_change(review, {**review, **moderation})
         
         return jsonify({'success': True, 'message': 'Review status updated'}), 200
         
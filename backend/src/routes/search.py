@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
-from bson import ObjectId
-from datetime import datetime
+import math
 
-from src.models.database import mongo_db, create_response, serialize_doc, serialize_docs
+from src.models.database import create_response, serialize_docs
+from src.search.engine import search_engine
+from src.search.suggest import suggestion_index
+from src.search.trending import query_log, trending
+from src.utils.decorators import admin_required
+from src.utils.population import populate_users
 
 search_bp = Blueprint('search', __name__)
 
@@ -20,6 +24,8 @@ def global_search():
                 error={"code": "MISSING_QUERY", "message": "Search query is required"}
             )), 400
         
+        query_log.record(query)
+        
         results = {
             "articles": [],
             "reviews": [],
@@ -29,109 +35,32 @@ def global_search():
         
         # Search articles
         if category in ['articles', 'all']:
-            article_query = {
-                "status": "published",
-                "$or": [
-                    {"title": {"$regex": query, "$options": "i"}},
-                    {"content": {"$regex": query, "$options": "i"}},
-                    {"category": {"$regex": query, "$options": "i"}},
-                    {"tags": {"$regex": query, "$options": "i"}}
-                ]
-            }
-            
-            articles = list(mongo_db.db.articles.find(
-                article_query,
-                {
-                    "title": 1,
-                    "excerpt": 1,
-                    "featuredImage": 1,
-                    "author": 1,
-                    "category": 1,
-                    "publishedAt": 1,
-                    "views": 1,
-                    "likes": 1,
-                    "slug": 1
-                }
-            ).limit(limit))
+            articles = search_engine.search_articles(query)[:limit]
             
             # Populate author information
+            populate_users(articles, 'author', 'authorInfo')
             for article in articles:
-                if article.get('author'):
-                    author = mongo_db.db.users.find_one(
-                        {"_id": ObjectId(article['author'])},
-                        {"firstName": 1, "lastName": 1, "username": 1}
-                    )
-                    if author:
-                        article['authorInfo'] = serialize_doc(author)
                 article['type'] = 'article'
             
             results['articles'] = serialize_docs(articles)
         
         # Search reviews
         if category in ['reviews', 'all']:
-            review_query = {
-                "status": "approved",
-                "$or": [
-                    {"title": {"$regex": query, "$options": "i"}},
-                    {"content": {"$regex": query, "$options": "i"}},
-                    {"location.name": {"$regex": query, "$options": "i"}}
-                ]
-            }
-            
-            reviews = list(mongo_db.db.reviews.find(
-                review_query,
-                {
-                    "title": 1,
-                    "content": 1,
-                    "rating": 1,
-                    "author": 1,
-                    "location": 1,
-                    "createdAt": 1,
-                    "helpfulVotes": 1,
-                    "images": 1
-                }
-            ).limit(limit))
+            reviews = search_engine.search_reviews(query)[:limit]
             
             # Populate author information
+            populate_users(reviews, 'author', 'authorInfo')
             for review in reviews:
-                if review.get('author'):
-                    author = mongo_db.db.users.find_one(
-                        {"_id": ObjectId(review['author'])},
-                        {"firstName": 1, "lastName": 1, "username": 1}
-                    )
-                    if author:
-                        review['authorInfo'] = serialize_doc(author)
                 review['type'] = 'review'
             
             results['reviews'] = serialize_docs(reviews)
         
         # Search locations (from reviews)
         if category in ['locations', 'all']:
-            location_pipeline = [
-                {
-                    "$match": {
-                        "status": "approved",
-                        "location.name": {"$regex": query, "$options": "i"}
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": "$location.name",
-                        "reviewCount": {"$sum": 1},
-                        "avgRating": {"$avg": "$rating"},
-                        "location": {"$first": "$location"}
-                    }
-                },
-                {"$sort": {"reviewCount": -1}},
-                {"$limit": limit}
-            ]
-            
-            locations = list(mongo_db.db.reviews.aggregate(location_pipeline))
+            locations = search_engine.search_locations(query)[:limit]
             
             for location in locations:
-                location['name'] = location['_id']
                 location['type'] = 'location'
-                del location['_id']
             
             results['locations'] = locations
         
@@ -145,20 +74,20 @@ def global_search():
             all_results.extend(results['reviews'])
             all_results.extend(results['locations'])
             
-            # Simple relevance scoring (can be improved)
+            # Text match score, boosted by popularity
             for result in all_results:
                 score = 0
                 if result['type'] == 'article':
-                    score += result.get('views', 0) * 0.1
-                    score += result.get('likes', 0) * 0.2
+                    score += (result.get('views') or 0) * 0.1
+                    score += (result.get('likes') or 0) * 0.2
                 elif result['type'] == 'review':
-                    score += result.get('helpfulVotes', 0) * 0.3
-                    score += result.get('rating', 0) * 0.2
+                    score += (result.get('helpfulVotes') or 0) * 0.3
+                    score += (result.get('rating') or 0) * 0.2
                 elif result['type'] == 'location':
                     score += result.get('reviewCount', 0) * 0.5
                     score += result.get('avgRating', 0) * 0.3
                 
-                result['relevanceScore'] = score
+                result['relevanceScore'] = result.get('score', 0) * (1 + math.log1p(score))
             
             # Sort by relevance score
             all_results.sort(key=lambda x: x.get('relevanceScore', 0), reverse=True)
@@ -192,59 +121,19 @@ def search_articles():
                 error={"code": "MISSING_QUERY", "message": "Search query is required"}
             )), 400
         
-        # Build search query
-        search_query = {
-            "status": "published",
-            "$or": [
-                {"title": {"$regex": query, "$options": "i"}},
-                {"content": {"$regex": query, "$options": "i"}},
-                {"tags": {"$regex": query, "$options": "i"}}
-            ]
-        }
-        
-        if category:
-            search_query["category"] = category
-        
-        if author:
-            search_query["author"] = ObjectId(author)
-        
-        # Determine sort order
-        sort_field = "publishedAt"
-        sort_order = -1
+        query_log.record(query)
         
-        if sort_by == 'views':
-            sort_field = "views"
-        elif sort_by == 'likes':
-            sort_field = "likes"
-        elif sort_by == 'date':
-            sort_field = "publishedAt"
+        articles = search_engine.search_articles(query, category=category, author=author)
         
-        # Execute search
-        articles = list(mongo_db.db.articles.find(
-            search_query,
-            {
-                "title": 1,
-                "excerpt": 1,
-                "featuredImage": 1,
-                "author": 1,
-                "category": 1,
-                "tags": 1,
-                "publishedAt": 1,
-                "views": 1,
-                "likes": 1,
-                "slug": 1
-            }
-        ).sort(sort_field, sort_order).limit(limit))
+        # Relevance order comes from the index; other sorts reorder the matches
+        sort_fields = {'date': 'publishedAt', 'views': 'views', 'likes': 'likes'}
+        if sort_by in sort_fields:
+            sort_field = sort_fields[sort_by]
+            articles.sort(key=lambda article: (article.get(sort_field) is not None, article.get(sort_field)), reverse=True)
+        articles = articles[:limit]
         
         # Populate author information
-        for article in articles:
-            if article.get('author'):
-                author_info = mongo_db.db.users.find_one(
-                    {"_id": ObjectId(article['author'])},
-                    {"firstName": 1, "lastName": 1, "username": 1}
-                )
-                if author_info:
-                    article['authorInfo'] = serialize_doc(author_info)
+        populate_users(articles, 'author', 'authorInfo')
         
         return jsonify(create_response(
             success=True,
@@ -266,7 +155,7 @@ def search_reviews():
         location = request.args.get('location')
         rating = request.args.get('rating')
         limit = int(request.args.get('limit', 20))
-        sort_by = request.args.get('sort', 'date')  # 'date', 'rating', 'helpful'
+        sort_by = request.args.get('sort', 'date')  # 'relevance', 'date', 'rating', 'helpful'
         
         if not query:
             return jsonify(create_response(
@@ -274,54 +163,19 @@ def search_reviews():
                 error={"code": "MISSING_QUERY", "message": "Search query is required"}
             )), 400
         
-        # Build search query
-        search_query = {
-            "status": "approved",
-            "$or": [
-                {"title": {"$regex": query, "$options": "i"}},
-                {"content": {"$regex": query, "$options": "i"}}
-            ]
-        }
-        
-        if location:
-            search_query["location.name"] = {"$regex": location, "$options": "i"}
+        query_log.record(query)
         
-        if rating:
-            search_query["rating"] = int(rating)
+        reviews = search_engine.search_reviews(query, location=location, rating=int(rating) if rating else None)
         
         # Determine sort order
-        sort_field = "createdAt"
-        sort_order = -1
-        
-        if sort_by == 'rating':
-            sort_field = "rating"
-        elif sort_by == 'helpful':
-            sort_field = "helpfulVotes"
-        
-        # Execute search
-        reviews = list(mongo_db.db.reviews.find(
-            search_query,
-            {
-                "title": 1,
-                "content": 1,
-                "rating": 1,
-                "author": 1,
-                "location": 1,
-                "createdAt": 1,
-                "helpfulVotes": 1,
-                "images": 1
-            }
-        ).sort(sort_field, sort_order).limit(limit))
+        sort_fields = {'date': 'createdAt', 'rating': 'rating', 'helpful': 'helpfulVotes'}
+        if sort_by in sort_fields:
+            sort_field = sort_fields[sort_by]
+            reviews.sort(key=lambda review: (review.get(sort_field) is not None, review.get(sort_field)), reverse=True)
+        reviews = reviews[:limit]
         
         # Populate author information
-        for review in reviews:
-            if review.get('author'):
-                author_info = mongo_db.db.users.find_one(
-                    {"_id": ObjectId(review['author'])},
-                    {"firstName": 1, "lastName": 1, "username": 1}
-                )
-                if author_info:
-                    review['authorInfo'] = serialize_doc(author_info)
+        populate_users(reviews, 'author', 'authorInfo')
         
         return jsonify(create_response(
             success=True,
@@ -349,82 +203,12 @@ def get_search_suggestions():
                 message="Query too short for suggestions"
             )), 200
         
-        suggestions = []
-        
-        # Get article title suggestions
-        article_titles = mongo_db.db.articles.find(
-            {
-                "status": "published",
-                "title": {"$regex": query, "$options": "i"}
-            },
-            {"title": 1}
-        ).limit(limit // 2)
-        
-        for article in article_titles:
-            suggestions.append({
-                "text": article['title'],
-                "type": "article",
-                "id": str(article['_id'])
-            })
-        
-        # Get location suggestions
-        location_pipeline = [
-            {
-                "$match": {
-                    "status": "approved",
-                    "location.name": {"$regex": query, "$options": "i"}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$location.name",
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"count": -1}},
-            {"$limit": limit // 2}
-        ]
-        
-        locations = mongo_db.db.reviews.aggregate(location_pipeline)
-        
-        for location in locations:
-            suggestions.append({
-                "text": location['_id'],
-                "type": "location",
-                "count": location['count']
-            })
-        
-        # Get category suggestions
-        categories = mongo_db.db.categories.find(
-            {
-                "name": {"$regex": query, "$options": "i"},
-                "isActive": True
-            },
-            {"name": 1}
-        ).limit(5)
-        
-        for category in categories:
-            suggestions.append({
-                "text": category['name'],
-                "type": "category",
-                "id": str(category['_id'])
-            })
-        
-        # Remove duplicates and limit results
-        unique_suggestions = []
-        seen_texts = set()
-        
-        for suggestion in suggestions:
-            if suggestion['text'] not in seen_texts:
-                unique_suggestions.append(suggestion)
-                seen_texts.add(suggestion['text'])
-                
-                if len(unique_suggestions) >= limit:
-                    break
+        # Ranked, deduplicated suggestions from the precomputed prefix index
+        suggestions = suggestion_index.suggest(query, limit)
         
         return jsonify(create_response(
             success=True,
-            data=unique_suggestions,
+            data=suggestions,
             message="Search suggestions retrieved successfully"
         )), 200
         
@@ -438,47 +222,8 @@ def get_search_suggestions():
 def get_trending_searches():
     """Get trending search terms"""
     try:
-        # This would typically be based on search logs
-        # For now, return popular categories and locations
-        
-        # Popular categories (based on article count)
-        popular_categories = list(mongo_db.db.articles.aggregate([
-            {
-                "$match": {"status": "published"}
-            },
-            {
-                "$group": {
-                    "_id": "$category",
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"count": -1}},
-            {"$limit": 5}
-        ]))
-        
-        # Popular locations (based on review count)
-        popular_locations = list(mongo_db.db.reviews.aggregate([
-            {
-                "$match": {
-                    "status": "approved",
-                    "location.name": {"$ne": ""}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$location.name",
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"count": -1}},
-            {"$limit": 5}
-        ]))
-        
-        trending_data = {
-            "categories": [cat['_id'] for cat in popular_categories if cat['_id']],
-            "locations": [loc['_id'] for loc in popular_locations if loc['_id']],
-            "keywords": ["marrakech", "medina", "atlas mountains", "desert", "riads"]  # Static for demo
-        }
+        # Precomputed from the search query log and popular content
+        trending_data = trending.get()
         
         return jsonify(create_response(
             success=True,
@@ -492,3 +237,19 @@ def get_trending_searches():
             error={"code": "GET_TRENDING_ERROR", "message": str(e)}
         )), 500
 
+@search_bp.route('/stats', methods=['GET'])
+@admin_required
+def get_search_stats():
+    """Get search index statistics (Admin only)"""
+    try:
+        return jsonify(create_response(
+            success=True,
+            data={**search_engine.stats(), "suggestions": suggestion_index.stats()},
+            message="Search index statistics retrieved successfully"
+        )), 200
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "GET_SEARCH_STATS_ERROR", "message": str(e)}
+        )), 500
@@ -5,7 +5,7 @@ from bson import ObjectId
 from datetime import datetime
 
 from src.models.database import mongo_db, create_response, serialize_doc, serialize_docs, paginate_query
-from src.utils.decorators import admin_required, user_required, owner_or_admin_required, get_current_user, audit_log
+from src.utils.decorators import admin_required, user_required, owner_or_admin_required, get_current_user, invalidate_user_auth, audit_log
 
 users_bp = Blueprint('users', __name__)
 
@@ -16,6 +16,8 @@ def get_all_users():
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         role = request.args.get('role')
         search = request.args.get('search')
         
@@ -38,7 +40,9 @@ def get_all_users():
             page, 
             limit, 
             'createdAt', 
-            -1
+            -1,
+            cursor=cursor,
+            count=count_mode
         )
         
         # Remove sensitive data
@@ -231,6 +235,8 @@ def update_user(id):
                 error={"code": "USER_NOT_FOUND", "message": "User not found"}
             )), 404
         
+        invalidate_user_auth(id)
+        
         # Get updated user
         updated_user = mongo_db.db.users.find_one({"_id": ObjectId(id)})
         user_data = serialize_doc(updated_user)
@@ -278,6 +284,7 @@ def delete_user(id):
         
         # Delete user
         mongo_db.db.users.delete_one({"_id": ObjectId(id)})
+        invalidate_user_auth(id)
         
         return jsonify(create_response(
             success=True,
@@ -330,6 +337,8 @@ def update_user_role(id):
                 error={"code": "USER_NOT_FOUND", "message": "User not found"}
             )), 404
         
+        invalidate_user_auth(id)
+        
         return jsonify(create_response(
             success=True,
             message=f"User role updated to {role}"
@@ -374,6 +383,8 @@ def update_user_status(id):
                 error={"code": "USER_NOT_FOUND", "message": "User not found"}
             )), 404
         
+        invalidate_user_auth(id)
+        
         status_text = "activated" if is_active else "deactivated"
         return jsonify(create_response(
             success=True,
@@ -1,30 +1,44 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from bson import ObjectId
-from datetime import datetime
-import uuid
+from datetime import datetime, timedelta
 
-from src.models.database import mongo_db, create_response, serialize_doc, paginate_query
-from src.utils.decorators import admin_required, user_required, get_current_user, audit_log
+from src.analytics.wallet_stats import TRANSACTION_TYPES, wallet_stats
+from src.models.database import mongo_db, create_response
+from src.models.notification import Notification
+from src.models.wallet import Wallet
+from src.utils.decorators import admin_required, user_required, audit_log
 
 wallet_bp = Blueprint('wallet', __name__)
 
+# Coins credited for each reward action
+REWARD_AMOUNTS = {
+    'review_approved': 10,
+    'article_published': 25,
+    'helpful_review': 5,
+    'daily_login': 2
+}
+
+# Ledger entries included in GET /wallet
+RECENT_TRANSACTIONS = 10
+
 @wallet_bp.route('', methods=['GET'])
 @user_required
 def get_wallet():
     """Get current user's wallet"""
     try:
-        current_user = get_current_user()
-        if not current_user:
+        current_user_id = get_jwt_identity()
+        balance = Wallet.get_balance(current_user_id)
+        if balance is None:
             return jsonify(create_response(
                 success=False,
                 error={"code": "USER_NOT_FOUND", "message": "User not found"}
             )), 404
         
-        wallet_data = current_user.get('wallet', {
-            "balance": 0,
-            "transactions": []
-        })
+        # Latest entries from the ledger; full history is under /transactions
+        wallet_data = {
+            "balance": balance,
+            "transactions": Wallet.recent(current_user_id, RECENT_TRANSACTIONS)
+        }
         
         return jsonify(create_response(
             success=True,
@@ -45,49 +59,24 @@ def get_wallet_transactions():
     try:
         current_user_id = get_jwt_identity()
         page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
+        limit = min(int(request.args.get('limit', 20)), 100)
+        cursor = request.args.get('cursor', request.args.get('after'))  # opt-in keyset pagination
+        count_mode = request.args.get('count', 'exact')  # 'exact', 'estimated', 'none'
         transaction_type = request.args.get('type')  # 'credit' or 'debit'
         
-        # Get user's wallet
-        user = mongo_db.db.users.find_one({"_id": ObjectId(current_user_id)})
-        if not user:
-            return jsonify(create_response(
-                success=False,
-                error={"code": "USER_NOT_FOUND", "message": "User not found"}
-            )), 404
-        
-        transactions = user.get('wallet', {}).get('transactions', [])
-        
-        # Filter by type if specified
-        if transaction_type:
-            transactions = [t for t in transactions if t.get('type') == transaction_type]
-        
-        # Sort by timestamp (newest first)
-        transactions.sort(key=lambda x: x.get('timestamp', datetime.min), reverse=True)
-        
-        # Manual pagination
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
-        paginated_transactions = transactions[start_idx:end_idx]
-        
-        # Calculate pagination info
-        total = len(transactions)
-        total_pages = (total + limit - 1) // limit
-        has_next = page < total_pages
-        has_prev = page > 1
-        
-        pagination = {
-            "page": page,
-            "limit": limit,
-            "total": total,
-            "totalPages": total_pages,
-            "hasNext": has_next,
-            "hasPrev": has_prev
-        }
+        # Served from the (user, type, status, timestamp) index; payload is one page regardless of history size
+        transactions, pagination = Wallet.history(
+            current_user_id,
+            transaction_type,
+            page,
+            limit,
+            cursor=cursor,
+            count=count_mode
+        )
         
         return jsonify(create_response(
             success=True,
-            data=paginated_transactions,
+            data=transactions,
             pagination=pagination,
             message="Transaction history retrieved successfully"
         )), 200
@@ -103,15 +92,13 @@ def get_wallet_transactions():
 def get_wallet_balance():
     """Get wallet balance"""
     try:
-        current_user = get_current_user()
-        if not current_user:
+        balance = Wallet.get_balance(get_jwt_identity())
+        if balance is None:
             return jsonify(create_response(
                 success=False,
                 error={"code": "USER_NOT_FOUND", "message": "User not found"}
             )), 404
         
-        balance = current_user.get('wallet', {}).get('balance', 0)
-        
         return jsonify(create_response(
             success=True,
             data={"balance": balance},
@@ -124,6 +111,22 @@ def get_wallet_balance():
             error={"code": "GET_BALANCE_ERROR", "message": str(e)}
         )), 500
 
+def idempotency_key(data):
+    """Client-supplied idempotency key from the Idempotency-Key header or the request body"""
+    return request.headers.get('Idempotency-Key') or data.get('idempotencyKey')
+
+def rejected_response(entry):
+    """Error response for a rejected ledger entry"""
+    if entry['reason'] == 'USER_NOT_FOUND':
+        return jsonify(create_response(
+            success=False,
+            error={"code": "USER_NOT_FOUND", "message": "User not found"}
+        )), 404
+    return jsonify(create_response(
+        success=False,
+        error={"code": "INSUFFICIENT_BALANCE", "message": "Insufficient wallet balance"}
+    )), 400
+
 @wallet_bp.route('/add-coins', methods=['POST'])
 @admin_required
 @audit_log('add_coins', 'wallet')
@@ -151,57 +154,25 @@ def add_coins():
                 error={"code": "INVALID_AMOUNT", "message": "Amount must be positive"}
             )), 400
         
-        # Find user
-        user = mongo_db.db.users.find_one({"_id": ObjectId(user_id)})
-        if not user:
-            return jsonify(create_response(
-                success=False,
-                error={"code": "USER_NOT_FOUND", "message": "User not found"}
-            )), 404
-        
-        # Create transaction
-        transaction = {
-            "type": "credit",
-            "amount": amount,
-            "description": description,
-            "timestamp": datetime.utcnow(),
-            "transactionId": str(uuid.uuid4())
-        }
-        
-        # Update user wallet
-        current_balance = user.get('wallet', {}).get('balance', 0)
-        new_balance = current_balance + amount
-        
-        mongo_db.db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {
-                "$set": {
-                    "wallet.balance": new_balance,
-                    "updatedAt": datetime.utcnow()
-                },
-                "$push": {
-                    "wallet.transactions": transaction
-                }
-            }
-        )
+        entry = Wallet.credit(user_id, amount, description, 'admin', idempotency_key(data))
+        if entry['status'] == 'rejected':
+            return rejected_response(entry)
         
-        # Create notification for user
-        notification_doc = {
-            "recipient": ObjectId(user_id),
-            "type": "wallet_transaction",
-            "title": "Coins Added",
-            "message": f"{amount} coins have been added to your wallet. {description}",
-            "data": {"transactionId": transaction["transactionId"], "amount": amount},
-            "isRead": False,
-            "createdAt": datetime.utcnow()
-        }
-        mongo_db.db.notifications.insert_one(notification_doc)
+        # Create notification for user (once, not on replays)
+        if not entry.get('replayed'):
+            Notification.create(
+                user_id,
+                "wallet_transaction",
+                "Coins Added",
+                f"{amount} coins have been added to your wallet. {description}",
+                {"transactionId": entry["transactionId"], "amount": amount}
+            )
         
         return jsonify(create_response(
             success=True,
             data={
-                "transaction": transaction,
-                "newBalance": new_balance
+                "transaction": Wallet.to_public(entry),
+                "newBalance": entry['balanceAfter']
             },
             message="Coins added successfully"
         )), 200
@@ -239,52 +210,16 @@ def spend_coins():
                 error={"code": "INVALID_AMOUNT", "message": "Amount must be positive"}
             )), 400
         
-        # Get user
-        user = mongo_db.db.users.find_one({"_id": ObjectId(current_user_id)})
-        if not user:
-            return jsonify(create_response(
-                success=False,
-                error={"code": "USER_NOT_FOUND", "message": "User not found"}
-            )), 404
-        
-        # Check balance
-        current_balance = user.get('wallet', {}).get('balance', 0)
-        if current_balance < amount:
-            return jsonify(create_response(
-                success=False,
-                error={"code": "INSUFFICIENT_BALANCE", "message": "Insufficient wallet balance"}
-            )), 400
-        
-        # Create transaction
-        transaction = {
-            "type": "debit",
-            "amount": amount,
-            "description": description,
-            "timestamp": datetime.utcnow(),
-            "transactionId": str(uuid.uuid4())
-        }
-        
-        # Update user wallet
-        new_balance = current_balance - amount
-        
-        mongo_db.db.users.update_one(
-            {"_id": ObjectId(current_user_id)},
-            {
-                "$set": {
-                    "wallet.balance": new_balance,
-                    "updatedAt": datetime.utcnow()
-                },
-                "$push": {
-                    "wallet.transactions": transaction
-                }
-            }
-        )
+        # The balance check and the debit are one conditional update
+        entry = Wallet.debit(current_user_id, amount, description, 'spend', idempotency_key(data))
+        if entry['status'] == 'rejected':
+            return rejected_response(entry)
         
         return jsonify(create_response(
             success=True,
             data={
-                "transaction": transaction,
-                "newBalance": new_balance
+                "transaction": Wallet.to_public(entry),
+                "newBalance": entry['balanceAfter']
             },
             message="Coins spent successfully"
         )), 200
@@ -305,67 +240,34 @@ def reward_coins():
         
         action = data.get('action')  # 'review_approved', 'article_published', etc.
         
-        # Define reward amounts for different actions
-        reward_amounts = {
-            'review_approved': 10,
-            'article_published': 25,
-            'helpful_review': 5,
-            'daily_login': 2
-        }
-        
-        if action not in reward_amounts:
+        if action not in REWARD_AMOUNTS:
             return jsonify(create_response(
                 success=False,
                 error={"code": "INVALID_ACTION", "message": "Invalid reward action"}
             )), 400
         
-        amount = reward_amounts[action]
+        amount = REWARD_AMOUNTS[action]
         description = f"Reward for {action.replace('_', ' ')}"
         
-        # Create transaction
-        transaction = {
-            "type": "credit",
-            "amount": amount,
-            "description": description,
-            "timestamp": datetime.utcnow(),
-            "transactionId": str(uuid.uuid4())
-        }
+        entry = Wallet.credit(current_user_id, amount, description, f"reward:{action}", idempotency_key(data))
+        if entry['status'] == 'rejected':
+            return rejected_response(entry)
         
-        # Update user wallet
-        user = mongo_db.db.users.find_one({"_id": ObjectId(current_user_id)})
-        current_balance = user.get('wallet', {}).get('balance', 0)
-        new_balance = current_balance + amount
-        
-        mongo_db.db.users.update_one(
-            {"_id": ObjectId(current_user_id)},
-            {
-                "$set": {
-                    "wallet.balance": new_balance,
-                    "updatedAt": datetime.utcnow()
-                },
-                "$push": {
-                    "wallet.transactions": transaction
-                }
-            }
-        )
-        
-        # Create notification
-        notification_doc = {
-            "recipient": ObjectId(current_user_id),
-            "type": "wallet_transaction",
-            "title": "Coins Earned",
-            "message": f"You earned {amount} coins for {action.replace('_', ' ')}!",
-            "data": {"transactionId": transaction["transactionId"], "amount": amount},
-            "isRead": False,
-            "createdAt": datetime.utcnow()
-        }
-        mongo_db.db.notifications.insert_one(notification_doc)
+        # Create notification (once, not on replays)
+        if not entry.get('replayed'):
+            Notification.create(
+                current_user_id,
+                "wallet_transaction",
+                "Coins Earned",
+                f"You earned {amount} coins for {action.replace('_', ' ')}!",
+                {"transactionId": entry["transactionId"], "amount": amount}
+            )
         
         return jsonify(create_response(
             success=True,
             data={
-                "transaction": transaction,
-                "newBalance": new_balance
+                "transaction": Wallet.to_public(entry),
+                "newBalance": entry['balanceAfter']
             },
             message=f"Earned {amount} coins for {action.replace('_', ' ')}"
         )), 200
@@ -381,45 +283,31 @@ def reward_coins():
 def get_wallet_stats():
     """Get wallet statistics (admin only)"""
     try:
-        # Aggregate wallet statistics
-        pipeline = [
-            {
-                "$group": {
-                    "_id": None,
-                    "totalUsers": {"$sum": 1},
-                    "totalBalance": {"$sum": "$wallet.balance"},
-                    "avgBalance": {"$avg": "$wallet.balance"}
-                }
-            }
-        ]
-        
-        stats = list(mongo_db.db.users.aggregate(pipeline))
-        
-        if not stats:
-            stats_data = {
-                "totalUsers": 0,
-                "totalBalance": 0,
-                "avgBalance": 0
-            }
-        else:
-            stats_data = stats[0]
-            del stats_data['_id']
-        
-        # Get transaction statistics
-        transaction_pipeline = [
-            {"$unwind": "$wallet.transactions"},
-            {
-                "$group": {
-                    "_id": "$wallet.transactions.type",
-                    "count": {"$sum": 1},
-                    "totalAmount": {"$sum": "$wallet.transactions.amount"}
-                }
-            }
-        ]
-        
-        transaction_stats = list(mongo_db.db.users.aggregate(transaction_pipeline))
-        
-        stats_data['transactionStats'] = transaction_stats
+        days = min(int(request.args.get('days', 30)), 365)
+        
+        # Counters maintained with every transaction; no scan of users or the ledger
+        totals = wallet_stats.get_totals()
+        total_users = mongo_db.db.users.estimated_document_count()
+        now = datetime.utcnow()
+        
+        stats_data = {
+            "totalUsers": total_users,
+            "totalBalance": totals['totalBalance'],
+            "avgBalance": totals['totalBalance'] / total_users if total_users else 0,
+            "holders": totals['holders'],
+            "transactionStats": [
+                {"_id": transaction_type, "count": totals[transaction_type]['count'], "totalAmount": totals[transaction_type]['amount']}
+                for transaction_type in TRANSACTION_TYPES
+                if totals[transaction_type]['count']
+            ],
+            "rewardStats": [
+                {"action": source.split(':', 1)[1], **volume}
+                for source, volume in totals['sources'].items()
+                if source.startswith('reward:')
+            ],
+            "daily": wallet_stats.get_days(now - timedelta(days=days - 1), now),
+            "reconciledAt": totals['reconciledAt']
+        }
         
         return jsonify(create_response(
             success=True,
@@ -433,3 +321,31 @@ def get_wallet_stats():
             error={"code": "GET_WALLET_STATS_ERROR", "message": str(e)}
         )), 500
 
+@wallet_bp.route('/admin/stats/reconcile', methods=['POST'])
+@admin_required
+@audit_log('reconcile_wallet_stats', 'system')
+def reconcile_wallet_stats():
+    """Compare wallet statistics with a full scan of users and the ledger (Admin only)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        days = int(data.get('days', 7))
+        fix = bool(data.get('fix', False))
+        
+        report = wallet_stats.reconcile(days, fix=fix)
+        if report is None:
+            return jsonify(create_response(
+                success=False,
+                error={"code": "RECONCILE_IN_PROGRESS", "message": "Wallet statistics are already being reconciled"}
+            )), 409
+        
+        return jsonify(create_response(
+            success=True,
+            data=report,
+            message="Wallet statistics reconciled successfully"
+        )), 200
+        
+    except Exception as e:
+        return jsonify(create_response(
+            success=False,
+            error={"code": "RECONCILE_WALLET_STATS_ERROR", "message": str(e)}
+        )), 500
@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+
+from src.models.database import mongo_db, serialize_doc
+from src.search.index import InvertedIndex
+from src.search.suggest import suggestion_index
+from src.search.text import fold
+
+# Only these documents are searchable, matching the public listings
+ARTICLE_SEARCH_STATUS = 'published'
+REVIEW_SEARCH_STATUS = 'approved'
+
+ARTICLE_FIELDS = {
+    "title": 1, "excerpt": 1, "content": 1, "featuredImage": 1, "author": 1, "category": 1,
+    "tags": 1, "publishedAt": 1, "views": 1, "likes": 1, "slug": 1, "status": 1
+}
+REVIEW_FIELDS = {
+    "title": 1, "content": 1, "rating": 1, "author": 1, "location": 1,
+    "createdAt": 1, "helpfulVotes": 1, "images": 1, "status": 1
+}
+
+def _location_name(review):
+    location = review.get('location')
+    if isinstance(location, dict):
+        return location.get('name') or ''
+    return location or ''
+
+class SearchEngine:
+    """In-memory full-text search over published articles and approved reviews
+
+    The index is built lazily from MongoDB on first use, kept current by the
+    write paths calling index_*/remove_*, and rebuilt in the background every
+    ``rebuild_interval`` seconds to pick up writes made by other workers.
+    """
+
+    def __init__(self, rebuild_interval=None):
+        self.rebuild_interval = rebuild_interval or int(os.getenv('SEARCH_INDEX_REBUILD_SECONDS', 900))
+        self.built_at = None
+        self.build_seconds = None
+        self._lock = threading.RLock()
+        self._building = False
+        self._pending = []
+        self.articles, self.reviews, self.locations, self.location_stats = self._new_indexes()
+
+    @staticmethod
+    def _new_indexes():
+        articles = InvertedIndex({"title": 3.0, "tags": 2.0, "category": 1.5, "excerpt": 1.0, "content": 1.0})
+        reviews = InvertedIndex({"title": 3.0, "location": 2.0, "content": 1.0})
+        locations = InvertedIndex({"name": 1.0})
+        return articles, reviews, locations, {}
+
+    # Building
+
+    def ensure_ready(self):
+        """Build the index on first use and schedule periodic rebuilds"""
+        if self.built_at is None:
+            with self._lock:
+                if self.built_at is None:
+                    self.rebuild()
+        elif time.time() - self.built_at > self.rebuild_interval and not self._building:
+            threading.Thread(target=self.rebuild, name='search-index-rebuild', daemon=True).start()
+
+    def rebuild(self):
+        """Rebuild every index from MongoDB and swap it in atomically"""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+            self._pending = []
+
+        started = time.time()
+        try:
+            indexes = self._new_indexes()
+            for article in mongo_db.db.articles.find({"status": ARTICLE_SEARCH_STATUS}, ARTICLE_FIELDS):
+                self._add_article(indexes, article)
+            for review in mongo_db.db.reviews.find({"status": REVIEW_SEARCH_STATUS}, REVIEW_FIELDS):
+                self._add_review(indexes, review)
+
+            with self._lock:
+                self.articles, self.reviews, self.locations, self.location_stats = indexes
+                # Replay writes that happened while the snapshot was being read
+                pending, self._pending = self._pending, []
+                self._building = False
+                for operation, doc in pending:
+                    operation(doc)
+                self.built_at = time.time()
+                self.build_seconds = round(self.built_at - started, 3)
+        finally:
+            with self._lock:
+                self._building = False
+                self._pending = []
+
+    def _defer(self, operation, doc):
+        """Remember a write made during a rebuild so it survives the swap"""
+        if self._building:
+            self._pending.append((operation, doc))
+
+    # Incremental updates
+
+    def index_article(self, article):
+        """Add, update or remove an article depending on its status"""
+        suggestion_index.mark_stale()
+        with self._lock:
+            self._defer(self.index_article, article)
+            if article.get('status') == ARTICLE_SEARCH_STATUS:
+                self._add_article((self.articles,), article)
+            else:
+                self.articles.remove(str(article['_id']))
+
+    def remove_article(self, article_id):
+        suggestion_index.mark_stale()
+        with self._lock:
+            self._defer(lambda doc: self.articles.remove(doc['_id']), {"_id": str(article_id)})
+            self.articles.remove(str(article_id))
+
+    def index_review(self, review):
+        """Add, update or remove a review depending on its status"""
+        suggestion_index.mark_stale()
+        with self._lock:
+            self._defer(self.index_review, review)
+            self._remove_review_location(str(review['_id']))
+            if review.get('status') == REVIEW_SEARCH_STATUS:
+                self._add_review((self.articles, self.reviews, self.locations, self.location_stats), review)
+            else:
+                self.reviews.remove(str(review['_id']))
+
+    def remove_review(self, review_id):
+        suggestion_index.mark_stale()
+        with self._lock:
+            self._defer(lambda doc: self.remove_review(doc['_id']), {"_id": str(review_id)})
+            self._remove_review_location(str(review_id))
+            self.reviews.remove(str(review_id))
+
+    @staticmethod
+    def _add_article(indexes, article):
+        payload = serialize_doc({key: article.get(key) for key in ARTICLE_FIELDS if key not in ('content', 'status')})
+        payload['_id'] = str(article['_id'])
+        indexes[0].add(payload['_id'], {
+            "title": article.get('title'),
+            "tags": article.get('tags'),
+            "category": article.get('category'),
+            "excerpt": article.get('excerpt'),
+            "content": article.get('content')
+        }, payload)
+
+    @staticmethod
+    def _add_review(indexes, review):
+        _, reviews, locations, location_stats = indexes
+        payload = serialize_doc({key: review.get(key) for key in REVIEW_FIELDS if key != 'status'})
+        payload['_id'] = str(review['_id'])
+        name = _location_name(review)
+        reviews.add(payload['_id'], {
+            "title": review.get('title'),
+            "location": name,
+            "content": review.get('content')
+        }, payload)
+
+        if name:
+            stats = location_stats.setdefault(name, {"reviewCount": 0, "ratingSum": 0, "location": payload.get('location')})
+            stats['reviewCount'] += 1
+            stats['ratingSum'] += payload.get('rating') or 0
+            locations.add(name, {"name": name}, name)
+
+    def _remove_review_location(self, review_id):
+        payload = self.reviews.get(review_id)
+        if not payload:
+            return
+        name = _location_name(payload)
+        stats = self.location_stats.get(name)
+        if stats:
+            stats['reviewCount'] -= 1
+            stats['ratingSum'] -= payload.get('rating') or 0
+            if stats['reviewCount'] <= 0:
+                del self.location_stats[name]
+                self.locations.remove(name)
+
+    # Queries
+
+    @staticmethod
+    def _ranked(index, scores, predicate=None):
+        results = []
+        for doc_id, score in scores.items():
+            payload = index.get(doc_id)
+            if payload is None or (predicate and not predicate(payload)):
+                continue
+            result = dict(payload)
+            result['score'] = round(score, 4)
+            results.append(result)
+        results.sort(key=lambda result: result['score'], reverse=True)
+        return results
+
+    def search_articles(self, query, category=None, author=None):
+        """Return matching published articles ranked by BM25 score"""
+        self.ensure_ready()
+
+        def predicate(article):
+            if category and article.get('category') != category:
+                return False
+            if author and article.get('author') != str(author):
+                return False
+            return True
+
+        return self._ranked(self.articles, self.articles.search(query), predicate)
+
+    def search_reviews(self, query, location=None, rating=None):
+        """Return matching approved reviews ranked by BM25 score"""
+        self.ensure_ready()
+        location_filter = fold(location) if location else None
+
+        def predicate(review):
+            if location_filter and location_filter not in fold(_location_name(review)):
+                return False
+            if rating is not None and review.get('rating') != rating:
+                return False
+            return True
+
+        return self._ranked(self.reviews, self.reviews.search(query), predicate)
+
+    def search_locations(self, query):
+        """Return reviewed locations whose name matches, with review stats"""
+        self.ensure_ready()
+        results = []
+        for name, score in self.locations.search(query).items():
+            stats = self.location_stats.get(name)
+            if not stats:
+                continue
+            results.append({
+                "name": name,
+                "location": stats['location'],
+                "reviewCount": stats['reviewCount'],
+                "avgRating": stats['ratingSum'] / stats['reviewCount'],
+                "score": round(score, 4)
+            })
+        results.sort(key=lambda result: (result['reviewCount'], result['score']), reverse=True)
+        return results
+
+    def stats(self):
+        return {
+            "articles": self.articles.stats(),
+            "reviews": self.reviews.stats(),
+            "locations": self.locations.stats(),
+            "builtAt": self.built_at,
+            "buildSeconds": self.build_seconds,
+            "rebuildInterval": self.rebuild_interval,
+            "rebuilding": self._building
+        }
+
+# Global search engine instance
+search_engine = SearchEngine()
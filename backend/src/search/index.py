@@ -0,0 +1,136 @@
+import bisect
+import math
+import threading
+from collections import defaultdict
+
+from src.search.text import tokenize
+
+class InvertedIndex:
+    """In-memory inverted index over weighted document fields with BM25 ranking"""
+
+    def __init__(self, field_weights, k1=1.2, b=0.75, max_prefix_terms=50):
+        self.field_weights = field_weights
+        self.k1 = k1
+        self.b = b
+        self.max_prefix_terms = max_prefix_terms
+        self.postings = defaultdict(dict)  # term -> {doc_id: weighted term frequency}
+        self.doc_terms = {}  # doc_id -> terms, used for removal
+        self.doc_lengths = {}
+        self.payloads = {}
+        self.total_length = 0
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, fields, payload):
+        """Index (or re-index) a document from a mapping of field name -> text"""
+        frequencies = defaultdict(float)
+        length = 0.0
+        for field, weight in self.field_weights.items():
+            terms = tokenize(fields.get(field))
+            length += weight * len(terms)
+            for term in terms:
+                frequencies[term] += weight
+
+        with self._lock:
+            self._remove(doc_id)
+            for term, frequency in frequencies.items():
+                if term not in self.postings:
+                    self._vocabulary_dirty = True
+                self.postings[term][doc_id] = frequency
+            self.doc_terms[doc_id] = tuple(frequencies)
+            self.doc_lengths[doc_id] = length
+            self.payloads[doc_id] = payload
+            self.total_length += length
+
+    def remove(self, doc_id):
+        """Drop a document from the index"""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+                    self._vocabulary_dirty = True
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+        self.payloads.pop(doc_id, None)
+
+    def get(self, doc_id):
+        return self.payloads.get(doc_id)
+
+    def _expand_prefix(self, prefix):
+        """Return indexed terms starting with prefix (bounded)"""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self.postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:start + self.max_prefix_terms]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query, prefix_last=True):
+        """Return {doc_id: score} for documents matching every query term
+
+        The last query term also matches as a prefix so results stay useful
+        while the user is still typing.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return {}
+
+        with self._lock:
+            doc_count = len(self.doc_lengths)
+            if not doc_count:
+                return {}
+            avg_length = (self.total_length / doc_count) or 1.0
+
+            scores = None
+            for position, term in enumerate(terms):
+                if prefix_last and position == len(terms) - 1:
+                    expansions = self._expand_prefix(term)
+                else:
+                    expansions = [term] if term in self.postings else []
+
+                term_scores = {}
+                for expansion in expansions:
+                    postings = self.postings[expansion]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, frequency in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                        score = idf * frequency * (self.k1 + 1) / (frequency + norm)
+                        term_scores[doc_id] = max(term_scores.get(doc_id, 0.0), score)
+
+                # Every query term has to match
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        doc_id: score + term_scores[doc_id]
+                        for doc_id, score in scores.items()
+                        if doc_id in term_scores
+                    }
+                if not scores:
+                    return {}
+
+            return scores
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self.doc_lengths),
+                "terms": len(self.postings),
+                "postings": sum(len(postings) for postings in self.postings.values())
+            }
@@ -0,0 +1,153 @@
+import heapq
+import math
+import os
+import threading
+import time
+
+from src.models.database import mongo_db
+from src.search.text import split_words
+
+# Suggestions kept per prefix; requests asking for more are capped here
+MAX_SUGGESTIONS = 20
+MAX_PREFIX_LENGTH = 20
+
+# Type weights, so a popular location outranks an obscure article title
+TYPE_WEIGHTS = {"location": 3.0, "category": 2.5, "article": 1.0}
+
+class SuggestionIndex:
+    """Precomputed prefix -> top suggestions map for autocomplete
+
+    Every word of every suggestion starts a run of prefixes, so both
+    "jardin ma" and "majo" find "Jardin Majorelle". Each prefix stores its
+    best MAX_SUGGESTIONS entries already ranked, which makes a lookup a
+    single dict access. The map is
+    rebuilt from MongoDB in the background when marked stale or every
+    ``rebuild_interval`` seconds, and swapped in atomically. A full
+    rebuild takes seconds of CPU, so writes marking the index stale
+    trigger at most one rebuild per ``min_rebuild_interval`` seconds.
+    """
+
+    def __init__(self, rebuild_interval=None, min_rebuild_interval=None):
+        self.rebuild_interval = rebuild_interval or int(os.getenv('SUGGESTIONS_REBUILD_SECONDS', 300))
+        self.min_rebuild_interval = min_rebuild_interval or int(os.getenv('SUGGESTIONS_MIN_REBUILD_SECONDS', 30))
+        self.prefixes = {}
+        self.entry_count = 0
+        self.built_at = None
+        self.build_seconds = None
+        self._stale = False
+        self._building = False
+        self._lock = threading.Lock()
+        self._first_build_lock = threading.Lock()
+
+    # Building
+
+    @staticmethod
+    def build(entries):
+        """Build the prefix map from (text, type, extra, popularity) tuples"""
+        candidates = {}
+        seen = set()
+        for text, kind, extra, popularity in entries:
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            weight = TYPE_WEIGHTS.get(kind, 1.0) * (1 + math.log1p(popularity or 0))
+            suggestion = {"text": text, "type": kind}
+            suggestion.update(extra)
+
+            words = split_words(text)
+            word_prefixes = {}
+            for position in range(len(words)):
+                # Matches from the first word rank above matches further in
+                boost = 2.0 if position == 0 else 1.0
+                phrase = ' '.join(words[position:])[:MAX_PREFIX_LENGTH * (2 if position == 0 else 1)]
+                for end in range(1, len(phrase) + 1):
+                    prefix = phrase[:end]
+                    if word_prefixes.get(prefix, 0) < boost:
+                        word_prefixes[prefix] = boost
+
+            for prefix, boost in word_prefixes.items():
+                candidates.setdefault(prefix, []).append((weight * boost, suggestion))
+
+        prefixes = {
+            prefix: tuple(s for _, s in heapq.nlargest(MAX_SUGGESTIONS, scored, key=lambda item: item[0]))
+            for prefix, scored in candidates.items()
+        }
+        return prefixes, len(seen)
+
+    @staticmethod
+    def load_entries():
+        """Read suggestion sources from MongoDB"""
+        entries = []
+        for article in mongo_db.db.articles.find({"status": "published"}, {"title": 1, "views": 1}):
+            entries.append((article.get('title'), 'article', {"id": str(article['_id'])}, article.get('views')))
+
+        locations = mongo_db.db.reviews.aggregate([
+            {"$match": {"status": "approved", "location.name": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$location.name", "count": {"$sum": 1}}}
+        ])
+        for location in locations:
+            entries.append((location['_id'], 'location', {"count": location['count']}, location['count']))
+
+        for category in mongo_db.db.categories.find({"isActive": True}, {"name": 1}):
+            entries.append((category.get('name'), 'category', {"id": str(category['_id'])}, 0))
+
+        # Sources are listed in the order duplicates should be resolved
+        entries.sort(key=lambda entry: ('article', 'location', 'category').index(entry[1]))
+        return entries
+
+    def rebuild(self):
+        """Rebuild from MongoDB; concurrent calls collapse into one run"""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+            self._stale = False
+
+        try:
+            started = time.time()
+            prefixes, entry_count = self.build(self.load_entries())
+            self.prefixes, self.entry_count = prefixes, entry_count
+            self.built_at = time.time()
+            self.build_seconds = round(self.built_at - started, 3)
+        finally:
+            with self._lock:
+                self._building = False
+
+    def mark_stale(self):
+        """Schedule a rebuild after a source changed (at most one per min_rebuild_interval)"""
+        self._stale = True
+
+    def ensure_ready(self):
+        if self.built_at is None:
+            with self._first_build_lock:
+                if self.built_at is None:
+                    self.rebuild()
+            return
+
+        age = time.time() - self.built_at
+        due = age > self.rebuild_interval or (self._stale and age >= self.min_rebuild_interval)
+        if due and not self._building:
+            threading.Thread(target=self.rebuild, name='suggestions-rebuild', daemon=True).start()
+
+    # Queries
+
+    def suggest(self, query, limit=10):
+        """Return up to ``limit`` ranked suggestions starting with query"""
+        self.ensure_ready()
+        prefix = ' '.join(split_words(query))
+        return [dict(suggestion) for suggestion in self.prefixes.get(prefix, ())[:limit]]
+
+    def stats(self):
+        return {
+            "prefixes": len(self.prefixes),
+            "entries": self.entry_count,
+            "postings": sum(len(suggestions) for suggestions in self.prefixes.values()),
+            "builtAt": self.built_at,
+            "buildSeconds": self.build_seconds,
+            "rebuildInterval": self.rebuild_interval,
+            "minRebuildInterval": self.min_rebuild_interval,
+            "stale": self._stale
+        }
+
+# Global suggestion index instance
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,57 @@
+import re
+import unicodedata
+
+# Common English/French function words plus Arabic articles as they appear
+# in transliterated place names ("Jemaa el-Fna", "Bab al-Khemis")
+STOPWORDS = frozenset("""
+a an and are as at be by for from in is it of on or the to with
+au aux ce d de des du en et l la le les un une sur pour par dans
+el al ad ar as ech
+""".split())
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_REPEATED_RE = re.compile(r"(.)\1+")
+
+# Marks used for ayn/hamza in transliterations ("Ma'mounia", "Ben Youssef")
+_TRANSLITERATION_MARKS = dict.fromkeys(map(ord, "'’‘`´ʿʾʼـ"), None)
+
+# Spelling variants of the same sounds in French/English transliterations of
+# Arabic ("Djemaa"/"Jemaa", "Marrakesh"/"Marrakech", "Koutoubia"/"Kutubia")
+_TRANSLITERATION_VARIANTS = (
+    ("dj", "j"),
+    ("sh", "ch"),
+    ("ou", "u"),
+)
+
+def fold(text):
+    """Lowercase text and strip accents, Arabic diacritics and transliteration marks"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return text.translate(_TRANSLITERATION_MARKS)
+
+def normalize_token(token):
+    """Reduce a folded token to the key stored in the index"""
+    for variant, canonical in _TRANSLITERATION_VARIANTS:
+        token = token.replace(variant, canonical)
+    # "Fnaa"/"Fna", "Kutubiyya"/"Kutubiya", "Marrakech"/"Marakech"
+    token = _REPEATED_RE.sub(r"\1", token)
+    # Light plural stemming shared by French and English ("riads", "jardins")
+    if len(token) > 3 and token[-1] in 'sx':
+        token = token[:-1]
+    return token
+
+def split_words(text):
+    """Split text into folded words, without stopword removal or normalization"""
+    return _TOKEN_RE.findall(fold(text)) if text else []
+
+def tokenize(text):
+    """Split text into normalized index terms"""
+    if not text:
+        return []
+    if not isinstance(text, str):
+        text = ' '.join(str(part) for part in text if part)
+    return [
+        normalize_token(token)
+        for token in _TOKEN_RE.findall(fold(text))
+        if token not in STOPWORDS
+    ]
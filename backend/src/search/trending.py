@@ -0,0 +1,159 @@
+import atexit
+import math
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from src.models.database import mongo_db
+from src.search.text import split_words
+
+# Shown until enough real queries have been logged
+DEFAULT_KEYWORDS = ["marrakech", "medina", "atlas mountains", "desert", "riads"]
+
+MAX_QUERY_LENGTH = 100
+
+class QueryLog:
+    """Batched log of search queries
+
+    Queries are counted in memory and flushed as one bulk upsert per batch
+    into hourly ``search_queries`` buckets ({term, hour, count}), so a
+    search request never waits on a write.
+    """
+
+    def __init__(self, flush_interval=None, max_pending=500):
+        self.flush_interval = flush_interval or int(os.getenv('SEARCH_LOG_FLUSH_SECONDS', 10))
+        self.max_pending = max_pending
+        self._counts = Counter()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, query):
+        """Count a search query; cheap enough to call on every request"""
+        term = ' '.join(split_words(query))[:MAX_QUERY_LENGTH]
+        if len(term) < 2:
+            return
+
+        with self._lock:
+            self._counts[term] += 1
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='search-query-log', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            if self._pending >= self.max_pending:
+                self._wake.set()
+
+    def flush(self):
+        """Write buffered counts to MongoDB"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._pending = 0
+        if not counts:
+            return
+
+        hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        try:
+            mongo_db.db.search_queries.bulk_write([
+                UpdateOne({"term": term, "hour": hour}, {"$inc": {"count": count}}, upsert=True)
+                for term, count in counts.items()
+            ], ordered=False)
+        except Exception as e:
+            print(f"Error flushing search query log: {e}")
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+class TrendingSnapshot:
+    """Periodically recomputed trending keywords, categories and locations
+
+    Keywords are ranked by exponentially decayed query counts: a bucket
+    ``half_life_hours`` old counts half as much as one from this hour.
+    """
+
+    def __init__(self, refresh_interval=None, half_life_hours=6, window_hours=48, limit=10):
+        self.refresh_interval = refresh_interval or int(os.getenv('TRENDING_REFRESH_SECONDS', 300))
+        self.half_life_hours = half_life_hours
+        self.window_hours = window_hours
+        self.limit = limit
+        self.data = None
+        self.computed_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._first_refresh_lock = threading.Lock()
+
+    def compute_keywords(self):
+        now = datetime.utcnow()
+        decay_per_ms = math.log(2) / (self.half_life_hours * 3600 * 1000)
+        pipeline = [
+            {"$match": {"hour": {"$gte": now - timedelta(hours=self.window_hours)}}},
+            {
+                "$group": {
+                    "_id": "$term",
+                    "score": {
+                        "$sum": {
+                            "$multiply": [
+                                "$count",
+                                {"$exp": {"$multiply": [-decay_per_ms, {"$subtract": [now, "$hour"]}]}}
+                            ]
+                        }
+                    }
+                }
+            },
+            {"$sort": {"score": -1}},
+            {"$limit": self.limit}
+        ]
+        return [keyword['_id'] for keyword in mongo_db.db.search_queries.aggregate(pipeline)]
+
+    def compute(self):
+        popular_categories = mongo_db.db.articles.aggregate([
+            {"$match": {"status": "published"}},
+            {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": 5}
+        ])
+        popular_locations = mongo_db.db.reviews.aggregate([
+            {"$match": {"status": "approved", "location.name": {"$ne": ""}}},
+            {"$group": {"_id": "$location.name", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": 5}
+        ])
+        return {
+            "categories": [cat['_id'] for cat in popular_categories if cat['_id']],
+            "locations": [loc['_id'] for loc in popular_locations if loc['_id']],
+            "keywords": self.compute_keywords() or DEFAULT_KEYWORDS
+        }
+
+    def refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            self.data = self.compute()
+            self.computed_at = time.time()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self):
+        """Return the latest snapshot, refreshing it in the background when old"""
+        if self.data is None:
+            with self._first_refresh_lock:
+                if self.data is None:
+                    self.refresh()
+        elif time.time() - self.computed_at > self.refresh_interval and not self._refreshing:
+            threading.Thread(target=self.refresh, name='trending-refresh', daemon=True).start()
+        return self.data
+
+# Global query log and trending snapshot instances
+query_log = QueryLog()
+trending = TrendingSnapshot()
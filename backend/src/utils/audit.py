@@ -0,0 +1,374 @@
+import atexit
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError
+
+from src.models.database import (
+    mongo_db, count_documents, create_audit_log_indexes, decode_cursor, encode_cursor,
+    keyset_filter, serialize_docs
+)
+
+# Entries written before partitioning; read as the oldest partition
+LEGACY_COLLECTION = 'audit_logs'
+PARTITION_PREFIX = 'audit_logs_'
+PARTITION_PATTERN = re.compile(r'^audit_logs_(\d{4})(\d{2})$')
+
+def partition_name(when):
+    return f"{PARTITION_PREFIX}{when.year:04d}{when.month:02d}"
+
+# Users merged per partition before picking the top ones for the user facet
+USER_FACET_CANDIDATES = 1000
+
+def _month_index(year, month):
+    return year * 12 + month - 1
+
+def _range_query(query, start, end):
+    query = dict(query or {})
+    if start or end:
+        query['timestamp'] = {
+            **({"$gte": start} if start else {}),
+            **({"$lte": end} if end else {})
+        }
+    return query
+
+class AuditLogPartitions:
+    """Monthly ``audit_logs_YYYYMM`` collections
+
+    Retention is enforced by dropping whole partitions older than
+    ``retention_months`` instead of deleting rows. Reads fan out over
+    the partitions a date range covers, newest first, followed by the
+    legacy ``audit_logs`` collection.
+    """
+
+    def __init__(self, retention_months=None, refresh_interval=60):
+        self.retention_months = retention_months or int(os.getenv('AUDIT_LOG_RETENTION_MONTHS', 12))
+        self.refresh_interval = refresh_interval
+        self._names = None
+        self._listed_at = 0
+        self._ensured = set()
+        self._lock = threading.Lock()
+
+    def names(self):
+        """Existing partition names, newest first, plus the legacy collection if present
+
+        The current month is always included, so entries another process
+        writes to a new partition are visible before the next listing.
+        """
+        if self._names is None or time.time() - self._listed_at > self.refresh_interval:
+            existing = mongo_db.db.list_collection_names(filter={"name": {"$regex": f"^{LEGACY_COLLECTION}"}})
+            self._names, self._listed_at = existing, time.time()
+
+        partitions = {name for name in self._names if PARTITION_PATTERN.match(name)}
+        partitions.add(partition_name(datetime.utcnow()))
+        names = sorted(partitions, reverse=True)
+        if LEGACY_COLLECTION in self._names:
+            names.append(LEGACY_COLLECTION)
+        return names
+
+    def ensure(self, name):
+        """Create a partition's indexes the first time this process writes to it"""
+        if name in self._ensured:
+            return
+        with self._lock:
+            if name in self._ensured:
+                return
+            self.names()
+            is_new = name not in self._names
+            create_audit_log_indexes(mongo_db.db[name])
+            self._ensured.add(name)
+            self._names = None
+        if is_new:
+            # A new month started; retire partitions past the retention period
+            self.drop_expired()
+
+    def collections(self, start=None, end=None):
+        """Collections that can hold entries between start and end, newest first"""
+        selected = []
+        for name in self.names():
+            match = PARTITION_PATTERN.match(name)
+            if match:
+                month = _month_index(int(match.group(1)), int(match.group(2)))
+                if start and month < _month_index(start.year, start.month):
+                    continue
+                if end and month > _month_index(end.year, end.month):
+                    continue
+            selected.append(mongo_db.db[name])
+        return selected
+
+    def expired(self, cutoff=None):
+        """Partitions whose whole month is before cutoff (default: the retention period)"""
+        if cutoff is None:
+            now = datetime.utcnow()
+            first_kept = _month_index(now.year, now.month) - self.retention_months + 1
+        else:
+            first_kept = _month_index(cutoff.year, cutoff.month)
+
+        return [
+            name for name in self.names()
+            if PARTITION_PATTERN.match(name)
+            and _month_index(*map(int, PARTITION_PATTERN.match(name).groups())) < first_kept
+        ]
+
+    def drop_expired(self, cutoff=None, dry_run=False):
+        """Drop expired partitions; returns {partition: estimated entries}"""
+        dropped = {}
+        for name in self.expired(cutoff):
+            dropped[name] = mongo_db.db[name].estimated_document_count()
+            if not dry_run:
+                mongo_db.db.drop_collection(name)
+        if dropped and not dry_run:
+            with self._lock:
+                self._names = None
+                self._ensured.difference_update(dropped)
+        return dropped
+
+    def find(self, query=None, projection=None, limit=20, skip=0, start=None, end=None, sort_order=-1):
+        """Entries sorted by (timestamp, _id) across the partitions covering start..end"""
+        query = _range_query(query, start, end)
+        collections = self.collections(start, end)
+        if sort_order == 1:
+            collections.reverse()
+
+        results = []
+        for collection in collections:
+            wanted = limit - len(results)
+            if wanted <= 0:
+                break
+            docs = list(
+                collection.find(query, projection)
+                .sort([("timestamp", sort_order), ("_id", sort_order)])
+                .skip(skip)
+                .limit(wanted)
+            )
+            if skip:
+                # Skipping past this whole partition: carry the rest of the offset over
+                skip = 0 if docs else max(skip - collection.count_documents(query), 0)
+            results.extend(docs)
+        return results
+
+    def count(self, query=None, mode='exact', start=None, end=None):
+        if mode == 'none':
+            return None
+        query = _range_query(query, start, end)
+        return sum(count_documents(collection, query, mode) for collection in self.collections(start, end))
+
+    def facets(self, query=None, start=None, end=None, limit=10):
+        """Counts per action, resource, user and day for the matching entries
+
+        One $match + $facet aggregation per partition in the range; the
+        per-partition counts are merged here. Action, resource and user
+        facets keep the ``limit`` largest values, days are all returned
+        oldest first.
+        """
+        pipeline = [
+            {"$match": _range_query(query, start, end)},
+            {
+                "$facet": {
+                    "total": [{"$count": "count"}],
+                    "action": [{"$group": {"_id": "$action", "count": {"$sum": 1}}}],
+                    "resource": [{"$group": {"_id": "$resource", "count": {"$sum": 1}}}],
+                    "user": [
+                        {"$group": {"_id": "$user", "count": {"$sum": 1}}},
+                        {"$sort": {"count": -1}},
+                        {"$limit": USER_FACET_CANDIDATES}
+                    ],
+                    "day": [{
+                        "$group": {
+                            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                            "count": {"$sum": 1}
+                        }
+                    }]
+                }
+            }
+        ]
+
+        total = 0
+        merged = {facet: Counter() for facet in ('action', 'resource', 'user', 'day')}
+        for collection in self.collections(start, end):
+            result = next(collection.aggregate(pipeline), None)
+            if not result:
+                continue
+            total += result['total'][0]['count'] if result['total'] else 0
+            for facet, counts in merged.items():
+                for entry in result[facet]:
+                    counts[entry['_id']] += entry['count']
+
+        facets = {
+            facet: [{"_id": value, "count": count} for value, count in merged[facet].most_common(limit)]
+            for facet in ('action', 'resource', 'user')
+        }
+        facets['day'] = [{"_id": day, "count": merged['day'][day]} for day in sorted(merged['day'], key=str)]
+        facets['total'] = total
+        return facets
+
+    def paginate(self, query, page=1, limit=50, cursor=None, count='exact', start=None, end=None):
+        """paginate_query over the partitions, newest first
+
+        Keyset cursors also narrow the fan-out to partitions at or before
+        the cursor's month.
+        """
+        total = self.count(query, count, start, end)
+
+        skip, page_query, seek_end = 0, dict(query), end
+        if cursor is not None:
+            if cursor:
+                value, last_id = decode_cursor(cursor, 'timestamp', -1)
+                seek = keyset_filter('timestamp', -1, value, last_id)
+                page_query = {"$and": [query, seek]} if query else seek
+                if isinstance(value, datetime) and (end is None or value < end):
+                    seek_end = value
+        else:
+            skip = (page - 1) * limit
+
+        results = self.find(page_query, limit=limit + 1, skip=skip, start=start, end=seek_end)
+        has_next = len(results) > limit
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1], 'timestamp', -1) if has_next else None
+
+        pagination = {
+            "limit": limit,
+            "total": total,
+            "countMode": count,
+            "hasNext": has_next,
+            "nextCursor": next_cursor
+        }
+        if cursor is not None:
+            pagination["hasPrev"] = bool(cursor)
+        else:
+            pagination.update({
+                "page": page,
+                "totalPages": (total + limit - 1) // limit if total is not None else None,
+                "hasPrev": page > 1
+            })
+        return serialize_docs(results), pagination
+
+class AuditWriter:
+    """Background writer for audit log entries
+
+    Entries go into a bounded in-process queue and a worker thread writes
+    them with insert_many(ordered=False) once ``batch_size`` entries are
+    waiting or ``flush_interval_ms`` after the first one arrived. When the
+    queue is full, callers wait up to ``enqueue_timeout_ms`` for room and
+    the entry is dropped (and counted) after that, so a slow database
+    never stalls requests for long. At exit the worker is stopped after
+    writing the batch it holds, then whatever is still queued is written.
+    """
+
+    def __init__(self, max_queue=None, batch_size=None, flush_interval_ms=None, enqueue_timeout_ms=None):
+        self.batch_size = batch_size or int(os.getenv('AUDIT_BATCH_SIZE', 500))
+        self.flush_interval = (flush_interval_ms or int(os.getenv('AUDIT_FLUSH_MS', 200))) / 1000
+        self.enqueue_timeout = (enqueue_timeout_ms or int(os.getenv('AUDIT_ENQUEUE_TIMEOUT_MS', 50))) / 1000
+        self._queue = queue.Queue(maxsize=max_queue or int(os.getenv('AUDIT_QUEUE_SIZE', 10000)))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def write(self, entry):
+        """Queue an entry; returns False if it was dropped because the queue stayed full"""
+        self._start()
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._insert(batch)
+                batch = []
+        if batch:
+            self._insert(batch)
+
+    def close(self, timeout=5):
+        """Stop the worker, letting it write the batch it already took, then flush the queue"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "maxQueue": self._queue.maxsize,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches
+            }
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, batch):
+        partitions = defaultdict(list)
+        for entry in batch:
+            partitions[partition_name(entry.get('timestamp') or datetime.utcnow())].append(entry)
+
+        written = 0
+        for name, entries in partitions.items():
+            try:
+                audit_partitions.ensure(name)
+                written += len(mongo_db.db[name].insert_many(entries, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                written += e.details.get('nInserted', 0)
+                print(f"Audit log write error: {len(entries) - e.details.get('nInserted', 0)} entries failed")
+            except Exception as e:
+                print(f"Audit log write error: {e}")
+
+        with self._lock:
+            self.written += written
+            self.failed += len(batch) - written
+            self.batches += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._insert(batch)
+
+# Global audit partitions and writer instances
+audit_partitions = AuditLogPartitions()
+audit_writer = AuditWriter()
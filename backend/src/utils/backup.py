@@ -0,0 +1,348 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+import bson
+from bson import ObjectId, json_util
+
+from src.models.database import mongo_db
+from src.utils.audit import audit_partitions
+
+BACKUP_COLLECTIONS = [
+    'users', 'articles', 'reviews', 'categories', 'settings', 'notifications',
+    'coupons', 'coupon_usage', 'media', 'audit_logs', 'wallet_transactions',
+    'broadcasts', 'notification_state'
+]
+
+BACKUP_DIR = os.getenv('BACKUP_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'backups'
+)
+
+MANIFEST_NAME = 'manifest.json'
+# flock()ed by the process writing a backup; the OS releases it if that process dies
+LOCK_NAME = '.lock'
+# flock()ed in BACKUP_DIR while any backup runs, so there is one at a time across processes
+RUNNING_LOCK = '.running.lock'
+DEFAULT_BATCH_SIZE = 1000
+COMPRESS_LEVEL = 6
+
+def _scan_batch(raw):
+    """Count the documents in a raw BSON batch and decode only the last one"""
+    count, offset, last = 0, 0, 0
+    while offset < len(raw):
+        last = offset
+        offset += struct.unpack_from('<i', raw, offset)[0]
+        count += 1
+    return count, bson.decode(raw[last:offset])
+
+def _try_lock(path):
+    """Take an exclusive flock on path without waiting; returns the open file, or None if another process holds it"""
+    f = open(path, 'a')
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+    except BlockingIOError:
+        f.close()
+        return None
+
+def _file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class BackupJob:
+    """One backup run, written to ``<BACKUP_DIR>/<backup id>/``
+
+    Each collection is streamed in ``_id`` order, one cursor batch at a
+    time, into ``<collection>.bson.gz``: concatenated BSON documents
+    where every batch is its own gzip member. After each batch the file
+    is synced and the manifest records the file offset and last ``_id``,
+    so an interrupted backup resumes from its last checkpoint instead of
+    starting over. Finished files get a SHA-256 checksum.
+    """
+
+    def __init__(self, backup_id, path, manifest):
+        self.backup_id = backup_id
+        self.path = path
+        self.manifest = manifest
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, collections=None, batch_size=DEFAULT_BATCH_SIZE):
+        backup_id = str(ObjectId())
+        path = os.path.join(BACKUP_DIR, backup_id)
+        names = []
+        for name in (collections or BACKUP_COLLECTIONS):
+            # Audit logs live in monthly partitions next to the legacy collection
+            names.extend(audit_partitions.names()[::-1] if name == 'audit_logs' else [name])
+
+        os.makedirs(path, exist_ok=True)
+        manifest = {
+            "backupId": backup_id,
+            "format": "bson.gz",
+            "status": "pending",
+            "createdAt": datetime.utcnow().isoformat(),
+            "batchSize": batch_size,
+            "collections": {
+                name: {
+                    "file": f"{name}.bson.gz",
+                    "status": "pending",
+                    "documents": 0,
+                    "bytes": 0,
+                    "compressedBytes": 0,
+                    "lastId": None
+                }
+                for name in names
+            }
+        }
+        job = cls(backup_id, path, manifest)
+        job.save_manifest()
+        return job
+
+    @classmethod
+    def load(cls, backup_id):
+        path = os.path.join(BACKUP_DIR, os.path.basename(backup_id))
+        try:
+            with open(os.path.join(path, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(manifest['backupId'], path, manifest)
+
+    def save_manifest(self):
+        target = os.path.join(self.path, MANIFEST_NAME)
+        with self._lock:
+            data = json.dumps(self.manifest, indent=2)
+        with open(target + '.tmp', 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(target + '.tmp', target)
+
+    def progress(self, live=True):
+        """Manifest plus overall progress and throughput
+
+        ``live`` is False for a backup loaded from disk whose run is not
+        executing in this process.
+        """
+        with self._lock:
+            manifest = json.loads(json.dumps(self.manifest))
+
+        collections = manifest['collections'].values()
+        documents = sum(entry['documents'] for entry in collections)
+        expected = sum(entry.get('expectedDocuments') or 0 for entry in collections)
+        raw_bytes = sum(entry['bytes'] for entry in collections)
+        run_elapsed = manifest.get('runElapsedSeconds') or 0
+        if live and manifest.get('runStartedAt'):
+            run_elapsed = time.time() - manifest['runStartedAt']
+        elapsed = (manifest.get('elapsedSeconds') or 0) + (run_elapsed if manifest['status'] == 'running' else 0)
+        # Throughput of the current (or last) run only, so resumed work is not counted twice
+        run_documents = documents - manifest.get('runStartDocuments', 0)
+        run_bytes = raw_bytes - manifest.get('runStartBytes', 0)
+
+        manifest.pop('runStartedAt', None)
+        manifest['progress'] = {
+            "documents": documents,
+            "expectedDocuments": expected,
+            "percent": round(min(documents / expected, 1) * 100, 1) if expected else None,
+            "bytes": raw_bytes,
+            "compressedBytes": sum(entry['compressedBytes'] for entry in collections),
+            "elapsedSeconds": round(elapsed, 2),
+            "documentsPerSecond": round(run_documents / run_elapsed, 1) if run_elapsed else 0,
+            "bytesPerSecond": round(run_bytes / run_elapsed) if run_elapsed else 0
+        }
+        return manifest
+
+    def _update(self, name=None, **fields):
+        with self._lock:
+            target = self.manifest['collections'][name] if name else self.manifest
+            target.update(fields)
+
+    def run(self):
+        started = time.time()
+        with self._lock:
+            collections = self.manifest['collections'].values()
+            self.manifest.update({
+                "status": "running",
+                "error": None,
+                "runStartedAt": started,
+                "runStartDocuments": sum(entry['documents'] for entry in collections),
+                "runStartBytes": sum(entry['bytes'] for entry in collections),
+                "runElapsedSeconds": None
+            })
+        self.save_manifest()
+
+        try:
+            for name, entry in list(self.manifest['collections'].items()):
+                if entry['status'] != 'completed':
+                    self._backup_collection(name, entry)
+            status, error = 'completed', None
+        except Exception as e:
+            status, error = 'failed', str(e)
+
+        run_elapsed = time.time() - started
+        with self._lock:
+            self.manifest.update({
+                "status": status,
+                "error": error,
+                "elapsedSeconds": (self.manifest.get('elapsedSeconds') or 0) + run_elapsed,
+                "runElapsedSeconds": run_elapsed,
+                "runStartedAt": None
+            })
+            if status == 'completed':
+                self.manifest['completedAt'] = datetime.utcnow().isoformat()
+        self.save_manifest()
+
+    def _backup_collection(self, name, entry):
+        collection = mongo_db.db[name]
+        file_path = os.path.join(self.path, entry['file'])
+        query = {}
+        if entry['lastId']:
+            query = {"_id": {"$gt": json_util.loads(entry['lastId'])}}
+        self._update(name, status='running', expectedDocuments=entry['documents'] + collection.count_documents(query))
+
+        mode = 'r+b' if os.path.exists(file_path) else 'wb'
+        with open(file_path, mode) as f:
+            # Drop anything written after the last checkpoint
+            f.truncate(entry['compressedBytes'])
+            f.seek(entry['compressedBytes'])
+
+            cursor = collection.find_raw_batches(query, sort=[("_id", 1)], batch_size=self.manifest['batchSize'])
+            for raw in cursor:
+                if not raw:
+                    continue
+                count, last = _scan_batch(raw)
+                f.write(gzip.compress(raw, COMPRESS_LEVEL))
+                f.flush()
+                os.fsync(f.fileno())
+
+                self._update(
+                    name,
+                    documents=entry['documents'] + count,
+                    bytes=entry['bytes'] + len(raw),
+                    compressedBytes=f.tell(),
+                    lastId=json_util.dumps(last['_id'])
+                )
+                self.save_manifest()
+
+        self._update(name, status='completed', sha256=_file_sha256(file_path))
+        self.save_manifest()
+
+    def verify(self):
+        """Recompute the checksum of every completed file"""
+        results = {}
+        for name, entry in self.manifest['collections'].items():
+            file_path = os.path.join(self.path, entry['file'])
+            if entry['status'] != 'completed' or not os.path.exists(file_path):
+                results[name] = None
+                continue
+            results[name] = _file_sha256(file_path) == entry.get('sha256')
+        return results
+
+class BackupManager:
+    """Runs backups on a background thread, one at a time
+
+    One at a time holds across processes (e.g. gunicorn workers): the
+    writer keeps flock()s on ``BACKUP_DIR/.running.lock`` and on the
+    backup's own ``.lock`` until it finishes. A backup whose manifest
+    says running but whose lock is free was left by a process that died.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = None
+        self._thread = None
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, resume_id=None, collections=None, batch_size=DEFAULT_BATCH_SIZE):
+        """Start a new backup or resume an unfinished one
+
+        Returns the job, or raises ValueError for an unknown or finished
+        backup and RuntimeError if a backup is already running here or in
+        another process.
+        """
+        with self._lock:
+            if self.running():
+                raise RuntimeError(f"Backup {self._current.backup_id} is already running")
+
+            os.makedirs(BACKUP_DIR, exist_ok=True)
+            running_lock = _try_lock(os.path.join(BACKUP_DIR, RUNNING_LOCK))
+            if running_lock is None:
+                raise RuntimeError("A backup is already running in another process")
+
+            locks = [running_lock]
+            try:
+                if resume_id:
+                    job = BackupJob.load(resume_id)
+                    if job is None:
+                        raise ValueError(f"Unknown backup: {resume_id}")
+                    if job.manifest['status'] == 'completed':
+                        raise ValueError(f"Backup {resume_id} is already complete")
+                else:
+                    unknown = set(collections or []) - set(BACKUP_COLLECTIONS)
+                    if unknown:
+                        raise ValueError(f"Unknown collections: {', '.join(sorted(unknown))}")
+                    job = BackupJob.create(collections, batch_size)
+
+                job_lock = _try_lock(os.path.join(job.path, LOCK_NAME))
+                if job_lock is None:
+                    raise RuntimeError(f"Backup {job.backup_id} is being written by another process")
+                locks.append(job_lock)
+            except Exception:
+                for lock in locks:
+                    lock.close()
+                raise
+
+            self._current = job
+            self._thread = threading.Thread(target=self._run, args=(job, locks), name=f"backup-{job.backup_id}", daemon=True)
+            self._thread.start()
+            return job
+
+    @staticmethod
+    def _run(job, locks):
+        try:
+            job.run()
+        finally:
+            for lock in locks:
+                lock.close()
+
+    def get(self, backup_id):
+        """Return a backup's progress, or None if it does not exist"""
+        current = self._current
+        if current is not None and current.backup_id == backup_id and self.running():
+            return current.progress()
+
+        job = BackupJob.load(backup_id)
+        if job is None:
+            return None
+        progress = job.progress(live=False)
+        if progress['status'] in ('pending', 'running'):
+            lock = _try_lock(os.path.join(job.path, LOCK_NAME))
+            if lock is not None:
+                # Nobody holds the lock: left unfinished by a process that died; resumable
+                lock.close()
+                progress['status'] = 'interrupted'
+        return progress
+
+    def list(self):
+        if not os.path.isdir(BACKUP_DIR):
+            return []
+        backups = [self.get(name) for name in sorted(os.listdir(BACKUP_DIR), reverse=True)]
+        return [backup for backup in backups if backup is not None]
+
+    def verify(self, backup_id):
+        job = BackupJob.load(backup_id)
+        return job.verify() if job else None
+
+# Global backup manager instance
+backup_manager = BackupManager()
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after a TTL"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the least recently used entry if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / total, 4) if total else 0
+            }
+
+class _Flight:
+    """A computation in progress that concurrent callers wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class ResultCache(TTLCache):
+    """TTLCache for computed results, with single-flight coalescing
+
+    Keys are tuples whose first item is a namespace, so all results of an
+    endpoint can be invalidated together. While a key is being computed,
+    identical requests wait for that computation instead of starting
+    their own.
+    """
+
+    def __init__(self, maxsize=512, ttl=60):
+        super().__init__(maxsize, ttl)
+        self.coalesced = 0
+        self._inflight = {}
+        self._generations = {}
+
+    def get_or_compute(self, key, compute, ttl=None, cacheable=None):
+        """Return the cached value for key, computing it at most once concurrently"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                generation = self._generations.get(key[0], 0)
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = compute()
+            flight.value = value
+            if cacheable is None or cacheable(value):
+                with self._lock:
+                    # Skip results computed from data invalidated meanwhile
+                    stale = self._generations.get(key[0], 0) != generation
+                if not stale:
+                    self.set(key, value, ttl)
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def invalidate_namespace(self, *namespaces):
+        """Drop every entry in the given namespaces"""
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for key in [key for key in self._data if key[0] in namespaces]:
+                del self._data[key]
+
+    def stats(self):
+        stats = super().stats()
+        stats["coalesced"] = self.coalesced
+        stats["inflight"] = len(self._inflight)
+        return stats
+
+# Shared cache for expensive endpoint results
+result_cache = ResultCache(
+    maxsize=int(os.getenv('RESULT_CACHE_SIZE', 512)),
+    ttl=int(os.getenv('RESULT_CACHE_TTL', 60))
+)
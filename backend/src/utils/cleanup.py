@@ -0,0 +1,116 @@
+import os
+import time
+
+from src.models.database import mongo_db
+
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'uploads')
+
+# Fields holding file paths/URLs: collection -> fields (scalars or arrays)
+REFERENCE_FIELDS = {
+    'articles': ('featuredImage', 'gallery'),
+    'users': ('avatar',),
+    'reviews': ('images',)
+}
+
+DEFAULT_BATCH_SIZE = 500
+# Orphans listed in the report
+SAMPLE_SIZE = 50
+
+def _reference_values(value):
+    if isinstance(value, str):
+        if value:
+            yield value
+    elif isinstance(value, dict):
+        yield from _reference_values(value.get('url'))
+    elif isinstance(value, list):
+        for item in value:
+            yield from _reference_values(item)
+
+def collect_referenced_paths():
+    """Every file path/URL referenced by articles, users and reviews, in one pass per collection"""
+    referenced = set()
+    for collection_name, fields in REFERENCE_FIELDS.items():
+        query = {"$or": [{field: {"$nin": [None, "", []]}} for field in fields]}
+        projection = {field: 1 for field in fields}
+        for doc in mongo_db.db[collection_name].find(query, projection).batch_size(1000):
+            for field in fields:
+                referenced.update(_reference_values(doc.get(field)))
+    return referenced
+
+def find_orphans(referenced, cutoff=None):
+    """Upload and media records that nothing references
+
+    Only files created before ``cutoff`` are considered, so a file uploaded
+    just before the document that uses it is saved is not removed.
+    Returns (uploads, media, scanned) with (_id, file path, size, name) tuples.
+    """
+    uploads, media, scanned = [], [], 0
+
+    query = {"uploadedAt": {"$lt": cutoff}} if cutoff else {}
+    for upload in mongo_db.db.uploads.find(query, {"filename": 1, "path": 1, "size": 1}).batch_size(1000):
+        scanned += 1
+        if upload.get('path') not in referenced:
+            uploads.append((
+                upload['_id'],
+                os.path.join(UPLOADS_DIR, os.path.basename(upload['filename'])),
+                upload.get('size') or 0,
+                upload['filename']
+            ))
+
+    query = {"createdAt": {"$lt": cutoff}} if cutoff else {}
+    for item in mongo_db.db.media.find(query, {"filename": 1, "path": 1, "url": 1, "size": 1}).batch_size(1000):
+        scanned += 1
+        if item.get('url') not in referenced and item.get('path') not in referenced:
+            media.append((item['_id'], item.get('path'), item.get('size') or 0, item['filename']))
+
+    return uploads, media, scanned
+
+def _delete_orphans(collection, orphans, batch_size, counts):
+    """Delete records with one delete_many per batch, then unlink that batch's files"""
+    for start in range(0, len(orphans), batch_size):
+        batch = orphans[start:start + batch_size]
+        counts["deleted"] += collection.delete_many({"_id": {"$in": [orphan[0] for orphan in batch]}}).deleted_count
+
+        for _, file_path, _, _ in batch:
+            try:
+                os.remove(file_path)
+                counts["removed"] += 1
+            except (FileNotFoundError, TypeError):
+                counts["missing"] += 1
+            except OSError as e:
+                print(f"Error deleting file {file_path}: {e}")
+                counts["errors"] += 1
+
+def cleanup_orphaned_uploads(cutoff=None, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Remove upload and media files no article, user or review references
+
+    Builds the referenced set once, diffs the ``uploads`` and ``media``
+    records against it and deletes orphans with one delete_many per
+    batch before unlinking their files. With ``dry_run`` nothing is
+    deleted and the report lists what would be.
+    """
+    started = time.time()
+    referenced = collect_referenced_paths()
+    uploads, media, scanned = find_orphans(referenced, cutoff)
+    orphans = uploads + media
+
+    report = {
+        "dryRun": dry_run,
+        "scanned": scanned,
+        "referenced": len(referenced),
+        "orphaned": {"uploads": len(uploads), "media": len(media), "total": len(orphans)},
+        "bytes": sum(orphan[2] for orphan in orphans),
+        "sample": [orphan[3] for orphan in orphans[:SAMPLE_SIZE]]
+    }
+
+    if not dry_run:
+        counts = {"deleted": 0, "removed": 0, "missing": 0, "errors": 0}
+        _delete_orphans(mongo_db.db.uploads, uploads, batch_size, counts)
+        _delete_orphans(mongo_db.db.media, media, batch_size, counts)
+        report["deleted"] = counts.pop("deleted")
+        report["files"] = counts
+
+    elapsed = time.time() - started
+    report["elapsedSeconds"] = round(elapsed, 3)
+    report["filesPerSecond"] = round(scanned / elapsed, 1) if elapsed else 0
+    return report
@@ -1,9 +1,49 @@
 from functools import wraps
-from flask import jsonify
+from flask import jsonify, current_app, request
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from bson import ObjectId
+from datetime import datetime
+import os
 
 from src.models.database import mongo_db, create_response
+from src.utils.audit import audit_writer
+from src.utils.cache import TTLCache, result_cache
+from src.utils.population import to_object_id
+
+# Role/active status of recently authenticated users, keyed by user id.
+# Entries are invalidated explicitly whenever an admin changes them.
+_user_auth_cache = TTLCache(
+    maxsize=int(os.getenv('USER_AUTH_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('USER_AUTH_CACHE_TTL', 30))
+)
+
+def get_user_auth(user_id):
+    """Get the role and active status of a user, served from a short-lived cache
+    
+    Returns a dict with ``role`` and ``isActive``, or None if the user does
+    not exist or is inactive.
+    """
+    user_id = str(user_id)
+    auth = _user_auth_cache.get(user_id)
+    
+    if auth is None:
+        user = mongo_db.db.users.find_one(
+            {"_id": ObjectId(user_id)},
+            {"role": 1, "isActive": 1}
+        )
+        auth = {"role": user.get('role'), "isActive": user.get('isActive', False)} if user else {}
+        _user_auth_cache.set(user_id, auth)
+    
+    return auth if auth.get('isActive') else None
+
+def invalidate_user_auth(*user_ids):
+    """Drop cached role/status entries after a user's role or status changes"""
+    for user_id in user_ids:
+        _user_auth_cache.invalidate(str(user_id))
+
+def user_auth_cache_stats():
+    """Hit/miss counters of the user role/status cache"""
+    return _user_auth_cache.stats()
 
 def role_required(*allowed_roles):
     """Decorator to require specific roles for access"""
@@ -27,10 +67,7 @@ def role_required(*allowed_roles):
                     )), 403
                 
                 # Verify user still exists and is active
-                user = mongo_db.db.users.find_one({
-                    "_id": ObjectId(current_user_id),
-                    "isActive": True
-                })
+                user = get_user_auth(current_user_id)
                 
                 if not user:
                     return jsonify(create_response(
@@ -162,7 +199,11 @@ def get_current_user():
         return None
 
 def log_user_action(action, resource=None, resource_id=None, details=None):
-    """Log user action for audit trail"""
+    """Log user action for audit trail
+
+    The entry is queued for the background audit writer rather than
+    written on the request thread.
+    """
     try:
         current_user_id = get_jwt_identity()
         if not current_user_id:
@@ -174,14 +215,14 @@ def log_user_action(action, resource=None, resource_id=None, details=None):
             "user": ObjectId(current_user_id),
             "action": action,
             "resource": resource,
-            "resourceId": ObjectId(resource_id) if resource_id else None,
+            "resourceId": (to_object_id(resource_id) or resource_id) if resource_id else None,
             "details": details or {},
             "ipAddress": request.remote_addr,
             "userAgent": request.headers.get('User-Agent', ''),
             "timestamp": datetime.utcnow()
         }
         
-        mongo_db.db.audit_logs.insert_one(log_entry)
+        audit_writer.write(log_entry)
         
     except Exception as e:
         # Don't fail the main operation if logging fails
@@ -209,3 +250,40 @@ def audit_log(action, resource=None):
         return decorated_function
     return decorator
 
+def cached_endpoint(namespace, ttl=None):
+    """Decorator to cache successful responses of an expensive GET endpoint
+
+    Responses are keyed by namespace, view arguments and query string, so
+    different filters get their own entry. Concurrent identical requests
+    share one computation. Apply it below the auth decorators so access
+    is still checked on every request; drop entries with
+    invalidate_cached(namespace) when the underlying data changes.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = (namespace, tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))))
+            
+            def compute():
+                response = current_app.make_response(f(*args, **kwargs))
+                return response.get_data(), response.status_code, response.mimetype
+            
+            body, status, mimetype = result_cache.get_or_compute(
+                key, compute, ttl, cacheable=lambda result: result[1] == 200
+            )
+            return current_app.response_class(body, status=status, mimetype=mimetype)
+        
+        return decorated_function
+    return decorator
+
+def invalidate_cached(*namespaces):
+    """Drop cached endpoint results for the given namespaces"""
+    result_cache.invalidate_namespace(*namespaces)
+
+def audit_writer_stats():
+    """Expose audit queue depth and written/dropped counters for monitoring"""
+    return audit_writer.stats()
+
+def result_cache_stats():
+    """Expose result cache hit/miss/coalescing counters for monitoring"""
+    return result_cache.stats()
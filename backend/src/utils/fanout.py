@@ -0,0 +1,244 @@
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from src.models.database import mongo_db, serialize_doc
+from src.models.notification import Notification
+from src.utils.decorators import invalidate_cached
+
+FANOUT_AUDIENCES = ('user', 'role', 'all')
+JOB_STATUSES = ('scheduled', 'running', 'completed', 'failed', 'cancelled')
+
+def audience_query(audience):
+    """Users query for an audience ({"type": "user"|"role"|"all", "value": ...})"""
+    if audience['type'] == 'user':
+        return {"_id": ObjectId(audience['value'])}
+    if audience['type'] == 'role':
+        return {"role": audience['value']}
+    return {}
+
+class NotificationFanout:
+    """Delivers a notification to an audience from a background worker
+
+    Jobs live in ``notification_jobs``. A worker thread claims due jobs
+    (``scheduledAt`` reached) with an atomic update, streams the audience
+    from a users cursor in ``_id`` order and writes ``chunk_size``
+    notifications per insert_many(ordered=False). After every chunk the
+    job records the last recipient, so nothing is held in memory beyond
+    one chunk.
+
+    A job whose worker stops heartbeating for ``stale_after`` seconds is
+    picked up again from its checkpoint. Notifications carry their job
+    id and (job, recipient) is unique, so a chunk written just before a
+    crash is not delivered twice on resume.
+    """
+
+    def __init__(self, chunk_size=None, poll_interval=None, stale_after=None):
+        self.chunk_size = chunk_size or int(os.getenv('NOTIFICATION_FANOUT_CHUNK', 1000))
+        self.poll_interval = poll_interval or int(os.getenv('NOTIFICATION_FANOUT_POLL_SECONDS', 5))
+        self.stale_after = stale_after or int(os.getenv('NOTIFICATION_FANOUT_STALE_SECONDS', 120))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def collection(self):
+        return mongo_db.db.notification_jobs
+
+    def submit(self, notification, audience, scheduled_at=None):
+        """Queue a fan-out job; it runs at scheduled_at (default: now)"""
+        if audience.get('type') not in FANOUT_AUDIENCES:
+            raise ValueError(f"Unknown audience: {audience.get('type')}")
+
+        now = datetime.utcnow()
+        job = {
+            "status": "scheduled",
+            "notification": notification,
+            "audience": audience,
+            "scheduledAt": scheduled_at or now,
+            "createdAt": now,
+            "sent": 0,
+            "chunks": 0,
+            "lastRecipient": None
+        }
+        job['_id'] = self.collection.insert_one(job).inserted_id
+
+        self.start()
+        self._wake.set()
+        return job
+
+    def start(self):
+        """Start the worker thread (once per process)"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='notification-fanout', daemon=True)
+                self._thread.start()
+
+    def get(self, job_id):
+        job = self.collection.find_one({"_id": ObjectId(job_id)})
+        return self.progress(job) if job else None
+
+    def list(self, status=None, limit=50):
+        query = {"status": status} if status else {}
+        return [self.progress(job) for job in self.collection.find(query).sort("createdAt", -1).limit(limit)]
+
+    def cancel(self, job_id):
+        """Stop a scheduled or running job after its current chunk; returns the job or None"""
+        job = self.collection.find_one_and_update(
+            {"_id": ObjectId(job_id), "status": {"$in": ['scheduled', 'running']}},
+            {"$set": {"status": "cancelled", "finishedAt": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        return self.progress(job) if job else None
+
+    def resume(self, job_id):
+        """Requeue a failed or cancelled job from its checkpoint; returns the job or None"""
+        job = self.collection.find_one_and_update(
+            {"_id": ObjectId(job_id), "status": {"$in": ['failed', 'cancelled']}},
+            {"$set": {"status": "scheduled", "scheduledAt": datetime.utcnow(), "error": None, "finishedAt": None}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            self.start()
+            self._wake.set()
+        return self.progress(job) if job else None
+
+    @staticmethod
+    def progress(job):
+        """Job document plus delivery progress and throughput"""
+        expected = job.get('expected')
+        elapsed = None
+        if job.get('startedAt'):
+            elapsed = ((job.get('finishedAt') or datetime.utcnow()) - job['startedAt']).total_seconds()
+
+        job = serialize_doc(job)
+        job['progress'] = {
+            "sent": job['sent'],
+            "expected": expected,
+            "percent": round(min(job['sent'] / expected, 1) * 100, 1) if expected else None,
+            "elapsedSeconds": round(elapsed, 2) if elapsed is not None else None,
+            "perSecond": round(job['sent'] / elapsed, 1) if elapsed else 0
+        }
+        return job
+
+    # Worker
+
+    def _claim(self):
+        """Atomically take the next due job, or a running one whose worker went quiet"""
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "scheduled", "scheduledAt": {"$lte": now}},
+                    {"status": "running", "heartbeatAt": {"$lt": now - timedelta(seconds=self.stale_after)}}
+                ]
+            },
+            {"$set": {"status": "running", "worker": self.worker_id, "heartbeatAt": now}},
+            sort=[("scheduledAt", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _checkpoint(self, job, fields, inc=None):
+        """Record progress; False once the job was cancelled or taken over by another worker"""
+        update = {"$set": {**fields, "heartbeatAt": datetime.utcnow()}}
+        if inc:
+            update["$inc"] = inc
+        result = self.collection.update_one(
+            {"_id": job['_id'], "status": "running", "worker": self.worker_id},
+            update
+        )
+        return result.modified_count == 1
+
+    def _insert_chunk(self, documents):
+        """Write a chunk; returns how many recipients it delivered to"""
+        try:
+            return Notification.insert_many(documents)
+        except BulkWriteError as e:
+            # Duplicates come from the chunk an interrupted attempt wrote but never
+            # checkpointed, so they are delivered but not yet counted
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+            return len(documents)
+
+    def deliver(self, job):
+        """Stream the audience and write the notifications; returns False if the job was stopped"""
+        query = audience_query(job['audience'])
+        if not job.get('startedAt'):
+            expected = (
+                mongo_db.db.users.estimated_document_count() if not query
+                else mongo_db.db.users.count_documents(query)
+            )
+            if not self._checkpoint(job, {"startedAt": datetime.utcnow(), "expected": expected}):
+                return False
+        if job.get('lastRecipient'):
+            # Resume after the last checkpointed recipient
+            resume = {"_id": {"$gt": job['lastRecipient']}}
+            query = {"$and": [query, resume]} if query else resume
+
+        notification = job['notification']
+        cursor = mongo_db.db.users.find(query, {"_id": 1}).sort("_id", 1).batch_size(self.chunk_size)
+
+        chunk = []
+        for user in cursor:
+            chunk.append(user['_id'])
+            if len(chunk) >= self.chunk_size:
+                if not self._write_chunk(job, notification, chunk):
+                    return False
+                chunk = []
+        if chunk and not self._write_chunk(job, notification, chunk):
+            return False
+        return True
+
+    def _write_chunk(self, job, notification, recipients):
+        now = datetime.utcnow()
+        inserted = self._insert_chunk([
+            {
+                "recipient": recipient,
+                "type": notification['type'],
+                "title": notification['title'],
+                "message": notification['message'],
+                "data": notification.get('data', {}),
+                "isRead": False,
+                "createdAt": now,
+                "job": job['_id']
+            }
+            for recipient in recipients
+        ])
+        return self._checkpoint(job, {"lastRecipient": recipients[-1]}, {"sent": inserted, "chunks": 1})
+
+    def _run(self):
+        while True:
+            # Nothing in one iteration may end the thread: log and poll again
+            try:
+                self._run_once()
+            except Exception as e:
+                print(f"Notification fan-out error: {e}")
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _run_once(self):
+        """Claim and deliver one due job, or wait for the next poll if there is none"""
+        job = self._claim()
+        if job is None:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            return
+
+        try:
+            if self.deliver(job):
+                self._checkpoint(job, {"status": "completed", "finishedAt": datetime.utcnow()})
+        except Exception as e:
+            self._checkpoint(job, {"status": "failed", "error": str(e), "finishedAt": datetime.utcnow()})
+        finally:
+            invalidate_cached('notifications.stats')
+
+# Global notification fan-out instance
+notification_fanout = NotificationFanout()
@@ -0,0 +1,58 @@
+from flask import g, has_app_context
+from bson import ObjectId
+
+from src.models.database import mongo_db, serialize_doc
+
+# Fields fetched for every populated user; callers pick the subset they expose
+USER_SUMMARY_FIELDS = ("firstName", "lastName", "username", "avatar", "role")
+
+def _identity_map():
+    """Per-request map of user id -> user summary (None if not found)"""
+    if not has_app_context():
+        return {}
+    if not hasattr(g, '_user_identity_map'):
+        g._user_identity_map = {}
+    return g._user_identity_map
+
+def to_object_id(value):
+    """Coerce an ObjectId or its string form, returning None for anything else"""
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return None
+
+def load_users(user_ids):
+    """Load user summaries for the given ids with at most one $in query
+
+    Users already loaded during the current request are served from the
+    request's identity map and never fetched twice.
+    """
+    identity_map = _identity_map()
+    ids = {oid for oid in map(to_object_id, user_ids) if oid is not None}
+
+    missing = [oid for oid in ids if oid not in identity_map]
+    if missing:
+        projection = {field: 1 for field in USER_SUMMARY_FIELDS}
+        found = {
+            user['_id']: user
+            for user in mongo_db.db.users.find({"_id": {"$in": missing}}, projection)
+        }
+        for oid in missing:
+            identity_map[oid] = found.get(oid)
+
+    return {oid: identity_map[oid] for oid in ids}
+
+def populate_users(docs, field='author', target='authorInfo', fields=("firstName", "lastName", "username")):
+    """Attach a user summary under ``target`` to every doc referencing a user in ``field``"""
+    users = load_users(doc.get(field) for doc in docs)
+
+    for doc in docs:
+        oid = to_object_id(doc.get(field))
+        user = users.get(oid) if oid is not None else None
+        if user:
+            info = {"_id": user['_id']}
+            info.update((name, user[name]) for name in fields if name in user)
+            doc[target] = serialize_doc(info)
+
+    return docs
@@ -0,0 +1,48 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from src.models.wallet import Wallet
+
+class PendingSettlement:
+    """Settles wallet entries left pending by crashed requests
+
+    A request that dies between writing its ``pending`` ledger entry and
+    settling it leaves the balance update undecided. This worker settles
+    such entries once they are ``settle_after`` seconds old, every
+    ``interval`` seconds, so they are resolved while ``wallet.applied``
+    still remembers whether they were applied. Settling is idempotent,
+    so the workers of several processes can run side by side.
+    """
+
+    def __init__(self, interval=None, settle_after=None):
+        self.interval = interval or int(os.getenv('WALLET_SETTLE_INTERVAL_SECONDS', 30))
+        self.settle_after = settle_after or int(os.getenv('WALLET_SETTLE_AFTER_SECONDS', 60))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread (once per process)"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='wallet-settlement', daemon=True)
+                self._thread.start()
+
+    def settle(self):
+        """Settle every entry pending for longer than settle_after; returns how many"""
+        return Wallet.settle_pending(datetime.utcnow() - timedelta(seconds=self.settle_after))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                settled = self.settle()
+                if settled:
+                    print(f"Settled {settled} pending wallet transactions")
+            except Exception as e:
+                print(f"Wallet settlement error: {e}")
+
+# Global pending settlement instance
+pending_settlement = PendingSettlement()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Import the application package the same way src/main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+mongomock = pytest.importorskip("mongomock")
+
+from src.models.database import mongo_db
+
+
+@pytest.fixture
+def db():
+    """An in-memory database behind the shared mongo_db client"""
+    previous = mongo_db.db
+    mongo_db.db = mongomock.MongoClient().db
+    yield mongo_db.db
+    mongo_db.db = previous
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models import notification as notification_module
+from src.models.notification import Notification
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    notification_module._broadcast_cache.clear()
+    notification_module._unread_cache.clear()
+
+
+def _feed_ids(user_id, limit, **kwargs):
+    ids, page, cursor = [], 1, '' if kwargs.pop('keyset', False) else None
+    while True:
+        if cursor is None:
+            docs, pagination = Notification.feed(user_id, page, limit)
+            page += 1
+        else:
+            docs, pagination = Notification.feed(user_id, limit=limit, cursor=cursor)
+            cursor = pagination['nextCursor']
+        ids += [doc['_id'] for doc in docs]
+        if not pagination['hasNext']:
+            return ids
+
+
+def _setup(db, direct_ages, broadcast_ages):
+    now = datetime.utcnow()
+    user_id = db.users.insert_one({"role": "user", "createdAt": now - timedelta(days=30)}).inserted_id
+    docs = []
+    for hours in direct_ages:
+        doc = {"recipient": user_id, "title": "direct", "isRead": False, "createdAt": now - timedelta(hours=hours)}
+        doc['_id'] = db.notifications.insert_one(doc).inserted_id
+        docs.append(doc)
+    for hours in broadcast_ages:
+        docs.append(Notification.broadcast(
+            {"type": "system", "title": "broadcast", "message": "m", "data": {}},
+            {"type": "all", "value": None},
+            now - timedelta(hours=hours)
+        ))
+    expected = [str(doc['_id']) for doc in sorted(docs, key=lambda d: (d['createdAt'], d['_id']), reverse=True)]
+    return user_id, expected
+
+
+def test_first_page_includes_broadcasts_newer_than_every_direct_notification(db):
+    user_id, expected = _setup(db, direct_ages=[10, 11, 12, 13, 14], broadcast_ages=[1, 2, 3])
+
+    docs, pagination = Notification.feed(user_id, 1, 4)
+
+    assert [doc['_id'] for doc in docs] == expected[:4]
+    assert all(doc.get('broadcast') for doc in docs[:3])
+    assert pagination['hasNext'] is True
+    assert pagination['total'] == 8
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 7, 20])
+@pytest.mark.parametrize("keyset", [False, True])
+def test_pages_cover_the_merged_feed_in_order(db, limit, keyset):
+    user_id, expected = _setup(
+        db,
+        direct_ages=[5, 10, 11, 20, 30, 31, 40, 50],
+        broadcast_ages=[1, 12, 35, 60]
+    )
+
+    assert _feed_ids(user_id, limit, keyset=keyset) == expected
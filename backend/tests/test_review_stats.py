@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import mongomock
+import pytest
+
+from src.analytics import review_stats
+from src.models.database import serialize_doc
+
+
+@pytest.fixture(autouse=True)
+def bulk_write(monkeypatch):
+    # mongomock's bulk_write rejects the UpdateOne of newer pymongo releases
+    def apply(self, operations, ordered=True):
+        for operation in operations:
+            self.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+    monkeypatch.setattr(mongomock.collection.Collection, 'bulk_write', apply)
+
+
+def test_update_during_rebuild_reaches_the_staging_collection(db, monkeypatch):
+    db.reviews.insert_many([
+        {"status": "approved", "rating": 4, "createdAt": datetime(2026, 1, 5), "location": "Jardin"}
+        for _ in range(5)
+    ])
+    monkeypatch.setattr(review_stats, 'REBUILD_BATCH_SIZE', 2)
+
+    renew = review_stats.acquire_lease
+    changed = []
+
+    def acquire_lease(*args, **fields):
+        result = renew(*args, **fields)
+        scanned = fields.get('scannedThrough')
+        if scanned and scanned != review_stats.MAX_OBJECT_ID and not changed:
+            # The routes pass documents from Review.find_by_id, with _id as a str
+            first = db.reviews.find_one(sort=[("_id", 1)])
+            db.reviews.update_one({"_id": first['_id']}, {"$set": {"status": "rejected"}})
+            before = serialize_doc(first)
+            after = {**before, "status": "rejected"}
+            review_stats.apply_review_change(before, after)
+            changed.append(before['_id'])
+        return result
+    monkeypatch.setattr(review_stats, 'acquire_lease', acquire_lease)
+
+    review_stats.rebuild_review_buckets()
+
+    assert changed
+    assert db.review_buckets.find_one({"_id": "location:Jardin"})['count'] == 4
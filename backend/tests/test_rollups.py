@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from src.analytics.rollups import DashboardRollups, TOTALS_ID, day_key, day_start
+
+
+def test_cold_start_totals_have_computed_at_while_refresh_runs(db):
+    rollups = DashboardRollups()
+    # Another request is building the first totals document
+    rollups._refreshing = True
+
+    totals = rollups.get_totals()
+
+    assert isinstance(totals['computedAt'], datetime)
+    assert db.analytics_rollups.find_one({"_id": TOTALS_ID}) is None
+
+
+def test_open_day_is_not_final_and_is_recomputed_once_closed(db):
+    rollups = DashboardRollups(open_days=2)
+    today = day_start(datetime.utcnow())
+    closed = today - timedelta(days=3)
+
+    assert rollups.store_day(today)['final'] is False
+    # Stored while still open; a user joined later that day
+    db.analytics_rollups.insert_one({
+        "_id": day_key(closed), "date": closed, "newUsers": 0, "final": False,
+        "computedAt": closed + timedelta(hours=12)
+    })
+    db.users.insert_one({"createdAt": closed + timedelta(hours=20)})
+
+    days = rollups.get_days(closed, closed)
+
+    assert days[0]['newUsers'] == 1
+    assert days[0]['final'] is True
+    assert db.analytics_rollups.find_one({"_id": day_key(closed)})['final'] is True
+
+
+def test_final_day_is_served_as_stored(db):
+    rollups = DashboardRollups(open_days=2)
+    closed = day_start(datetime.utcnow()) - timedelta(days=5)
+    rollups.store_day(closed)
+    db.users.insert_one({"createdAt": closed + timedelta(hours=1)})
+
+    assert rollups.get_days(closed, closed)[0]['newUsers'] == 0
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from src.analytics.wallet_stats import WalletStats, TOTALS_ID
+
+
+def test_cold_start_totals_have_reconciled_at_while_reconcile_runs(db):
+    stats = WalletStats()
+    # Another request is building the first totals document
+    stats._reconciling = True
+
+    totals = stats.get_totals()
+
+    assert isinstance(totals['reconciledAt'], datetime)
+    assert db.wallet_stats.find_one({"_id": TOTALS_ID}) is None
+
+
+def _commit(db, user_id, amount):
+    """A credit as Wallet.apply() commits it, with record()'s $inc on the totals"""
+    db.users.update_one({"_id": user_id}, {"$inc": {"wallet.balance": amount}})
+    db.wallet_transactions.insert_one({"user": user_id, "type": "credit", "amount": amount, "source": "test", "status": "committed"})
+    db.wallet_stats.update_one({"_id": TOTALS_ID}, {
+        "$inc": {"version": 1, "totalBalance": amount, "credit.count": 1, "credit.amount": amount}
+    })
+
+
+def _setup(db):
+    user_id = db.users.insert_one({"wallet": {"balance": 0}}).inserted_id
+    # Drifted counters
+    db.wallet_stats.replace_one({"_id": TOTALS_ID}, {
+        "_id": TOTALS_ID, "version": 7, "totalBalance": 999, "holders": 0,
+        "credit": {"count": 0, "amount": 0}, "debit": {"count": 0, "amount": 0}, "sources": {}
+    }, upsert=True)
+    return user_id
+
+
+def _commit_during_scan(db, user_id, scans):
+    compute = WalletStats.compute_totals
+    calls = []
+
+    def compute_totals():
+        totals = compute()
+        calls.append(1)
+        if len(calls) <= scans:
+            _commit(db, user_id, 10)
+        return totals
+    return compute_totals
+
+
+def test_reconcile_recomputes_when_a_transaction_lands_during_the_scan(db, monkeypatch):
+    user_id = _setup(db)
+    stats = WalletStats()
+    monkeypatch.setattr(stats, 'compute_totals', _commit_during_scan(db, user_id, scans=1))
+
+    stats.reconcile(days=1, fix=True)
+
+    totals = db.wallet_stats.find_one({"_id": TOTALS_ID})
+    assert totals['totalBalance'] == 10
+    assert totals['credit'] == {"count": 1, "amount": 10}
+
+
+def test_reconcile_flags_a_document_that_keeps_changing_under_the_scan(db, monkeypatch):
+    user_id = _setup(db)
+    stats = WalletStats()
+    monkeypatch.setattr(stats, 'compute_totals', _commit_during_scan(db, user_id, scans=10))
+
+    report = stats.reconcile(days=1, fix=True)
+
+    totals = db.wallet_stats.find_one({"_id": TOTALS_ID})
+    # Left as it was plus the live increments, never double counted
+    assert totals['totalBalance'] == 999 + 30
+    assert totals['credit'] == {"count": 3, "amount": 30}
+    assert totals['needsReconcile'] is True
+    assert report['unfixed'] == [TOTALS_ID]